@@ -14,18 +14,21 @@ class ColorModel:
     You can create the color model with any number of "training" images, or
     add images to the model with add() and remove().  Then for your data images,
     you can useThresholdImage() to return a segmented picture.
+
+    The model is a dense boolean table with one entry for every (r,g,b) color, each
+    channel shifted down by mBits, so adding, removing and thresholding are numpy
+    gathers and scatters over whole images rather than a lookup per pixel.
     
     """
-    #TODO: Discretize the colorspace into smaller intervals,eg r=[0-7][8-15] etc
     #TODO: Work in HSV space
     mIsBackground = True
-    mData = {}
+    mData = None # the boolean table of the model colors, indexed by shifted r, g and b
     mBits = 1
     
     def __init__(self, data = None, isBackground=True):
         self.mIsBackground = isBackground
-        self.mData = {}
         self.mBits = 1
+        self.mData = self._emptyTable()
         
         if data:
             try:
@@ -34,10 +37,25 @@ class ColorModel:
                 self.add(data)
   
   
+    def _emptyTable(self):
+        """
+        Return an empty model table for the current number of bits.
+        """
+        levels = 256 >> self.mBits
+        return np.zeros((levels,levels,levels),dtype=bool)
+
+    def _index(self, colors):
+        """
+        Return the flat table index of each row of an Nx3 array of colors.
+        """
+        colors = np.right_shift(np.asarray(colors,dtype=np.uint8).reshape(-1,3), self.mBits).astype(np.intp)
+        levels = 256 >> self.mBits
+        return (colors[:,0]*levels+colors[:,1])*levels+colors[:,2]
+
     def _makeCanonical(self, data):
         """
-        Turn input types in a common form used by the rest of the class -- a
-        4-bit shifted list of unique colors
+        Turn input types in a common form used by the rest of the class -- the
+        flat table index of each color
         """ 
         ret = ''
         
@@ -54,13 +72,7 @@ class ColorModel:
             warnings.warn("ColorModel: color is not in an accepted format!")
             return None
     
-        rs = np.right_shift(ret, self.mBits)  #right shift 4 bits
-        
-        uniques = np.unique(rs.view([('',rs.dtype)]*rs.shape[1])).view(rs.dtype).reshape(-1, 3)
-        #create a unique set of colors.  I had to look this one up
-        
-        #create a dict of encoded strings
-        return dict.fromkeys(map(np.ndarray.tostring, uniques), 1)
+        return self._index(ret)
   
     def reset(self):
         """
@@ -79,7 +91,7 @@ class ColorModel:
         >>> cm.clear()
         
         """
-        self.mData = {}
+        self.mData = self._emptyTable()
   
     def add(self, data):
         """
@@ -102,7 +114,9 @@ class ColorModel:
         >>> cm.clear()
 
         """
-        self.mData.update(self._makeCanonical(data))
+        index = self._makeCanonical(data)
+        if( index is not None ):
+            self.mData.flat[index] = True
   
     def remove(self, data):
         """
@@ -125,14 +139,16 @@ class ColorModel:
         >>> cm.remove(Color.BLACK)
 
         """
-        self.mData = dict.fromkeys(set(self.mData) ^ set(self._makeCanonical(data)), 1)
+        index = self._makeCanonical(data)
+        if( index is not None ):
+            self.mData.flat[index] = False
   
     def threshold(self, img):
         """
         **SUMMARY**
 
-        Perform a threshold operation on the given image. This involves iterating
-        over the image and comparing each pixel to the model. If the pixel is in the
+        Perform a threshold operation on the given image. This involves looking up
+        each pixel in the model table. If the pixel is in the
         model it is set to be either the foreground (white) or background (black) based
         on the setting of mIsBackground.
 
@@ -159,9 +175,8 @@ class ColorModel:
             a = 255
             b = 0
         
-        rs = np.right_shift(img.getNumpy(), self.mBits).reshape(-1, 3) #bitshift down and reshape to Nx3
-        mapped = np.array(map(self.mData.has_key, map(np.ndarray.tostring, rs))) #map to True/False based on the model
-        thresh = np.where(mapped, a, b) #replace True and False with fg and bg
+        mapped = self.mData.flat[self._index(img.getNumpy())] #map to True/False based on the model
+        thresh = np.where(mapped, a, b).astype(np.uint8) #replace True and False with fg and bg
         return Image(thresh.reshape(img.width, img.height))
     
     def contains(self, c):
@@ -188,8 +203,8 @@ class ColorModel:
        
        
        """
-        #reverse the color, cast to uint8, right shift, convert to string, check dict
-        return self.mData.has_key(np.right_shift(np.cast['uint8'](c[::-1]), self.mBits).tostring())
+        #cast to uint8, right shift and look up the table
+        return bool(self.mData.flat[self._index(c)[0]])
     
     def setIsForeground(self):
         """
@@ -224,11 +239,8 @@ class ColorModel:
         """
         **SUMMARY**
         
-        Load the color model from the specified file.
-        
-        **TO DO**
-        
-        This should be converted to pickle. 
+        Load the color model from the specified file. Files saved by older versions,
+        which hold a dictionary of colors, are converted to the table.
         
         **PARAMETERS** 
         
@@ -247,13 +259,25 @@ class ColorModel:
         >>> cm.save("mymodel)
 
         """
-        self.mData =  load(open(filename))
+        data = load(open(filename, "rb"))
+        if( isinstance(data,dict) and data.has_key('table') ):
+            self.mBits = data['bits']
+            self.mData = np.unpackbits(data['table'])[0:(256 >> self.mBits)**3].astype(bool)
+            self.mData = self.mData.reshape(((256 >> self.mBits),)*3)
+        else:
+            # the old format, a dict keyed by the shifted color strings. Colors added
+            # from images were uint8, colors added as tuples or lists were int64.
+            self.mData = self._emptyTable()
+            if( len(data) > 0 ):
+                colors = np.array([np.fromstring(k, np.uint8 if len(k) == 3 else np.int64) for k in data.keys()])
+                colors = np.clip(colors.reshape(-1,3),0,(256 >> self.mBits)-1)
+                self.mData[colors[:,0],colors[:,1],colors[:,2]] = True
     
     def save(self, filename):
         """
         **SUMMARY**
         
-        Save a color model file. 
+        Save a color model file. The table is saved packed to one bit per color.
 
         **PARAMETERS** 
         
@@ -269,11 +293,271 @@ class ColorModel:
         >>> cm.add(Color.RED)
         >>> cm.add(Color.BLUE)
         >>> cm.save("mymodel.txt")
-        
-        **TO DO**
-        
-        This should be converted to pickle. 
 
         """
-        dump(self.mData, open(filename, "wb"))
+        dump({'bits':self.mBits,'table':np.packbits(self.mData.ravel())}, open(filename, "wb"), HIGHEST_PROTOCOL)
       
+
+
+class HistogramColorModel(ColorModel):
+    """
+    **SUMMARY**
+
+    The histogram color model is a soft version of the ColorModel. Rather than a set
+    of colors it counts how often each color is seen, in a histogram of the object
+    (foreground) colors and, optionally, a histogram of the colors around it
+    (background). A pixel's likelihood of being part of the object is then
+
+    P(color|object) / ( P(color|object) + P(color|background) )
+
+    and threshold() keeps the pixels whose likelihood ratio P(color|object)/P(color|background)
+    is at least the ratio given. Without a background histogram every color is taken
+    to be equally likely in the background.
+
+    The likelihood of every color is computed once, when the counts change, so an
+    image is backprojected with a single numpy gather. The counts can be decayed so
+    the model follows lighting changes in a video.
+
+    The model has the same interface as the ColorModel, so it can be used with
+    ColorSegmentation and BlobMaker.extractUsingModel.
+
+    **EXAMPLE**
+
+    >>> img = Image("lenna")
+    >>> face = img.crop(200,200,150,180)
+    >>> cm = HistogramColorModel(face,img,isBackground=False,ratio=2.0)
+    >>> prob = cm.backProject(img)
+    >>> cm.threshold(img).show()
+
+    **SEE ALSO**
+
+    :py:class:`ColorModel`
+    :py:class:`ColorSegmentation`
+
+    """
+    mBits = 3
+    mData = None # the counts of the foreground colors, indexed by the flat table index
+    mBackground = None # the counts of the background colors
+    mRatio = 1.0 # the likelihood ratio above which a color is in the model
+    mPrior = 0.1 # the count added to every color to smooth the histograms
+    _mLikelihood = None # the cached foreground likelihood of every color
+
+    def __init__(self, data = None, background = None, isBackground=True, bits=3, ratio=1.0, prior=0.1):
+        """
+        **SUMMARY**
+
+        Make a histogram color model.
+
+        **PARAMETERS**
+
+        * *data* - An image or tuple of foreground colors, or a list of them.
+        * *background* - An image or tuple of background colors, or a list of them.
+        * *isBackground* - If True, the model colors are black in the thresholded image.
+        * *bits* - The bits each channel is shifted down by, 3 gives 32 bins per channel.
+        * *ratio* - The likelihood ratio at which threshold keeps a color.
+        * *prior* - The count added to every color before normalizing, so colors that were
+          never seen do not have a likelihood of zero.
+
+        """
+        self.mIsBackground = isBackground
+        self.mBits = int(bits)
+        self.mRatio = ratio
+        self.mPrior = prior
+        self.mData = self._emptyTable()
+        self.mBackground = self._emptyTable()
+        self._mLikelihood = None
+        for d,target in [(data,self.add),(background,self.addBackground)]:
+            if( isinstance(d,list) ):
+                [ target(x) for x in d ]
+            elif( d is not None ):
+                target(d)
+
+    def _emptyTable(self):
+        """
+        Return an empty histogram for the current number of bits.
+        """
+        return np.zeros((256 >> self.mBits)**3,dtype=np.float64)
+
+    def _counts(self, data):
+        """
+        Return the histogram of the colors of an image, array or tuple.
+        """
+        index = self._makeCanonical(data)
+        if( index is None ):
+            return None
+        return np.bincount(index,minlength=len(self.mData)).astype(np.float64)
+
+    def reset(self):
+        """
+        **SUMMARY**
+
+        Clear the foreground and the background histograms.
+        """
+        self.mData = self._emptyTable()
+        self.mBackground = self._emptyTable()
+        self._mLikelihood = None
+
+    def add(self, data):
+        """
+        **SUMMARY**
+
+        Count the colors of an image, array, or tuple in the foreground histogram.
+        """
+        counts = self._counts(data)
+        if( counts is not None ):
+            self.mData += counts
+            self._mLikelihood = None
+
+    def addBackground(self, data):
+        """
+        **SUMMARY**
+
+        Count the colors of an image, array, or tuple in the background histogram.
+        """
+        counts = self._counts(data)
+        if( counts is not None ):
+            self.mBackground += counts
+            self._mLikelihood = None
+
+    def remove(self, data):
+        """
+        **SUMMARY**
+
+        Take the colors of an image, array, or tuple out of the foreground histogram.
+        """
+        counts = self._counts(data)
+        if( counts is not None ):
+            self.mData = np.maximum(self.mData-counts,0)
+            self._mLikelihood = None
+
+    def decay(self, factor):
+        """
+        **SUMMARY**
+
+        Scale down both histograms, so the colors added from now on count for more
+        than the older ones.
+
+        **PARAMETERS**
+
+        * *factor* - The weight the current counts keep, between 0 and 1.
+
+        **EXAMPLE**
+
+        >>> for img in frames:
+        >>>     cm.decay(0.9)
+        >>>     cm.add(img.crop(*box))
+
+        """
+        self.mData *= factor
+        self.mBackground *= factor
+        self._mLikelihood = None
+
+    def histogram(self, background=False):
+        """
+        **SUMMARY**
+
+        Return the normalized, smoothed foreground (or background) histogram as a 3-D
+        numpy array indexed by the shifted r, g and b.
+        """
+        counts = self.mData
+        if( background ):
+            counts = self.mBackground
+        levels = 256 >> self.mBits
+        return ((counts+self.mPrior)/(counts.sum()+self.mPrior*len(counts))).reshape((levels,levels,levels))
+
+    def likelihood(self):
+        """
+        **SUMMARY**
+
+        Return the foreground likelihood, between 0 and 1, of every color as a flat
+        array, computing it if the counts changed.
+        """
+        if( self._mLikelihood is None ):
+            if( self.mData.sum() <= 0 ):
+                self._mLikelihood = np.zeros(len(self.mData))
+            else:
+                fg = self.histogram().ravel()
+                if( self.mBackground.sum() > 0 ):
+                    bg = self.histogram(background=True).ravel()
+                else:
+                    bg = np.ones(len(fg))/len(fg)
+                self._mLikelihood = fg/(fg+bg)
+        return self._mLikelihood
+
+    def backProject(self, img):
+        """
+        **SUMMARY**
+
+        Return the likelihood, between 0 and 1, that each pixel of an image is part of
+        the object, as a numpy array indexed [x,y].
+
+        **EXAMPLE**
+
+        >>> prob = cm.backProject(img)
+        >>> Image(np.uint8(prob*255)).show()
+
+        """
+        return self.likelihood()[self._index(img.getNumpy())].reshape(img.width,img.height)
+
+    def threshold(self, img, ratio=None):
+        """
+        **SUMMARY**
+
+        Return the thresholded image, with the pixels whose likelihood ratio is at least
+        ratio set to the foreground (white) or background (black) based on the setting
+        of mIsBackground.
+
+        **PARAMETERS**
+
+        * *img* - the image to perform the threshold on.
+        * *ratio* - The likelihood ratio, by default the model's.
+
+        """
+        if( ratio is None ):
+            ratio = self.mRatio
+        a = 0
+        b = 255
+        if( self.mIsBackground == False ):
+            a = 255
+            b = 0
+        mapped = self.backProject(img) >= ratio/(1.0+ratio)
+        return Image(np.where(mapped, a, b).astype(np.uint8))
+
+    def contains(self, c):
+        """
+        **SUMMARY**
+
+        Return true if the likelihood ratio of a color is at least the model's ratio.
+        """
+        return bool(self.likelihood()[self._index(c)[0]] >= self.mRatio/(1.0+self.mRatio))
+
+    def load(self, filename):
+        """
+        **SUMMARY**
+
+        Load the histogram color model from the specified file.
+        """
+        data = load(open(filename, "rb"))
+        if( not isinstance(data,dict) or not data.has_key('counts') ):
+            warnings.warn("HistogramColorModel: %s is not a histogram color model file." % filename)
+            return
+        self.mBits = data['bits']
+        self.mRatio = data['ratio']
+        self.mPrior = data['prior']
+        self.reset()
+        self.mData[data['index']] = data['counts']
+        self.mBackground[data['bgindex']] = data['bgcounts']
+
+    def save(self, filename):
+        """
+        **SUMMARY**
+
+        Save the histogram color model. Only the colors that were seen are saved, with
+        their counts as 32 bit floats.
+        """
+        index = np.flatnonzero(self.mData)
+        bgindex = np.flatnonzero(self.mBackground)
+        dump({'bits':self.mBits,'ratio':self.mRatio,'prior':self.mPrior,
+              'index':index.astype(np.uint32),'counts':self.mData[index].astype(np.float32),
+              'bgindex':bgindex.astype(np.uint32),'bgcounts':self.mBackground[bgindex].astype(np.float32)},
+             open(filename, "wb"), HIGHEST_PROTOCOL)
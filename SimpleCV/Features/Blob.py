@@ -1,9 +1,16 @@
 from SimpleCV.base import *
 from SimpleCV.Features.Features import Feature, FeatureSet
+from SimpleCV.Features.RLEMask import RLEMask
 from SimpleCV.Color import Color
 from SimpleCV.ImageClass import Image
 from math import sin, cos, pi
 
+def _contourArray(points):
+    """
+    Pack a sequence of (x,y) points, e.g. an OpenCV contour, into an Nx2 int32 numpy array.
+    """
+    return np.array(list(points),dtype=np.int32).reshape((-1,2))
+
 class Blob(Feature):
     """
     **SUMMARY**
@@ -31,8 +38,8 @@ class Blob(Feature):
 
     """
     seq = '' #the cvseq object that defines this blob
-    mContour = [] # the blob's outer perimeter as a set of (x,y) tuples 
-    mConvexHull = [] # the convex hull contour as a set of (x,y) tuples
+    mContour = [] # the blob's outer perimeter as an Nx2 int32 numpy array of (x,y) points
+    mConvexHull = [] # the convex hull contour as an Nx2 int32 numpy array of (x,y) points
     mMinRectangle = [] #the smallest box rotated to fit the blob
     # mMinRectangle[0] = centroid (x,y)
     # mMinRectangle[1] = (w,h)
@@ -56,15 +63,17 @@ class Blob(Feature):
     mAvgColor = []#The average color of the blob's area. 
     mImg =  '' #Image()# the segmented image of the blob
     mHullImg = '' # Image() the image from the hull.
-    mMask = '' #Image()# A mask of the blob area
-    mHullMask = '' #Image()#A mask of the hull area ... we may want to use this for the image mask. 
-    mHoleContour = []  # list of hole contours
+    mMaskRLE = None #RLEMask()# A run-length encoded mask of the blob area
+    mHullMaskRLE = None #RLEMask()# A run-length encoded mask of the hull area
+    mHoleContour = []  # list of hole contours, each an Nx2 int32 numpy array
+    mTrackID = -1 # the id of the BlobTracker track this blob belongs to, -1 if untracked
+    mVelocity = (0,0) # the (dx,dy) velocity in pixels per frame estimated by a BlobTracker
     #mVertEdgeHist = [] #vertical edge histogram
     #mHortEdgeHist = [] #horizontal edge histgram
     
     def __init__(self):
-        self.mContour = []
-        self.mConvexHull = []
+        self.mContour = np.zeros((0,2),dtype=np.int32)
+        self.mConvexHull = np.zeros((0,2),dtype=np.int32)
         self.mMinRectangle = [-1,-1,-1,-1,-1] #angle from this
         self.mBoundingBox = [-1,-1,-1,-1] #get W/H and X/Y from this
         self.mHu = [-1,-1,-1,-1,-1,-1,-1]
@@ -83,14 +92,16 @@ class Blob(Feature):
         self.mLabelColor = [] 
         self.mAvgColor = [-1,-1,-1]
         self.mImg = None
-        self.mMask = None
+        self.mMaskRLE = None
         self.mHullImg = None
         self.image = None
-        self.mHullMask = None
+        self.mHullMaskRLE = None
         self.mHoleContour = [] 
+        self.mTrackID = -1
+        self.mVelocity = (0,0)
         self.mVertEdgeHist = [] #vertical edge histogram
         self.mHortEdgeHist = [] #horizontal edge histgram
-        self.points = []
+        self.points = self.mContour
         #TODO 
         # I would like to clean up the Hull mask parameters
         # it seems to me that we may want the convex hull to be
@@ -119,7 +130,55 @@ class Blob(Feature):
             realkey = k[:-len("__string")]
             self.__dict__[realkey] = cv.CreateImageHeader((self.width(), self.height()), cv.IPL_DEPTH_8U, 1)
             cv.SetData(self.__dict__[realkey], mydict[k])
-        
+
+        #older pickles stored the contours as lists of tuples
+        for k in ["mContour","mConvexHull","points"]:
+            if( k in self.__dict__ and isinstance(self.__dict__[k],list) ):
+                self.__dict__[k] = _contourArray(self.__dict__[k])
+        if( isinstance(self.mHoleContour,list) ):
+            self.mHoleContour = [_contourArray(h) for h in self.mHoleContour]
+
+        #older pickles stored the masks as full images, convert them to RLE
+        for k in ["mMask","mHullMask"]:
+            if( k in self.__dict__ ):
+                setattr(self,k,self.__dict__.pop(k))
+
+    def _getMask(self):
+        if( self.mMaskRLE is None ):
+            return None
+        return self.mMaskRLE.getImage()
+
+    def _setMask(self, mask):
+        self.mMaskRLE = self._toRLE(mask)
+
+    def _getHullMask(self):
+        if( self.mHullMaskRLE is None ):
+            return None
+        return self.mHullMaskRLE.getImage()
+
+    def _setHullMask(self, mask):
+        self.mHullMaskRLE = self._toRLE(mask)
+
+    def _toRLE(self, mask):
+        if( mask is None or isinstance(mask,RLEMask) ):
+            return mask
+        return RLEMask(mask,(self.mBoundingBox[0],self.mBoundingBox[1]))
+
+    # The masks are stored run-length encoded and are only rendered to an Image
+    # when someone asks for one. Assigning an Image re-encodes it.
+    mMask = property(_getMask,_setMask)
+    mHullMask = property(_getHullMask,_setHullMask)
+
+    def _maskedRegion(self):
+        """
+        Return the RGB numpy region of the source image under the blob mask along
+        with the decoded mask, both indexed as [x,y].
+        """
+        x,y = self.mMaskRLE.offset()
+        w,h = self.mMaskRLE.size()
+        region = self.image.getNumpy()[x:x+w,y:y+h]
+        mask = self.mMaskRLE._decode().transpose()[0:region.shape[0],0:region.shape[1]]
+        return region,mask
 
     def meanColor(self):
         """
@@ -138,12 +197,10 @@ class Blob(Feature):
         >>> print blobs[-1].meanColor()
 
         """
-        cv.SetImageROI(self.image.getBitmap(),self.mBoundingBox)
-        #may need the offset paramete
-        avg = cv.Avg(self.image.getBitmap(),self.mMask._getGrayscaleBitmap())
-        cv.ResetImageROI(self.image.getBitmap())
-        
-        return tuple(reversed(avg[0:3]))
+        return tuple(self.image.regionStats([self.mMaskRLE])[0][0])
+
+    def _statsRegion(self):
+        return self.mMaskRLE
 
     def minX(self):
         """
@@ -702,22 +759,15 @@ class Blob(Feature):
         self.mMask = self.mMask.rotate(angle,mode,point)
         self.mHullMask = self.mHullMask.rotate(angle,mode,point)
 
-        self.mContour = map(lambda x:
-                            (x[0]*np.cos(theta)-x[1]*np.sin(theta),
-                             x[0]*np.sin(theta)+x[1]*np.cos(theta)),
-                             self.mContour)
-        self.mConvexHull = map(lambda x:
-                               (x[0]*np.cos(theta)-x[1]*np.sin(theta),
-                                x[0]*np.sin(theta)+x[1]*np.cos(theta)),
-                               self.mConvexHull)
+        # rotate every contour with one matrix product
+        rot = np.array([[np.cos(theta),np.sin(theta)],
+                        [-1*np.sin(theta),np.cos(theta)]])
+        rotate = lambda c: np.rint(np.dot(np.asarray(c,dtype=np.float64).reshape((-1,2)),rot)).astype(np.int32)
+        self.mContour = rotate(self.mContour)
+        self.mConvexHull = rotate(self.mConvexHull)
 
         if( self.mHoleContour is not None):
-            for h in self.mHoleContour:
-                h = map(lambda x:
-                    (x[0]*np.cos(theta)-x[1]*np.sin(theta),
-                     x[0]*np.sin(theta)+x[1]*np.cos(theta)),
-                     h)
-            
+            self.mHoleContour = [rotate(h) for h in self.mHoleContour]
 
 
     def draw(self, color = Color.GREEN, width=-1, alpha=-1, layer=None):
@@ -753,18 +803,10 @@ class Blob(Feature):
             layer = self.image.dl()
             
         if width == -1:
-            #copy the mask into 3 channels and multiply by the appropriate color
-            maskred = cv.CreateImage(cv.GetSize(self.mMask._getGrayscaleBitmap()), cv.IPL_DEPTH_8U, 1)
-            maskgrn = cv.CreateImage(cv.GetSize(self.mMask._getGrayscaleBitmap()), cv.IPL_DEPTH_8U, 1)
-            maskblu = cv.CreateImage(cv.GetSize(self.mMask._getGrayscaleBitmap()), cv.IPL_DEPTH_8U, 1)
-            
-            maskbit = cv.CreateImage(cv.GetSize(self.mMask._getGrayscaleBitmap()), cv.IPL_DEPTH_8U, 3) 
-
-            cv.ConvertScale(self.mMask._getGrayscaleBitmap(), maskred, color[0] / 255.0)
-            cv.ConvertScale(self.mMask._getGrayscaleBitmap(), maskgrn, color[1] / 255.0)
-            cv.ConvertScale(self.mMask._getGrayscaleBitmap(), maskblu, color[2] / 255.0)
-            
-            cv.Merge(maskblu, maskgrn, maskred, None, maskbit)    
+            #paint the color straight from the RLE mask
+            mask = self.mMaskRLE._decode().transpose()
+            maskbit = np.zeros(mask.shape+(3,),dtype=np.uint8)
+            maskbit[mask] = color[0:3]
             
             masksurface = Image(maskbit).getPGSurface()
             masksurface.set_colorkey(Color.BLACK)
@@ -810,15 +852,12 @@ class Blob(Feature):
         if( layer is None ):
             layer = self.image.dl()
         
+        contour = np.asarray(self.mContour).tolist()
         if( width < 0 ):
             #blit the blob in
-            layer.polygon(self.mContour,color,filled=True,alpha=alpha)
+            layer.polygon(contour,color,filled=True,alpha=alpha)
         else:
-            lastp = self.mContour[0] #this may work better.... than the other 
-            for nextp in self.mContour[1::]:
-                layer.line(lastp,nextp,color,width=width,alpha=alpha,antialias = False)
-                lastp = nextp
-            layer.line(self.mContour[0],self.mContour[-1],color,width=width,alpha=alpha, antialias = False)
+            layer.polygon(contour,color,width=width,alpha=alpha,antialias=False)
         
     
     def drawHoles(self, color=Color.GREEN, alpha=-1, width=-1, layer=None):
@@ -852,17 +891,13 @@ class Blob(Feature):
         if( layer is None ):
             layer = self.image.dl()
             
-        if( width < 0 ):
-            #blit the blob in
-            for h in self.mHoleContour:
-                layer.polygon(h,color,filled=True,alpha=alpha)
-        else:
-            for h in self.mHoleContour:
-                lastp = h[0] #this may work better.... than the other 
-                for nextp in h[1::]:
-                    layer.line((int(lastp[0]),int(lastp[1])),(int(nextp[0]),int(nextp[1])),color,width=width,alpha=alpha,antialias = False)
-                    lastp = nextp
-                layer.line(h[0],h[-1],color,width=width,alpha=alpha, antialias = False)
+        for h in self.mHoleContour:
+            hole = np.asarray(h).tolist()
+            if( width < 0 ):
+                #blit the blob in
+                layer.polygon(hole,color,filled=True,alpha=alpha)
+            else:
+                layer.polygon(hole,color,width=width,alpha=alpha,antialias=False)
 
     def drawHull(self, color=Color.GREEN, alpha=-1, width=-1, layer=None ):
         """
@@ -894,15 +929,12 @@ class Blob(Feature):
         if( layer is None ):
             layer = self.image.dl()
             
+        hull = np.asarray(self.mConvexHull).tolist()
         if( width < 0 ):
             #blit the blob in
-            layer.polygon(self.mConvexHull,color,filled=True,alpha=alpha)
+            layer.polygon(hull,color,filled=True,alpha=alpha)
         else:
-            lastp = self.mConvexHull[0] #this may work better.... than the other 
-            for nextp in self.mConvexHull[1::]:
-                layer.line(lastp,nextp,color,width=width,alpha=alpha,antialias = False)
-                lastp = nextp
-            layer.line(self.mConvexHull[0],self.mConvexHull[-1],color,width=width,alpha=alpha, antialias = False)        
+            layer.polygon(hull,color,width=width,alpha=alpha,antialias=False)
         
     
     #draw the actual pixels inside the contour to the layer
@@ -932,12 +964,18 @@ class Blob(Feature):
         >>> dl.show()
 
         """
-        if( layer is not None ):
+        if( layer is None ):
             layer = self.image.dl()
             
         mx = self.mBoundingBox[0]+offset[0]
         my = self.mBoundingBox[1]+offset[1]
-        layer.blit(self.mImg,coordinates=(mx,my))
+        #only copy the pixels that are under the RLE mask
+        region,mask = self._maskedRegion()
+        pixels = np.zeros(region.shape,dtype=np.uint8)
+        pixels[mask] = region[mask]
+        masksurface = Image(pixels).getPGSurface()
+        masksurface.set_colorkey(Color.BLACK)
+        layer._mSurface.blit(masksurface,(mx,my))
         return None
     
     def isSquare(self, tolerance = 0.05, ratiotolerance = 0.05):
@@ -1008,7 +1046,7 @@ class Blob(Feature):
         The number of pixels in the blobs hull mask over the number of pixels in its bounding box. 
 
         """
-        blackcount, whitecount = self.mHullMask.histogram(2)
+        whitecount = self.mHullMaskRLE.area()
         return abs(1.0 - float(whitecount) / (self.minRectWidth() * self.minRectHeight()))
         
     
@@ -1044,13 +1082,18 @@ class Blob(Feature):
         circle of our blob. 
 
         """
-        idealcircle = Image((self.width(), self.height()))
-        radius = min(self.width(), self.height()) / 2
-        idealcircle.dl().circle((self.width()/2, self.height()/2), radius, filled= True, color=Color.WHITE)
-        idealcircle = idealcircle.applyLayers()
-        
-        netdiff = (idealcircle - self.mHullMask) + (self.mHullMask - idealcircle)
-        numblack, numwhite = netdiff.histogram(2)
+        w = self.width()
+        h = self.height()
+        radius = min(w, h) / 2
+        #rasterize the ideal circle and count the pixels that differ from the hull
+        yy, xx = np.ogrid[0:h, 0:w]
+        idealcircle = ((xx - w/2)**2 + (yy - h/2)**2) <= radius * radius
+        hull = self.mHullMaskRLE._decode()
+        ch = min(h, hull.shape[0])
+        cw = min(w, hull.shape[1])
+        netdiff = idealcircle.copy()
+        netdiff[0:ch,0:cw] ^= hull[0:ch,0:cw]
+        numwhite = np.count_nonzero(netdiff)
         return float(numwhite) / (radius * radius * np.pi)
 
     def centroid(self):
@@ -1174,6 +1217,95 @@ class Blob(Feature):
         """
         return self.mMask
 
+    def contains(self, other):
+        """
+        **SUMMARY**
+
+        Return true if the blob contains the other object. For other blobs and points the
+        test is done against the blob's mask, so holes are respected. All of the
+        points are tested at once against the run-length encoded mask.
+        For everything else this falls back to the Feature bounding box test.
+
+        **PARAMETERS**
+
+        * *other*
+
+          * A bounding box - of the form (x,y,w,h) where x,y is the upper left corner
+          * A bounding circle of the form (x,y,r)
+          * A list of x,y tuples defining a closed polygon e.g. ((x,y),(x,y),....)
+          * Any two dimensional feature (e.g. blobs, circle ...)
+
+        **RETURNS**
+
+        Returns a Boolean, True if the blob contains the object, False otherwise.
+
+        **EXAMPLE**
+
+        >>> img = Image("Lenna")
+        >>> blobs = img.findBlobs()
+        >>> if( blobs[-1].contains(blobs[0]) ):
+        >>>    print "this blob is contained in the biggest blob"
+
+        """
+        if( self.mMaskRLE is None ):
+            return Feature.contains(self,other)
+        if( isinstance(other,Blob) ):
+            pts = other.mContour
+        elif( isinstance(other,Feature) ):
+            pts = other.points
+        elif( (isinstance(other,tuple) and len(other)==2) or ( isinstance(other,np.ndarray) and other.shape == (2,)) ):
+            return self.mMaskRLE.contains(other)
+        else:
+            return Feature.contains(self,other)
+        if( len(pts) == 0 ):
+            return False
+        return bool(np.all(self.mMaskRLE.containsPoints(pts)))
+
+    def overlaps(self, other):
+        """
+        **SUMMARY**
+
+        Return true if the blob overlaps the other object. Two blobs overlap if their masks
+        share at least one pixel, other features overlap if any of their points land
+        inside the blob's mask. For everything else this falls back to the Feature test.
+
+        **PARAMETERS**
+
+        * *other*
+
+          * A bounding box - of the form (x,y,w,h) where x,y is the upper left corner
+          * A bounding circle of the form (x,y,r)
+          * A list of x,y tuples defining a closed polygon e.g. ((x,y),(x,y),....)
+          * Any two dimensional feature (e.g. blobs, circle ...)
+
+        **RETURNS**
+
+        Returns a Boolean, True if the blob overlaps the object, False otherwise.
+
+        **EXAMPLE**
+
+        >>> img = Image("Lenna")
+        >>> blobs = img.findBlobs()
+        >>> if( blobs[-1].overlaps(blobs[0]) ):
+        >>>    print "This blob overlaps the biggest blob"
+
+        """
+        if( self.mMaskRLE is None ):
+            return Feature.overlaps(self,other)
+        if( isinstance(other,Blob) and other.mMaskRLE is not None ):
+            #cheap bounding box rejection before touching the masks
+            if( self.maxX() < other.minX() or other.maxX() < self.minX() or
+                self.maxY() < other.minY() or other.maxY() < self.minY() ):
+                return False
+            return self.mMaskRLE.intersection(other.mMaskRLE).area() > 0
+        elif( isinstance(other,Feature) ):
+            if( len(other.points) == 0 ):
+                return False
+            return bool(np.any(self.mMaskRLE.containsPoints(other.points)))
+        elif( (isinstance(other,tuple) and len(other)==2) or ( isinstance(other,np.ndarray) and other.shape == (2,)) ):
+            return self.mMaskRLE.contains(other)
+        return Feature.overlaps(self,other)
+
     def match(self, otherblob):
         """
         **SUMMARY**
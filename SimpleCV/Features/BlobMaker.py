@@ -31,7 +31,7 @@ class BlobMaker:
         if (maxsize <= 0):  
           maxsize = img.width * img.height 
         gray = colormodel.threshold(img)
-        blobs = self.extractFromBinary(gray,img,minArea=minsize,maxArea=maxsize)
+        blobs = self.extractFromBinary(gray,img,minsize=minsize,maxsize=maxsize)
         retVal = sorted(blobs,key=lambda x: x.mArea, reverse=True)
         return FeatureSet(retVal)
     
@@ -55,7 +55,7 @@ class BlobMaker:
         retVal = sorted(blobs,key=lambda x: x.mArea, reverse=True)
         return FeatureSet(retVal)    
     
-    def extractFromBinary(self,binaryImg,colorImg, minsize = 5, maxsize = -1):
+    def extractFromBinary(self,binaryImg,colorImg, minsize = 5, maxsize = -1, offset = (0,0)):
         """
         This method performs blob extraction given a binary source image that is used
         to get the blob images, and a color source image.
@@ -63,6 +63,8 @@ class BlobMaker:
         colorImg - The color image.
         minSize  - The minimum size of the blobs in pixels.
         maxSize  - The maximum blob size in pixels. 
+        offset   - The (x,y) position of the binary image inside the color image. This lets
+                   you extract blobs from a binary crop of a region of the color image.
         """
         #If you hit this recursion limit may god have mercy on your soul.
         #If you really are having problems set the value higher, but this means
@@ -88,7 +90,7 @@ class BlobMaker:
         if( test[0]<ptest and test[1]<ptest and test[2]<ptest):
             return retVal 
         
-        seq = cv.FindContours( binaryImg._getGrayscaleBitmap(), self.mMemStorage, cv.CV_RETR_TREE, cv.CV_CHAIN_APPROX_SIMPLE)
+        seq = cv.FindContours( binaryImg._getGrayscaleBitmap(), self.mMemStorage, cv.CV_RETR_TREE, cv.CV_CHAIN_APPROX_SIMPLE, (int(offset[0]),int(offset[1])))
         try:
             # note to self
             # http://code.activestate.com/recipes/474088-tail-call-optimization-decorator/
@@ -154,8 +156,8 @@ class BlobMaker:
         retVal.mPerimeter = cv.ArcLength(seq)
         
         if( seq is not None):  #KAS 
-            retVal.mContour = list(seq)
-            retVal.points = list(seq)
+            retVal.mContour = _contourArray(seq)
+            retVal.points = retVal.mContour
 
         # so this is a bit hacky.... need to refactor blobs
         xx = retVal.mBoundingBox[0]
@@ -165,10 +167,10 @@ class BlobMaker:
         retVal.boundingBox = [(xx,yy),(xx+ww,yy),(xx+ww,yy+hh),(xx,yy+hh)]
 
         chull = cv.ConvexHull2(seq,cv.CreateMemStorage(),return_points=1)
-        retVal.mConvexHull = list(chull)
+        retVal.mConvexHull = _contourArray(chull)
         hullMask = self._getHullMask(chull,retVal.mBoundingBox)
         retVal.mHullImg = self._getBlobAsImage(chull,retVal.mBoundingBox,color.getBitmap(),hullMask)
-        retVal.mHullMask = Image(hullMask)
+        retVal.mHullMaskRLE = RLEMask(hullMask,(xx,yy))
         
         del chull
         
@@ -196,7 +198,7 @@ class BlobMaker:
             
         retVal.mHu = cv.GetHuMoments(moments)
         mask = self._getMask(seq,retVal.mBoundingBox)
-        retVal.mMask = Image(mask)
+        retVal.mMaskRLE = RLEMask(mask,(xx,yy))
 
         retVal.mAvgColor = self._getAvg(color.getBitmap(),retVal.mBoundingBox,mask)
         retVal.mAvgColor = retVal.mAvgColor[0:3]
@@ -212,15 +214,15 @@ class BlobMaker:
     
     def _getHoles(self,seq):
         """
-        This method returns the holes associated with a blob as a list of tuples.
+        This method returns the holes associated with a blob as a list of Nx2 int32 arrays.
         """
         retVal = None
         holes = seq.v_next()
         if( holes is not None ):
-            retVal = [list(holes)]
+            retVal = [_contourArray(holes)]
             while( holes.h_next() is not None ):
                 holes = holes.h_next();
-                temp = list(holes)
+                temp = _contourArray(holes)
                 if( len(temp) >= 3 ): #exclude single pixel holes 
                     retVal.append(temp)
         return retVal
@@ -277,4 +279,5 @@ class BlobMaker:
 
 from SimpleCV.ImageClass import Image
 from SimpleCV.Features.Features import FeatureSet
-from SimpleCV.Features.Blob import Blob
+from SimpleCV.Features.Blob import Blob, _contourArray
+from SimpleCV.Features.RLEMask import RLEMask
@@ -0,0 +1,393 @@
+from SimpleCV.base import *
+
+
+class BlobTrack:
+    """
+    **SUMMARY**
+
+    A BlobTrack follows a single object across frames for a :py:class:`BlobTracker`.
+    It keeps the most recent blob for the object, a smoothed velocity estimate
+    and how many frames the object has been missing for.
+
+    **SEE ALSO**
+
+    :py:class:`BlobTracker`
+
+    """
+    mID = -1 # the unique id of the track
+    mBlob = None # the most recent blob for this track
+    mPosition = None # the (x,y) center of the most recent blob as a numpy array
+    mSize = None # the (w,h) of the most recent blob as a numpy array
+    mVelocity = None # the smoothed (dx,dy) velocity in pixels per frame
+    mAge = 0 # the number of frames the track has existed
+    mMissed = 0 # the number of frames in a row without a matching blob
+
+    def __init__(self, trackid, blob):
+        self.mID = trackid
+        self.mVelocity = np.zeros(2)
+        self.mAge = 0
+        self.mMissed = 0
+        self._setBlob(blob)
+
+    def _setBlob(self, blob):
+        self.mBlob = blob
+        self.mPosition = np.array([blob.x,blob.y],dtype=np.float64)
+        self.mSize = np.array([blob.width(),blob.height()],dtype=np.float64)
+        blob.mTrackID = self.mID
+        blob.mVelocity = tuple(self.mVelocity)
+
+    def update(self, blob, smoothing=0.5):
+        """
+        **SUMMARY**
+
+        Move the track to a newly matched blob and update the velocity estimate.
+
+        **PARAMETERS**
+
+        * *blob* - The blob matched to this track in the current frame.
+        * *smoothing* - How much of the new displacement goes into the velocity, between 0 and 1.
+
+        """
+        step = np.array([blob.x,blob.y],dtype=np.float64)-self.mPosition
+        # spread the displacement over the frames we missed
+        step = step/(self.mMissed+1)
+        self.mVelocity = smoothing*step+(1.0-smoothing)*self.mVelocity
+        self.mAge += 1
+        self.mMissed = 0
+        self._setBlob(blob)
+
+    def miss(self):
+        """
+        **SUMMARY**
+
+        Record that no blob matched the track in the current frame.
+        """
+        self.mAge += 1
+        self.mMissed += 1
+
+    def predict(self):
+        """
+        **SUMMARY**
+
+        Return the predicted (x,y) center of the object in the next frame as a numpy array.
+        """
+        return self.mPosition+self.mVelocity*(self.mMissed+1)
+
+    def searchRegion(self, margin, size):
+        """
+        **SUMMARY**
+
+        Return the (x,y,w,h) region, clipped to an image of the given (width,height),
+        where the object should be found in the next frame. The predicted bounding
+        box is grown by margin times its size on every side.
+        """
+        center = self.predict()
+        half = self.mSize*(0.5+margin)+np.abs(self.mVelocity)*self.mMissed
+        x0 = int(max(0,np.floor(center[0]-half[0])))
+        y0 = int(max(0,np.floor(center[1]-half[1])))
+        x1 = int(min(size[0],np.ceil(center[0]+half[0])))
+        y1 = int(min(size[1],np.ceil(center[1]+half[1])))
+        return (x0,y0,x1-x0,y1-y0)
+
+    def id(self):
+        """
+        **SUMMARY**
+
+        Return the unique id of the track.
+        """
+        return self.mID
+
+    def blob(self):
+        """
+        **SUMMARY**
+
+        Return the most recent blob matched to the track.
+        """
+        return self.mBlob
+
+    def velocity(self):
+        """
+        **SUMMARY**
+
+        Return the estimated (dx,dy) velocity of the object in pixels per frame.
+        """
+        return tuple(self.mVelocity)
+
+    def age(self):
+        """
+        **SUMMARY**
+
+        Return the number of frames this track has existed for.
+        """
+        return self.mAge
+
+    def __repr__(self):
+        return "SimpleCV.Features.BlobTracker.BlobTrack %d at (%d, %d) velocity (%.2f, %.2f)" % (self.mID,self.mPosition[0],self.mPosition[1],self.mVelocity[0],self.mVelocity[1])
+
+
+class BlobTracker:
+    """
+    **SUMMARY**
+
+    The BlobTracker follows blobs from frame to frame. Each tracked blob is given a
+    track id and a velocity estimate. Rather than running blob extraction over the
+    whole frame every time, the tracker predicts where each object will be and only
+    thresholds and extracts blobs inside a region around that prediction. A full frame
+    sweep, which is also how new objects are found, is run every sweepInterval frames,
+    whenever a track is lost, or when an object runs into the edge of its search region.
+    This makes the cost of most frames depend on the number and size of the objects
+    rather than on the size of the frame.
+
+    Blobs are associated to tracks using the distance from the predicted position,
+    measured in object lengths, plus the change in blob area.
+
+    **EXAMPLE**
+
+    >>> cam = Camera()
+    >>> tracker = BlobTracker(threshval=100)
+    >>> while True:
+    >>>     img = cam.getImage()
+    >>>     blobs = tracker.track(img)
+    >>>     for b in blobs:
+    >>>         img.drawText(str(b.mTrackID),b.x,b.y)
+    >>>     img.show()
+
+    **SEE ALSO**
+
+    :py:class:`BlobMaker`
+    :py:class:`BlobTrack`
+    :py:meth:`findBlobs`
+
+    """
+    mBlobMaker = None
+    mTracks = []
+    mNextID = 0
+    mFrameCount = 0
+    mNeedSweep = True
+    mThresholdOperation = None
+
+    def __init__(self, threshval=127, minsize=10, maxsize=0, sweepInterval=30, margin=0.5,
+                 maxMissed=5, gate=1.5, smoothing=0.5, thresholdOperation=None):
+        """
+        **SUMMARY**
+
+        Create a blob tracker.
+
+        **PARAMETERS**
+
+        * *threshval* - The binarize threshold used to segment the blobs. A fixed threshold
+          is recommended, Otsu's method (-1) picks a different value for each search region.
+        * *minsize* - The minimum blob size in pixels.
+        * *maxsize* - The maximum blob size in pixels, 0 means the size of the frame.
+        * *sweepInterval* - Run a full frame extraction every this many frames.
+        * *margin* - How much to grow each predicted bounding box, as a fraction of its size, to make a search region.
+        * *maxMissed* - How many frames in a row a track can go unmatched before it is dropped.
+        * *gate* - The farthest a blob can be from a track's prediction, in object lengths, and still match it.
+        * *smoothing* - The weight of the newest displacement in the velocity estimate, between 0 and 1.
+        * *thresholdOperation* - An optional function of the form binaryimg = threshold(img) used
+          instead of binarize. White areas of the result become blobs.
+
+        """
+        self.mBlobMaker = BlobMaker()
+        self.mThreshval = threshval
+        self.mMinSize = minsize
+        self.mMaxSize = maxsize
+        self.mSweepInterval = max(1,int(sweepInterval))
+        self.mMargin = margin
+        self.mMaxMissed = maxMissed
+        self.mGate = gate
+        self.mSmoothing = smoothing
+        self.mThresholdOperation = thresholdOperation
+        self.reset()
+
+    def reset(self):
+        """
+        **SUMMARY**
+
+        Drop all of the tracks. The next frame will do a full sweep.
+        """
+        self.mTracks = []
+        self.mNextID = 0
+        self.mFrameCount = 0
+        self.mNeedSweep = True
+
+    def setThresholdOperation(self, threshOp):
+        """
+        The threshold operation is a function of the form
+        binaryimg = threshold(img)
+
+        Example:
+
+        >>> def binarize_wrap(img):
+        >>>    return img.binarize(100).invert()
+        """
+        self.mThresholdOperation = threshOp
+
+    def tracks(self):
+        """
+        **SUMMARY**
+
+        Return the list of current :py:class:`BlobTrack` objects, including tracks
+        that have been missing for fewer than maxMissed frames.
+        """
+        return self.mTracks
+
+    def _segment(self, img):
+        if( self.mThresholdOperation is not None ):
+            return self.mThresholdOperation(img)
+        return img.binarize(self.mThreshval,255).invert()
+
+    def _detect(self, img, region=None):
+        """
+        Extract the blobs in an (x,y,w,h) region of the image, or the whole image. The
+        returned blobs are always in the coordinates of the full frame.
+        """
+        maxsize = self.mMaxSize
+        if( maxsize <= 0 ):
+            maxsize = img.width*img.height
+        if( region is None ):
+            return self.mBlobMaker.extractFromBinary(self._segment(img),img,self.mMinSize,maxsize)
+        x,y,w,h = region
+        if( w <= 0 or h <= 0 ):
+            return []
+        binary = self._segment(img.crop(x,y,w,h))
+        return self.mBlobMaker.extractFromBinary(binary,img,self.mMinSize,maxsize,offset=(x,y))
+
+    def _mergeRegions(self, regions):
+        """
+        Merge overlapping (x,y,w,h) regions so no area is searched twice.
+        """
+        rects = [list(r) for r in regions if r[2] > 0 and r[3] > 0]
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(rects)):
+                for j in range(i+1,len(rects)):
+                    a = rects[i]
+                    b = rects[j]
+                    if( a[0] < b[0]+b[2] and b[0] < a[0]+a[2] and
+                        a[1] < b[1]+b[3] and b[1] < a[1]+a[3] ):
+                        x0 = min(a[0],b[0])
+                        y0 = min(a[1],b[1])
+                        x1 = max(a[0]+a[2],b[0]+b[2])
+                        y1 = max(a[1]+a[3],b[1]+b[3])
+                        rects[i] = [x0,y0,x1-x0,y1-y0]
+                        del rects[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return [tuple(r) for r in rects]
+
+    def _touchesEdge(self, blob, region, size):
+        """
+        Returns true if the blob runs into a side of its search region that is not also
+        the side of the frame, meaning part of the object may have been cut off.
+        """
+        x,y,w,h = region
+        bx,by,bw,bh = blob.mBoundingBox
+        return ( (bx <= x and x > 0) or (by <= y and y > 0) or
+                 (bx+bw >= x+w and x+w < size[0]) or (by+bh >= y+h and y+h < size[1]) )
+
+    def _associate(self, blobs):
+        """
+        Greedily match blobs to tracks by lowest cost. Returns a list of (track,blob)
+        pairs, the unmatched tracks, and the unmatched blobs.
+        """
+        if( len(self.mTracks) == 0 or len(blobs) == 0 ):
+            return [],list(self.mTracks),list(blobs)
+        predicted = np.array([t.predict() for t in self.mTracks])
+        sizes = np.array([t.mSize for t in self.mTracks])
+        centers = np.array([[b.x,b.y] for b in blobs],dtype=np.float64)
+        bsizes = np.array([[b.width(),b.height()] for b in blobs],dtype=np.float64)
+        # distance in object lengths plus the log ratio of the areas
+        scale = np.maximum(np.max(sizes,axis=1),1.0)[:,np.newaxis]
+        dist = spsd.cdist(predicted,centers)/scale
+        areas = np.maximum(np.prod(sizes,axis=1),1.0)
+        bareas = np.maximum(np.prod(bsizes,axis=1),1.0)
+        cost = dist+np.abs(np.log(bareas[np.newaxis,:]/areas[:,np.newaxis]))
+        cost[dist > self.mGate] = np.inf
+        order = np.argsort(cost,axis=None)
+        usedTracks = set()
+        usedBlobs = set()
+        pairs = []
+        for idx in order:
+            ti,bi = np.unravel_index(idx,cost.shape)
+            if( not np.isfinite(cost[ti,bi]) ):
+                break
+            if( ti in usedTracks or bi in usedBlobs ):
+                continue
+            usedTracks.add(ti)
+            usedBlobs.add(bi)
+            pairs.append((self.mTracks[ti],blobs[bi]))
+        lostTracks = [t for i,t in enumerate(self.mTracks) if i not in usedTracks]
+        newBlobs = [b for i,b in enumerate(blobs) if i not in usedBlobs]
+        return pairs,lostTracks,newBlobs
+
+    def track(self, img):
+        """
+        **SUMMARY**
+
+        Find the tracked blobs in the next frame.
+
+        **PARAMETERS**
+
+        * *img* - The next frame as a SimpleCV Image.
+
+        **RETURNS**
+
+        A FeatureSet of the blobs that were matched or found in this frame. Each blob
+        has its mTrackID and mVelocity (dx,dy in pixels per frame) set.
+
+        **EXAMPLE**
+
+        >>> tracker = BlobTracker(threshval=100)
+        >>> blobs = tracker.track(img)
+        >>> for b in blobs:
+        >>>     print b.mTrackID, b.mVelocity
+
+        """
+        size = (img.width,img.height)
+        sweep = ( self.mNeedSweep or len(self.mTracks) == 0 or
+                  self.mFrameCount % self.mSweepInterval == 0 )
+        self.mNeedSweep = False
+        self.mFrameCount += 1
+
+        if( sweep ):
+            blobs = list(self._detect(img))
+        else:
+            blobs = []
+            regions = self._mergeRegions([t.searchRegion(self.mMargin,size) for t in self.mTracks])
+            for r in regions:
+                found = self._detect(img,r)
+                for b in found:
+                    if( self._touchesEdge(b,r,size) ):
+                        self.mNeedSweep = True
+                blobs.extend(found)
+
+        pairs,lostTracks,newBlobs = self._associate(blobs)
+        retVal = []
+        for t,b in pairs:
+            t.update(b,self.mSmoothing)
+            retVal.append(b)
+        for t in lostTracks:
+            t.miss()
+            # look for the object everywhere on the next frame
+            self.mNeedSweep = True
+        self.mTracks = [t for t in self.mTracks if t.mMissed <= self.mMaxMissed]
+        # new objects only start tracks on a full sweep, otherwise they could
+        # be a piece of a known object cut off by its search region
+        if( sweep ):
+            for b in newBlobs:
+                t = BlobTrack(self.mNextID,b)
+                self.mNextID += 1
+                self.mTracks.append(t)
+                retVal.append(b)
+        return FeatureSet(retVal)
+
+    def __repr__(self):
+        return "SimpleCV.Features.BlobTracker.BlobTracker object with %d tracks" % len(self.mTracks)
+
+
+from SimpleCV.Features.Features import FeatureSet
+from SimpleCV.Features.BlobMaker import BlobMaker
@@ -0,0 +1,272 @@
+from SimpleCV.base import *
+
+
+class CamShiftTracker:
+    """
+    **SUMMARY**
+
+    The CamShiftTracker follows one object by its color. It learns a hue/saturation
+    histogram of the object from a region of the first frame. In each new frame it
+    converts only a search region around the last position to HSV, backprojects the
+    histogram into it, so each pixel gets the likelihood that it belongs to the object,
+    and moves a window to the center of mass of that likelihood until it stops moving
+    (mean-shift). With camshift on, the window is then resized and given an
+    orientation from the spread of the likelihood, so it follows the object as it
+    turns and changes size.
+
+    The cost of a frame depends on the size of the object, not of the frame, so it is
+    cheap enough to run every frame between the much slower detections that find the
+    object in the first place, like findHaarFeatures.
+
+    **EXAMPLE**
+
+    >>> cam = Camera()
+    >>> img = cam.getImage()
+    >>> faces = img.findHaarFeatures("face")
+    >>> tracker = CamShiftTracker(img,faces[0])
+    >>> while True:
+    >>>     img = cam.getImage()
+    >>>     box = tracker.track(img)
+    >>>     if( box is None ):
+    >>>         break # lost it, run the detector again
+    >>>     img.drawRectangle(*box)
+    >>>     img.show()
+
+    **SEE ALSO**
+
+    :py:meth:`hueHistogram`
+    :py:meth:`toHSV`
+    :py:class:`HaarTracker`
+    :py:class:`BlobTracker`
+
+    """
+    mHistogram = None # the hue x saturation histogram of the object, scaled so the peak is 1
+    mBins = (30,32) # the number of (hue,saturation) bins
+    mBox = None # the (x,y,w,h) bounding box of the object in the last frame
+    mCenter = None # the (x,y) center of the object in the last frame
+    mAxes = None # the (length,width) of the object along and across its orientation
+    mAngle = 0.00 # the orientation of the object in degrees
+    mLost = False
+
+    def __init__(self, img, roi, bins=(30,32), margin=0.5, minSaturation=30, minValue=30,
+                 iterations=10, epsilon=1.0, camshift=True):
+        """
+        **SUMMARY**
+
+        Learn the color of an object and start tracking it.
+
+        **PARAMETERS**
+
+        * *img* - The first frame.
+        * *roi* - The object, either an (x,y,w,h) box or a Feature, like a HaarFeature.
+        * *bins* - The number of (hue,saturation) histogram bins.
+        * *margin* - How far the search region reaches past the last box, as a fraction of its size.
+        * *minSaturation* - Pixels less saturated than this have no reliable hue and are ignored.
+        * *minValue* - Pixels darker than this have no reliable hue and are ignored.
+        * *iterations* - The most mean-shift steps in a frame.
+        * *epsilon* - Stop the mean-shift when the window moves less than this many pixels.
+        * *camshift* - Adapt the size and orientation of the box, otherwise only move it.
+
+        """
+        self.mBins = (int(bins[0]),int(bins[1]))
+        self.mMargin = margin
+        self.mMinSaturation = minSaturation
+        self.mMinValue = minValue
+        self.mIterations = iterations
+        self.mEpsilon = epsilon
+        self.mCamShift = camshift
+        if( isinstance(roi,Feature) ):
+            roi = (roi.minX(),roi.minY(),roi.width(),roi.height())
+        self.learn(img,roi)
+
+    def _clip(self, box, size):
+        """
+        Return an integer (x,y,w,h) box clipped to an image of the given (width,height).
+        """
+        x0 = int(max(0,min(size[0],np.floor(box[0]))))
+        y0 = int(max(0,min(size[1],np.floor(box[1]))))
+        x1 = int(max(0,min(size[0],np.ceil(box[0]+box[2]))))
+        y1 = int(max(0,min(size[1],np.ceil(box[1]+box[3]))))
+        return (x0,y0,x1-x0,y1-y0)
+
+    def _hsv(self, img, box):
+        """
+        Return the (hue bin, saturation bin, usable mask) arrays, indexed [x,y], of a box of an image.
+        """
+        hsv = img.crop(*box).toHSV().getNumpy()
+        hue = hsv[:,:,2].astype(np.int32)
+        sat = hsv[:,:,1].astype(np.int32)
+        mask = (sat >= self.mMinSaturation) & (hsv[:,:,0] >= self.mMinValue)
+        hbin = np.minimum((hue*self.mBins[0])//180,self.mBins[0]-1)
+        sbin = (sat*self.mBins[1])//256
+        return hbin,sbin,mask
+
+    def learn(self, img, roi):
+        """
+        **SUMMARY**
+
+        Learn the color histogram of the object from a region of an image and move the
+        tracker to that region.
+
+        **PARAMETERS**
+
+        * *img* - The Image.
+        * *roi* - The (x,y,w,h) region of the object.
+
+        """
+        box = self._clip(roi,(img.width,img.height))
+        hist = np.zeros(self.mBins,dtype=np.float64)
+        if( box[2] > 0 and box[3] > 0 ):
+            hbin,sbin,mask = self._hsv(img,box)
+            hist = np.bincount(hbin[mask]*self.mBins[1]+sbin[mask],
+                               minlength=self.mBins[0]*self.mBins[1]).reshape(self.mBins).astype(np.float64)
+        if( hist.max() > 0 ):
+            hist /= hist.max()
+        else:
+            warnings.warn("CamShiftTracker: the region has no usable color, try lowering minSaturation or minValue.")
+        self.mHistogram = hist
+        self.mBox = box
+        self.mCenter = (box[0]+box[2]/2.0,box[1]+box[3]/2.0)
+        self.mAxes = (float(max(box[2],box[3])),float(min(box[2],box[3])))
+        self.mAngle = 0.00
+        if( box[3] > box[2] ):
+            self.mAngle = 90.00
+        self.mLost = False
+
+    def backProject(self, img, box=None):
+        """
+        **SUMMARY**
+
+        Return the likelihood, between 0 and 1, that each pixel of a region belongs to
+        the object, as a numpy array indexed [x,y].
+
+        **PARAMETERS**
+
+        * *img* - The Image.
+        * *box* - The (x,y,w,h) region, the whole image by default.
+
+        """
+        if( box is None ):
+            box = (0,0,img.width,img.height)
+        hbin,sbin,mask = self._hsv(img,self._clip(box,(img.width,img.height)))
+        return self.mHistogram[hbin,sbin]*mask
+
+    def track(self, img):
+        """
+        **SUMMARY**
+
+        Find the object in the next frame.
+
+        **PARAMETERS**
+
+        * *img* - The next frame.
+
+        **RETURNS**
+
+        The (x,y,w,h) bounding box of the object, or None if it was lost. The center,
+        axes and orientation are available from center(), axes() and angle().
+
+        """
+        size = (img.width,img.height)
+        x,y,w,h = self.mBox
+        region = self._clip((x-self.mMargin*w,y-self.mMargin*h,w*(1+2*self.mMargin),h*(1+2*self.mMargin)),size)
+        if( region[2] == 0 or region[3] == 0 ):
+            self.mLost = True
+            return None
+        prob = self.backProject(img,region)
+        # the window in region coordinates
+        wx,wy,ww,wh = float(x-region[0]),float(y-region[1]),float(max(w,1)),float(max(h,1))
+        for i in range(self.mIterations):
+            x0,y0,cw,ch = self._clip((wx,wy,ww,wh),(region[2],region[3]))
+            win = prob[x0:x0+cw,y0:y0+ch]
+            m00 = win.sum()
+            if( m00 <= 0 ):
+                self.mLost = True
+                return None
+            cx = x0+np.dot(np.arange(cw),win.sum(axis=1))/m00
+            cy = y0+np.dot(np.arange(ch),win.sum(axis=0))/m00
+            nx = cx-(ww-1)/2.0
+            ny = cy-(wh-1)/2.0
+            moved = max(abs(nx-wx),abs(ny-wy))
+            wx,wy = nx,ny
+            if( moved < self.mEpsilon ):
+                break
+
+        x0,y0,cw,ch = self._clip((wx,wy,ww,wh),(region[2],region[3]))
+        win = prob[x0:x0+cw,y0:y0+ch]
+        m00 = win.sum()
+        if( m00 <= 0 ):
+            self.mLost = True
+            return None
+        xs = np.arange(cw,dtype=np.float64)[:,np.newaxis]
+        ys = np.arange(ch,dtype=np.float64)[np.newaxis,:]
+        cx = (xs*win).sum()/m00
+        cy = (ys*win).sum()/m00
+        self.mCenter = (region[0]+x0+cx,region[1]+y0+cy)
+        if( self.mCamShift ):
+            # the size and orientation of the likelihood blob from its second moments
+            a = (((xs-cx)**2)*win).sum()/m00
+            b = ((xs-cx)*(ys-cy)*win).sum()/m00
+            c = (((ys-cy)**2)*win).sum()/m00
+            root = np.sqrt(4*b*b+(a-c)**2)
+            theta = np.arctan2(2*b,a-c+root)
+            length = max(4*np.sqrt(max((a+c+root)/2.0,0)),1.0)
+            width = max(4*np.sqrt(max((a+c-root)/2.0,0)),1.0)
+            self.mAxes = (length,width)
+            self.mAngle = np.degrees(theta)
+            bw = abs(length*np.cos(theta))+abs(width*np.sin(theta))
+            bh = abs(length*np.sin(theta))+abs(width*np.cos(theta))
+        else:
+            bw,bh = w,h
+        self.mBox = self._clip((self.mCenter[0]-bw/2.0,self.mCenter[1]-bh/2.0,bw,bh),size)
+        if( self.mBox[2] == 0 or self.mBox[3] == 0 ):
+            self.mLost = True
+            return None
+        self.mLost = False
+        return self.mBox
+
+    def box(self):
+        """
+        **SUMMARY**
+
+        Return the (x,y,w,h) bounding box of the object in the last frame.
+        """
+        return self.mBox
+
+    def center(self):
+        """
+        **SUMMARY**
+
+        Return the (x,y) center of the object in the last frame.
+        """
+        return self.mCenter
+
+    def axes(self):
+        """
+        **SUMMARY**
+
+        Return the (length,width) of the object along and across its orientation.
+        """
+        return self.mAxes
+
+    def angle(self):
+        """
+        **SUMMARY**
+
+        Return the orientation of the object's long axis in degrees.
+        """
+        return self.mAngle
+
+    def isLost(self):
+        """
+        **SUMMARY**
+
+        Return True if the object was not found in the last frame.
+        """
+        return self.mLost
+
+    def __repr__(self):
+        return "SimpleCV.Features.CamShiftTracker.CamShiftTracker object at %s" % str(self.mBox)
+
+
+from SimpleCV.Features.Features import Feature
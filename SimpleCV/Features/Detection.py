@@ -410,6 +410,7 @@ class HaarFeature(Feature):
     _height = ""
     neighbors = ''
     featureName = 'None'
+    mParts = None # the part detections inside this feature, by cascade name
     
     def __init__(self, i, haarobject, haarclassifier = None):
         self.image = i
@@ -469,8 +470,13 @@ class HaarFeature(Feature):
         >>> print faces[-1].meanColor()
 
         """
-        crop = self.image[self.points[0][0]:self.points[1][0], self.points[0][1]:self.points[2][1]]
-        return crop.meanColor()
+        return tuple(self.image.regionStats([self._statsRegion()])[0][0])
+
+    def _statsRegion(self):
+        return (self.points[0][0],self.points[0][1],self.points[1][0]-self.points[0][0],self.points[2][1]-self.points[0][1])
+
+    def _suppressionScore(self):
+        return self.neighbors
   
     def length(self):
         """
@@ -563,6 +569,36 @@ class HaarFeature(Feature):
         Get the height of the feature.
         """    
         return self._height
+
+    def parts(self, name=None):
+        """
+        **SUMMARY**
+
+        Get the parts found inside this feature by Image.findHaarCascades, e.g. the
+        eyes of a face.
+
+        **PARAMETERS**
+
+        * *name* - The name of the part cascade, or None for all of them.
+
+        **RETURNS**
+
+        A FeatureSet of the HaarFeatures found with the named cascade, or a dictionary of
+        them by cascade name if no name is given. Parts that were not searched for give an
+        empty FeatureSet.
+
+        **EXAMPLE**
+
+        >>> found = img.findHaarCascades(["face"],parts={"face":["eye","mouth"]})
+        >>> for face in found["face"]:
+        >>>     print len(face.parts("eye"))
+
+        """
+        if( self.mParts is None ):
+            self.mParts = {}
+        if( name is None ):
+            return self.mParts
+        return self.mParts.get(name,FeatureSet())
 ######################################################################  
 class Chessboard(Feature):
     """
@@ -654,11 +690,13 @@ class TemplateMatch(Feature):
     quality = 0
     w = 0
     h = 0 
+    mLowerIsBetter = False # True for the SQR_DIFF methods, where the best match has the lowest quality
 
-    def __init__(self, image, template, location, quality):
+    def __init__(self, image, template, location, quality, lowerIsBetter=False):
         self.template_image = template
         self.image = image
         self.quality = quality
+        self.mLowerIsBetter = lowerIsBetter
         self.x = location[0]
         self.y = location[1]
         self.points = [location,
@@ -667,6 +705,11 @@ class TemplateMatch(Feature):
                         (location[0], location[1] + template.height)]
         self.boundingBox = self.points
 
+    def _suppressionScore(self):
+        if( self.mLowerIsBetter ):
+            return -self.quality
+        return self.quality
+
     def getExtents(self):
         """
         **SUMMARY**
@@ -873,14 +916,12 @@ class Circle(Feature):
         >>> c[-1].meanColor()
 
         """
-        #generate the mask
         if( self.avgColor is None):
-            mask = self.image.getEmpty(1)
-            cv.Zero(mask)
-            cv.Circle(mask,(self.x,self.y),self.r,color=(255,255,255),thickness=-1)
-            temp = cv.Avg(self.image.getBitmap(),mask)
-            self.avgColor = (temp[0],temp[1],temp[2])
+            self.avgColor = tuple(self.image.regionStats([self._statsRegion()])[0][0])
         return self.avgColor
+
+    def _statsRegion(self):
+        return (self.x,self.y,self.r)
   
 #    def colorDistance(self, color = (0, 0, 0)): 
 #        """
@@ -1158,14 +1199,15 @@ class KeyPoint(Feature):
         >>> c = kp[0].meanColor()
 
         """
-        #generate the mask
         if( self.avgColor is None):
-            mask = self.image.getEmpty(1)
-            cv.Zero(mask)
-            cv.Circle(mask,(int(self.x),int(self.y)),int(self.r),color=(255,255,255),thickness=-1)
-            temp = cv.Avg(self.image.getBitmap(),mask)
-            self.avgColor = (temp[0],temp[1],temp[2])
+            self.avgColor = tuple(self.image.regionStats([self._statsRegion()])[0][0])
         return self.avgColor
+
+    def _statsRegion(self):
+        return (int(self.x),int(self.y),int(self.r))
+
+    def _suppressionScore(self):
+        return self.mResponse
   
     def colorDistance(self, color = (0, 0, 0)): 
         """
@@ -1381,9 +1423,12 @@ class Motion(Feature):
         >>> c = kp.meanColor()
 
         """
+        return tuple(self.image.regionStats([self._statsRegion()])[0][0])
+
+    def _statsRegion(self):
         x = int(self.x-(self.window/2))
         y = int(self.y-(self.window/2))
-        return self.image.crop(x,y,int(self.window),int(self.window)).meanColor()
+        return (x,y,int(self.window),int(self.window))
 
     
     def crop(self):
@@ -1412,6 +1457,7 @@ class KeypointMatch(Feature):
     avgColor = None
     homography = []
     template = None
+    mName = None # the name of the matched object, for KeypointDatabase matches
     def __init__(self, image,template,minRect,homography):
         self.image = image
         self.template = template
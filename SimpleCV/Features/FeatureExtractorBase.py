@@ -36,6 +36,16 @@ class FeatureExtractorBase(object):
         object of all of the features. These features can be of any interal type
         (string, float, integer) but must contain no sub lists.
         """
+
+    def extractBatch(self, batch):
+        """
+        Given a batch of images stacked in an NxHxWx3 uint8 RGB numpy array, like
+        the one FeatureSet.cropBatch() returns, extract the feature vector of each
+        one and return them as an NxF numpy array. By default every image is turned
+        back into an Image and passed to extract(); extractors that can work on the
+        whole array at once override this.
+        """
+        return np.array([self.extract(Image(b.transpose(1,0,2).copy())) for b in batch])
     
     @abc.abstractmethod    
     def getFieldNames(self):
@@ -6,6 +6,7 @@
 #load system libraries
 from SimpleCV.base import *
 from SimpleCV.Color import *
+from SimpleCV.Features.SpatialIndex import SpatialIndex, suppressBoxes
 import copy
 import types
 
@@ -25,6 +26,11 @@ class FeatureSet(list):
     >>> lines.x()
     >>> lines.crop()
     """
+    mIndexThreshold = 64 # region queries on sets at least this big go through the spatial index
+    mSpatialIndex = None # the lazily built SpatialIndex of the feature bounds
+    mSpatialIndexKey = None # the length of the set when the index was built
+    mExtents = None # an Nx4 array of the (minx,miny,maxx,maxy) extents of each feature
+
     def __getitem__(self,key):
         """
         **SUMMARY**
@@ -44,6 +50,64 @@ class FeatureSet(list):
         Deprecated since python 2.0, now using __getitem__
         """
         return self.__getitem__(slice(i,j))
+
+    # the list methods that change the set drop the spatial index, so spatialIndex()
+    # knows to rebuild it without comparing every feature on every query
+    def _invalidate(self):
+        self.mSpatialIndex = None
+        self.mExtents = None
+
+    def __setitem__(self, key, value):
+        self._invalidate()
+        list.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._invalidate()
+        list.__delitem__(self, key)
+
+    def __setslice__(self, i, j, values):
+        self._invalidate()
+        list.__setslice__(self, i, j, values)
+
+    def __delslice__(self, i, j):
+        self._invalidate()
+        list.__delslice__(self, i, j)
+
+    def __iadd__(self, other):
+        self._invalidate()
+        return list.__iadd__(self, other)
+
+    def __imul__(self, n):
+        self._invalidate()
+        return list.__imul__(self, n)
+
+    def append(self, feature):
+        self._invalidate()
+        list.append(self, feature)
+
+    def extend(self, features):
+        self._invalidate()
+        list.extend(self, features)
+
+    def insert(self, i, feature):
+        self._invalidate()
+        list.insert(self, i, feature)
+
+    def remove(self, feature):
+        self._invalidate()
+        list.remove(self, feature)
+
+    def pop(self, *args):
+        self._invalidate()
+        return list.pop(self, *args)
+
+    def reverse(self):
+        self._invalidate()
+        list.reverse(self)
+
+    def sort(self, *args, **kwargs):
+        self._invalidate()
+        list.sort(self, *args, **kwargs)
         
     def draw(self, color = Color.GREEN,width=1, autocolor = False):
         """
@@ -264,7 +328,7 @@ class FeatureSet(list):
         """
         return FeatureSet(sorted(self, key = lambda f: f.distanceFrom(point)))
         
-    def distancePairs(self):
+    def distancePairs(self, maxDistance=None):
         """
         **SUMMARY**
 
@@ -272,9 +336,15 @@ class FeatureSet(list):
         The resulting N x N array can be used to quickly look up distances
         between features.
 
+        **PARAMETERS**
+
+        * *maxDistance* - If this is given only the pairs that are at most this far apart are
+          found, using the spatial index rather than computing every pair.
+
         **RETURNS**
 
-        A NxN np matrix of distance values. 
+        A NxN np matrix of distance values. If maxDistance is given, a Kx3 numpy array
+        of (i, j, distance) rows with i < j instead.
 
         **EXAMPLE**
 
@@ -282,9 +352,66 @@ class FeatureSet(list):
         >>> feats = img.findBlobs()
         >>> d = feats.distancePairs()
         >>> print d
-                
+        >>> close = feats.distancePairs(maxDistance=20)
+
         """
+        if( maxDistance is not None ):
+            return self.spatialIndex().pairsWithin(maxDistance)
         return spsd.squareform(spsd.pdist(self.coordinates()))
+
+    def nonMaxSuppression(self, overlap=0.3, scoreKey=None):
+        """
+        **SUMMARY**
+
+        Remove overlapping duplicate detections. The features are ranked by score and,
+        working down from the best one, every remaining feature whose bounding box
+        overlaps a kept feature by more than the overlap ratio is dropped. The overlaps
+        are computed as intersection over union of the boxes, for all of the remaining
+        features at once. This works for any feature with a bounding box, e.g. the
+        results of findTemplate, findHaarFeatures, findCircle and findKeypoints.
+
+        **PARAMETERS**
+
+        * *overlap* - The largest intersection over union two kept features may have, from
+          0 to 1. With 0 any two features that overlap at all are merged.
+        * *scoreKey* - How to rank the features, higher scores win. This can be the name of
+          a feature attribute or method, a function that takes a feature, or a list of scores.
+          By default each feature type uses its own score: the quality of a TemplateMatch
+          (negated for the SQR_DIFF methods, where lower is better), the response of a
+          KeyPoint, the number of neighbors of a HaarFeature, and the area of anything else.
+
+        **RETURNS**
+
+        A FeatureSet of the kept features, best score first.
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> faces = img.findHaarFeatures("face.xml")
+        >>> faces = faces.nonMaxSuppression(0.3)
+        >>> kp = img.findKeypoints().nonMaxSuppression(0.5,"quality")
+
+        """
+        if( len(self) == 0 ):
+            return FeatureSet()
+        if( scoreKey is None ):
+            scores = [f._suppressionScore() for f in self]
+        elif( isinstance(scoreKey,basestring) ):
+            scores = []
+            for f in self:
+                s = getattr(f,scoreKey)
+                scores.append(s() if callable(s) else s)
+        elif( callable(scoreKey) ):
+            scores = [scoreKey(f) for f in self]
+        else:
+            scores = scoreKey
+        scores = np.array(scores,dtype=np.float64).ravel()
+        if( len(scores) != len(self) ):
+            warnings.warn("FeatureSet.nonMaxSuppression: there must be one score per feature.")
+            return None
+
+        _,boxes = self._bounds()
+        return FeatureSet([self[i] for i in suppressBoxes(boxes,scores,overlap)])
   
     def angle(self):
         """
@@ -383,9 +510,30 @@ class FeatureSet(list):
         >>> kp = img.findKeypoints()
         >>> c = kp.meanColor()
 
-        
-        """
-        return np.array([f.meanColor() for f in self])
+        **NOTES**
+
+        Features that average over a rectangle, circle or mask (blobs, haar features,
+        circles, keypoints and motion vectors) are done in one batch per image with
+        :py:meth:`Image.regionStats` instead of one at a time.
+        
+        """
+        regions = [f._statsRegion() for f in self]
+        batches = {}
+        for i,r in enumerate(regions):
+            if( r is not None ):
+                batches.setdefault(id(self[i].image),[]).append(i)
+        if( len(batches) == 0 ):
+            return np.array([f.meanColor() for f in self])
+        retVal = np.zeros((len(self),3))
+        done = np.zeros(len(self),dtype=bool)
+        for idx in batches.values():
+            stats = self[idx[0]].image.regionStats([regions[i] for i in idx])
+            if( stats is not None ):
+                retVal[idx] = stats[0]
+                done[idx] = True
+        for i in np.flatnonzero(~done):
+            retVal[i] = self[i].meanColor()[0:3]
+        return retVal
   
     def colorDistance(self, color = (0, 0, 0)):
         """
@@ -417,7 +565,8 @@ class FeatureSet(list):
         Return a sorted FeatureSet with features closest to a given color first.
         Default is black, so sortColorDistance() will return darkest to brightest
         """
-        return FeatureSet(sorted(self, key = lambda f: f.colorDistance(color)))
+        d = self.colorDistance(color)
+        return FeatureSet([self[i] for i in np.argsort(d,kind='mergesort')])
   
     def filter(self, filterarray):
         """
@@ -508,6 +657,127 @@ class FeatureSet(list):
         """
         return np.array([f.crop() for f in self])  
 
+    def _cropBoxes(self):
+        """
+        Return an Nx4 float array of the (x,y,w,h) region each feature's crop() covers.
+        """
+        boxes = np.zeros((len(self),4))
+        for i,f in enumerate(self):
+            r = f._statsRegion()
+            if( isinstance(r,tuple) and len(r) == 4 ):
+                boxes[i] = r
+            else:
+                w = float(f.width())
+                h = float(f.height())
+                boxes[i] = (f.x-w/2.0,f.y-h/2.0,w,h)
+        return boxes
+
+    def cropBatch(self, size=(64,64), padding=0.0, aspect="stretch", fill=(0,0,0), interpolation="bilinear"):
+        """
+        **SUMMARY**
+
+        Crop every feature out of its image, resize them all to the same size and stack
+        them into one contiguous numpy array. All of the crops from an image are sampled
+        in a single vectorized pass, so this is much faster than calling crop() and
+        resize() on each feature, and the result can be handed straight to a feature
+        extractor's extractBatch() method or to a classifier.
+
+        **PARAMETERS**
+
+        * *size* - The (width,height) of each crop in the batch.
+        * *padding* - Grow each feature's box by this fraction of its width and height on every side, to take in some context.
+        * *aspect* - How to handle features whose shape does not match size:
+
+          * "stretch" - resize the box to fill the crop, ignoring its aspect ratio.
+          * "fit" - scale the box to fit inside the crop and fill the borders with the fill color.
+          * "expand" - grow the box around its center to the crop's aspect ratio, so the borders show more of the image.
+
+        * *fill* - The RGB color used for the parts of a crop that fall outside the image (or outside the box when aspect is "fit").
+        * *interpolation* - "bilinear" or "nearest".
+
+        **RETURNS**
+
+        An NxHxWx3 uint8 numpy array, indexed as [feature,y,x,channel] with the channels
+        in RGB order. Note that this is row major, unlike Image.getNumpy().
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> faces = img.findHaarFeatures("face.xml")
+        >>> batch = faces.cropBatch((32,32),padding=0.1,aspect="expand")
+        >>> hue = HueHistogramFeatureExtractor().extractBatch(batch)
+
+        **SEE ALSO**
+
+        :py:meth:`crop`
+        :py:meth:`FeatureExtractorBase.extractBatch`
+
+        """
+        W,H = int(size[0]),int(size[1])
+        if( aspect not in ["stretch","fit","expand"] ):
+            warnings.warn("FeatureSet.cropBatch - aspect must be stretch, fit or expand.")
+            return None
+        retVal = np.zeros((len(self),H,W,3),dtype=np.uint8)
+        retVal[:] = np.array(fill,dtype=np.uint8)[0:3]
+        if( len(self) == 0 ):
+            return retVal
+        boxes = self._cropBoxes()
+        boxes[:,0] -= boxes[:,2]*padding
+        boxes[:,1] -= boxes[:,3]*padding
+        boxes[:,2:4] *= 1.0+2.0*padding
+        boxes[:,2:4] = np.maximum(boxes[:,2:4],1e-6)
+        # output pixels per source pixel
+        sx = W/boxes[:,2]
+        sy = H/boxes[:,3]
+        if( aspect != "stretch" ):
+            sx = sy = np.minimum(sx,sy)
+        cx = boxes[:,0]+boxes[:,2]/2.0
+        cy = boxes[:,1]+boxes[:,3]/2.0
+        # the continuous source coordinate of the center of every output pixel
+        u = cx[:,np.newaxis]+(np.arange(W)[np.newaxis,:]+0.5-W/2.0)/sx[:,np.newaxis]
+        v = cy[:,np.newaxis]+(np.arange(H)[np.newaxis,:]+0.5-H/2.0)/sy[:,np.newaxis]
+        groups = {}
+        for i,f in enumerate(self):
+            groups.setdefault(id(f.image),[]).append(i)
+        for idx in groups.values():
+            img = self[idx[0]].image
+            data = img.getNumpy()
+            # keep the temporaries to a few tens of megabytes
+            step = max(1,(1<<21)//(W*H))
+            for start in range(0,len(idx),step):
+                sel = np.array(idx[start:start+step])
+                uu = u[sel][:,np.newaxis,:]
+                vv = v[sel][:,:,np.newaxis]
+                valid = (uu >= 0) & (uu < img.width) & (vv >= 0) & (vv < img.height)
+                if( aspect == "fit" ):
+                    b = boxes[sel]
+                    valid &= ( (uu >= b[:,0,np.newaxis,np.newaxis]) & (uu < (b[:,0]+b[:,2])[:,np.newaxis,np.newaxis]) &
+                               (vv >= b[:,1,np.newaxis,np.newaxis]) & (vv < (b[:,1]+b[:,3])[:,np.newaxis,np.newaxis]) )
+                if( interpolation == "nearest" ):
+                    xi = np.clip(np.floor(uu),0,img.width-1).astype(np.int64)
+                    yi = np.clip(np.floor(vv),0,img.height-1).astype(np.int64)
+                    out = data[xi,yi]
+                else:
+                    px = uu-0.5
+                    py = vv-0.5
+                    x0 = np.floor(px)
+                    y0 = np.floor(py)
+                    fx = (px-x0)[:,:,:,np.newaxis]
+                    fy = (py-y0)[:,:,:,np.newaxis]
+                    x0 = x0.astype(np.int64)
+                    y0 = y0.astype(np.int64)
+                    xa = np.clip(x0,0,img.width-1)
+                    xb = np.clip(x0+1,0,img.width-1)
+                    ya = np.clip(y0,0,img.height-1)
+                    yb = np.clip(y0+1,0,img.height-1)
+                    out = ( (data[xa,ya]*(1-fx)+data[xb,ya]*fx)*(1-fy) +
+                            (data[xa,yb]*(1-fx)+data[xb,yb]*fx)*fy )
+                    out = np.clip(np.round(out),0,255).astype(np.uint8)
+                crops = retVal[sel]
+                crops[valid] = out[valid]
+                retVal[sel] = crops
+        return retVal
+
     def inside(self,region):
         """
         **SUMMARY**
@@ -539,9 +809,13 @@ class FeatureSet(list):
         **NOTE**
         
         This currently performs a bounding box test, not a full polygon test for speed. 
+        Large sets only test the features near the region, see :py:meth:`spatialIndex`.
 
 
         """
+        candidates = self._regionCandidates(region)
+        if( candidates is not None ):
+            return FeatureSet([self[i] for i in candidates if self[i].isContainedWithin(region)])
         fs = FeatureSet()
         for f in self:
             if(f.isContainedWithin(region)):
@@ -581,8 +855,14 @@ class FeatureSet(list):
         **NOTE**
         
         This currently performs a bounding box test, not a full polygon test for speed. 
+        Large sets only test the features near the region, see :py:meth:`spatialIndex`.
 
         """
+        candidates = self._regionCandidates(region)
+        if( candidates is not None ):
+            # anything that does not touch the region is outside of it
+            inside = set([i for i in candidates if self[i].isContainedWithin(region)])
+            return FeatureSet([f for i,f in enumerate(self) if i not in inside])
         fs = FeatureSet()
         for f in self:
             if(f.isNotContainedWithin(region)):
@@ -620,8 +900,12 @@ class FeatureSet(list):
         **NOTE**
         
         This currently performs a bounding box test, not a full polygon test for speed. 
+        Large sets only test the features near the region, see :py:meth:`spatialIndex`.
 
         """
+        candidates = self._regionCandidates(region)
+        if( candidates is not None ):
+            return FeatureSet([self[i] for i in candidates if self[i].overlaps(region)])
         fs = FeatureSet()
         for f in self: 
             if( f.overlaps(region) ):
@@ -659,8 +943,12 @@ class FeatureSet(list):
         **NOTE**
         
         This currently performs a bounding box test, not a full polygon test for speed. 
+        Large sets only test the features near the region, see :py:meth:`spatialIndex`.
 
         """
+        candidates = self._sideCandidates(region,3,Feature.minY,1,True)
+        if( candidates is not None ):
+            return FeatureSet([self[i] for i in candidates if self[i].above(region)])
         fs = FeatureSet()
         for f in self: 
             if(f.above(region)):
@@ -698,8 +986,12 @@ class FeatureSet(list):
         **NOTE**
         
         This currently performs a bounding box test, not a full polygon test for speed. 
+        Large sets only test the features near the region, see :py:meth:`spatialIndex`.
 
         """
+        candidates = self._sideCandidates(region,1,Feature.maxY,1,False)
+        if( candidates is not None ):
+            return FeatureSet([self[i] for i in candidates if self[i].below(region)])
         fs = FeatureSet()
         for f in self: 
             if(f.below(region)):
@@ -737,8 +1029,12 @@ class FeatureSet(list):
         **NOTE**
         
         This currently performs a bounding box test, not a full polygon test for speed. 
+        Large sets only test the features near the region, see :py:meth:`spatialIndex`.
 
         """
+        candidates = self._sideCandidates(region,2,Feature.minX,0,True)
+        if( candidates is not None ):
+            return FeatureSet([self[i] for i in candidates if self[i].left(region)])
         fs = FeatureSet()
         for f in self: 
             if(f.left(region)):
@@ -776,14 +1072,197 @@ class FeatureSet(list):
         **NOTE**
         
         This currently performs a bounding box test, not a full polygon test for speed. 
+        Large sets only test the features near the region, see :py:meth:`spatialIndex`.
 
         """
+        candidates = self._sideCandidates(region,0,Feature.maxX,0,False)
+        if( candidates is not None ):
+            return FeatureSet([self[i] for i in candidates if self[i].right(region)])
         fs = FeatureSet()
         for f in self: 
             if(f.right(region)):
                 fs.append(f)
         return fs
     
+    def spatialIndex(self, rebuild=False):
+        """
+        **SUMMARY**
+
+        Return a :py:class:`SpatialIndex` of the bounds of the features in the set. The index
+        is built the first time it is asked for and rebuilt whenever features are added to or
+        removed from the set. Region queries (inside, outside, overlaps, above, below, left
+        and right) use it automatically once the set has mIndexThreshold or more features, so
+        only the features near the region get the full test.
+
+        **PARAMETERS**
+
+        * *rebuild* - Force the index to be rebuilt. Use this if features in the set have
+          been moved or changed shape since the index was built.
+
+        **RETURNS**
+
+        A SpatialIndex whose box indices match the positions of the features in the set.
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> feats = img.findBlobs()
+        >>> idx = feats.spatialIndex()
+        >>> near = [feats[i] for i in idx.query((100,100,150,150))]
+
+        """
+        # the list methods drop the index when the set changes, the length check is a
+        # cheap guard against changes made through list's own methods
+        key = len(self)
+        if( rebuild or self.mSpatialIndex is None or self.mSpatialIndexKey != key ):
+            extents,bounds = self._bounds()
+            # grow the bounds a pixel so tests that round points to pixels are not missed
+            bounds[:,0:2] -= 1
+            bounds[:,2:4] += 1
+            self.mExtents = extents
+            self.mSpatialIndex = SpatialIndex(bounds,self.coordinates().reshape((-1,2)))
+            self.mSpatialIndexKey = key
+        return self.mSpatialIndex
+
+    def _bounds(self):
+        """
+        Return two Nx4 arrays of (minx,miny,maxx,maxy) boxes: the extents of each
+        feature's points, and those extents grown to take in its bounding box.
+        """
+        extents = np.zeros((len(self),4))
+        bounds = np.zeros((len(self),4))
+        for i,f in enumerate(self):
+            maxx,maxy,minx,miny = f.extents()
+            extents[i] = (minx,miny,maxx,maxy)
+            bounds[i] = extents[i]
+            bb = f.boundingBox
+            if( np.all(np.isfinite(extents[i])) and isinstance(bb,(list,tuple)) and len(bb) > 0 ):
+                bb = np.array(bb,dtype=np.float64).reshape((-1,2))
+                bounds[i,0:2] = np.minimum(bounds[i,0:2],bb.min(axis=0))
+                bounds[i,2:4] = np.maximum(bounds[i,2:4],bb.max(axis=0))
+        return extents,bounds
+
+    def _regionBounds(self, region):
+        """
+        Return the (minx,miny,maxx,maxy) bounds of a region argument, or None if the
+        region is not one of the types the region queries understand.
+        """
+        if( isinstance(region,Feature) ):
+            bounds = FeatureSet([region]).spatialIndex().mBounds[0]
+            if( not np.all(np.isfinite(bounds)) ):
+                return None
+            return bounds
+        elif( (isinstance(region,tuple) and len(region)==2) or ( isinstance(region,np.ndarray) and region.shape == (2,)) ):
+            return (region[0],region[1],region[0],region[1])
+        elif( isinstance(region,tuple) and len(region)==3 and not isinstance(region[0],tuple) ): # a circle
+            r = abs(region[2])
+            return (region[0]-r,region[1]-r,region[0]+r,region[1]+r)
+        elif( isinstance(region,tuple) and len(region)==4 and ( isinstance(region[0],float) or isinstance(region[0],int))):
+            x0,x1 = sorted((region[0],region[0]+region[2]))
+            y0,y1 = sorted((region[1],region[1]+region[3]))
+            return (x0,y0,x1,y1)
+        elif( isinstance(region,list) and len(region) >= 3 ): # a polygon
+            pts = np.array(region,dtype=np.float64).reshape((-1,2))
+            return (pts[:,0].min(),pts[:,1].min(),pts[:,0].max(),pts[:,1].max())
+        return None
+
+    def _regionCandidates(self, region):
+        """
+        Return the indices of the features whose bounds touch the region, or None if the
+        set is too small to bother with the index or the region type is not understood.
+        """
+        if( len(self) < self.mIndexThreshold ):
+            return None
+        bounds = self._regionBounds(region)
+        if( bounds is None ):
+            return None
+        return self.spatialIndex().query(bounds)
+
+    def _sideCandidates(self, region, edge, regionEdge, axis, less):
+        """
+        Return the indices of the features whose extent along one edge is less (or greater)
+        than the matching edge of the region, or None if the set is small or the region
+        type is not understood. This is the same comparison Feature.above and friends
+        make, done for the whole set at once.
+        """
+        if( len(self) < self.mIndexThreshold ):
+            return None
+        if( isinstance(region,Feature) ):
+            value = regionEdge(region)
+        elif( isinstance(region,tuple) or isinstance(region,np.ndarray) ):
+            value = region[axis]
+        elif( isinstance(region,float) or isinstance(region,int) ):
+            value = region
+        else:
+            return None
+        self.spatialIndex()
+        col = self.mExtents[:,edge]
+        if( less ):
+            return np.flatnonzero(col < value)
+        return np.flatnonzero(col > value)
+
+    def nearest(self, point, k=1):
+        """
+        **SUMMARY**
+
+        Return the k features whose coordinates are closest to a point, using the spatial index.
+
+        **PARAMETERS**
+
+        * *point* - An (x,y) tuple.
+        * *k* - The number of features to return.
+
+        **RETURNS**
+
+        A FeatureSet of at most k features, nearest first.
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> feats = img.findBlobs()
+        >>> feats.nearest((100,100),k=3).draw()
+
+        """
+        d,idx = self.spatialIndex().nearest(point,k)
+        return FeatureSet([self[i] for i in idx[0] if i < len(self)])
+
+    def overlapPairs(self, other=None):
+        """
+        **SUMMARY**
+
+        Find every pair of features, one from this set and one from another, that overlap.
+        The spatial indices of the two sets are joined first so only pairs whose bounds touch
+        are given the full overlaps test, instead of testing every pair.
+
+        **PARAMETERS**
+
+        * *other* - Another FeatureSet. If this is None the set is joined with itself and
+          each pair is reported once.
+
+        **RETURNS**
+
+        A list of (feature from this set, feature from other) tuples where the first
+        feature's overlaps() method returned true for the second.
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> blobs = img.findBlobs()
+        >>> circles = img.findCircle()
+        >>> for b,c in blobs.overlapPairs(circles):
+        >>>     b.draw()
+
+        """
+        selfJoin = other is None or other is self
+        if( selfJoin ):
+            other = self
+        elif( not isinstance(other,FeatureSet) ):
+            other = FeatureSet(other)
+        pairs = self.spatialIndex().overlapPairs(other.spatialIndex())
+        if( selfJoin ):
+            pairs = pairs[pairs[:,0] < pairs[:,1]]
+        return [(self[i],other[j]) for i,j in pairs if self[i].overlaps(other[j])]
+
     @property
     def image(self):
         if not len(self):
@@ -935,6 +1414,21 @@ class Feature(object):
         
         """
         return self.image[self.x, self.y]
+
+    def _statsRegion(self):
+        """
+        Return the region meanColor averages over as an (x,y,w,h) rectangle, an (x,y,r)
+        circle or an RLEMask, so FeatureSet.meanColor can do a whole set at once with
+        Image.regionStats. Features whose meanColor works some other way return None.
+        """
+        return None
+
+    def _suppressionScore(self):
+        """
+        Return the score FeatureSet.nonMaxSuppression ranks this feature by when it is
+        not given one, bigger is better. By default this is the area.
+        """
+        return self.area()
   
     def colorDistance(self, color = (0, 0, 0)): 
         """
@@ -1556,27 +2050,16 @@ class Feature(object):
         retVal = False
         bounds = self.boundingBox
         if( isinstance(other,Feature) ):# A feature
-            retVal = True
-            for p in other.points: # this isn't completely correct - only tests if points lie in poly, not edges.            
-                p2 = (int(p[0]),int(p[1]))
-                retVal = self._pointInsidePolygon(p2,bounds)
-                if( not retVal ):
-                    break
+            # this isn't completely correct - only tests if points lie in poly, not edges.
+            pts = np.asarray(other.points).reshape((-1,2)).astype(np.int64)
+            retVal = bool(np.all(self._pointsInsidePolygon(pts,bounds)))
         # a single point        
         elif( (isinstance(other,tuple) and len(other)==2) or ( isinstance(other,np.ndarray) and other.shape[0]==2) ):
             retVal = self._pointInsidePolygon(other,bounds)
 
         elif( isinstance(other,tuple) and len(other)==3 ): # A circle
             #assume we are in x,y, r format 
-            retVal = True
-            rr = other[2]*other[2]
-            x = other[0]
-            y = other[1]
-            for p in bounds:
-                test = ((x-p[0])*(x-p[0]))+((y-p[1])*(y-p[1]))
-                if( test < rr ):
-                    retVal = False
-                    break
+            retVal = not np.any(self._distanceSquared(bounds,other) < other[2]*other[2])
 
         elif( isinstance(other,tuple) and len(other)==4 and ( isinstance(other[0],float) or isinstance(other[0],int))): 
             retVal = ( self.maxX() <= other[0]+other[2] and
@@ -1585,12 +2068,7 @@ class Feature(object):
                        self.minY() >= other[1] )
         elif(isinstance(other,list) and len(other) >= 4): # an arbitrary polygon
             #everything else .... 
-            retVal = True
-            for p in other:
-                test = self._pointInsidePolygon(p,bounds)
-                if(not test):
-                    retVal = False
-                    break
+            retVal = bool(np.all(self._pointsInsidePolygon(other,bounds)))
         else:
             warnings.warn("SimpleCV did not recognize the input type to features.contains. This method only takes another blob, an (x,y) tuple, or a ndarray type.")
             return False  
@@ -1636,40 +2114,24 @@ class Feature(object):
         retVal = False
         bounds = self.boundingBox
         if( isinstance(other,Feature) ):# A feature
-            retVal = True            
-            for p in other.boundingBox: # this isn't completely correct - only tests if points lie in poly, not edges. 
-                retVal = self._pointInsidePolygon(p,bounds)
-                if( retVal ):
-                    break
+            # this isn't completely correct - only tests if points lie in poly, not edges.
+            retVal = bool(np.any(self._pointsInsidePolygon(other.boundingBox,bounds)))
                 
         elif( (isinstance(other,tuple) and len(other)==2) or ( isinstance(other,np.ndarray) and other.shape[0]==2) ):
             retVal = self._pointInsidePolygon(other,bounds)
 
         elif( isinstance(other,tuple) and len(other)==3 and not isinstance(other[0],tuple)): # A circle
             #assume we are in x,y, r format 
-            retVal = False
-            rr = other[2]*other[2]
-            x = other[0]
-            y = other[1]
-            for p in bounds:
-                test = ((x-p[0])*(x-p[0]))+((y-p[1])*(y-p[1]))
-                if( test < rr ):
-                    retVal = True
-                    break
+            retVal = bool(np.any(self._distanceSquared(bounds,other) < other[2]*other[2]))
 
         elif( isinstance(other,tuple) and len(other)==4 and ( isinstance(other[0],float) or isinstance(other[0],int))): 
-            retVal = ( self.contains( (other[0],other[1] ) ) or # see if we contain any corner
-                       self.contains( (other[0]+other[2],other[1] ) ) or
-                       self.contains( (other[0],other[1]+other[3] ) ) or
-                       self.contains( (other[0]+other[2],other[1]+other[3] ) ) )
+            # see if we contain any corner
+            corners = [(other[0],other[1]),(other[0]+other[2],other[1]),
+                       (other[0],other[1]+other[3]),(other[0]+other[2],other[1]+other[3])]
+            retVal = bool(np.any(self._pointsInsidePolygon(corners,bounds)))
         elif(isinstance(other,list) and len(other)  >= 3): # an arbitrary polygon
             #everything else .... 
-            retVal = False
-            for p in other:
-                test = self._pointInsidePolygon(p,bounds)
-                if(test):
-                    retVal = True
-                    break
+            retVal = bool(np.any(self._pointsInsidePolygon(other,bounds)))
         else:
             warnings.warn("SimpleCV did not recognize the input type to features.overlaps. This method only takes another blob, an (x,y) tuple, or a ndarray type.")
             return False  
@@ -1777,14 +2239,7 @@ class Feature(object):
             retVal = other.contains(self)
         elif( isinstance(other,tuple) and len(other)==3 ): # a circle
             #assume we are in x,y, r format 
-            rr = other[2]*other[2] # radius squared
-            x = other[0]
-            y = other[1]
-            for p in bounds:
-                test = ((x-p[0])*(x-p[0]))+((y-p[1])*(y-p[1]))
-                if( test > rr ):
-                    retVal = False
-                    break
+            retVal = not np.any(self._distanceSquared(bounds,other) > other[2]*other[2])
         elif( isinstance(other,tuple) and len(other)==4 and  # a bounding box
             ( isinstance(other[0],float) or isinstance(other[0],int))): # we assume a tuple of four is (x,y,w,h)
             retVal = ( self.maxX() <= other[0]+other[2] and
@@ -1793,12 +2248,7 @@ class Feature(object):
                        self.minY() >= other[1] )
         elif(isinstance(other,list) and len(other) > 2 ): # an arbitrary polygon
             #everything else .... 
-            retVal = True
-            for p in bounds:
-                test = self._pointInsidePolygon(p,other)
-                if(not test):
-                    retVal = False
-                    break
+            retVal = bool(np.all(self._pointsInsidePolygon(bounds,other)))
 
         else:
             warnings.warn("SimpleCV did not recognize the input type to features.contains. This method only takes another blob, an (x,y) tuple, or a ndarray type.")
@@ -1843,32 +2293,52 @@ class Feature(object):
         Adapted for python from:
         Http://paulbourke.net/geometry/insidepoly/
         """
-        if( len(polygon) < 3 ):
+        return bool(self._pointsInsidePolygon([point],polygon)[0])
+
+    def _pointsInsidePolygon(self,points,polygon):
+        """
+        Returns a numpy boolean array that is true for each (x,y) point in points that is
+        inside the polygon ((a,b),(c,d),...). This is the crossing number test from
+        Http://paulbourke.net/geometry/insidepoly/
+        done for every point against every edge at once with numpy. The polygon is closed
+        for you if the last point is not the same as the first.
+        """
+        pts = np.asarray(points,dtype=np.float64).reshape((-1,2))
+        poly = np.asarray(polygon,dtype=np.float64).reshape((-1,2))
+        retVal = np.zeros(len(pts),dtype=bool)
+        if( len(poly) < 3 ):
             warnings.warn("feature._pointInsidePolygon - this is not a valid polygon")
-            return False 
- 
-        counter = 0
-        retVal = True
-        p1 = None
-        
-        poly = copy.deepcopy(polygon)
-        poly.append(polygon[0])
-   #     for p2 in poly:
-        N = len(poly)
-        p1 = poly[0]
-        for i in range(1,N+1):
-            p2 = poly[i%N]
-            if( point[1] > np.min((p1[1],p2[1])) ):
-                if( point[1] <= np.max((p1[1],p2[1])) ):
-                    if( point[0] <= np.max((p1[0],p2[0])) ):
-                        if( p1[1] != p2[1] ):
-                            test = float((point[1]-p1[1])*(p2[0]-p1[0]))/float(((p2[1]-p1[1])+p1[0]))
-                            if( p1[0] == p2[0] or point[0] <= test ):
-                                counter = counter + 1
-            p1 = p2                
-                                    
-        if( counter % 2 == 0 ):
-            retVal = False
+            return retVal
+
+        p1 = poly
+        p2 = np.roll(poly,-1,axis=0)
+        # horizontal edges never cross the ray
+        keep = p1[:,1] != p2[:,1]
+        x1,y1 = p1[keep,0],p1[keep,1]
+        x2,y2 = p2[keep,0],p2[keep,1]
+        if( len(x1) == 0 ):
+            return retVal
+        ymin = np.minimum(y1,y2)
+        ymax = np.maximum(y1,y2)
+        xmax = np.maximum(x1,x2)
+        vertical = x1 == x2
+        slope = (x2-x1)/(y2-y1)
+        # test the points in chunks so big polygons don't make huge temporaries
+        step = max(1,(1<<20)//len(x1))
+        for i in range(0,len(pts),step):
+            px = pts[i:i+step,0:1]
+            py = pts[i:i+step,1:2]
+            xinters = (py-y1)*slope+x1
+            crossings = (py > ymin) & (py <= ymax) & (px <= xmax) & (vertical | (px <= xinters))
+            retVal[i:i+step] = (np.sum(crossings,axis=1) % 2) == 1
         return retVal
 
+    def _distanceSquared(self,points,center):
+        """
+        Returns a numpy array of the squared distance from each (x,y) point to the
+        center (x,y,...) of a circle.
+        """
+        pts = np.asarray(points,dtype=np.float64).reshape((-1,2))
+        return (pts[:,0]-center[0])**2+(pts[:,1]-center[1])**2
+
 #--------------------------------------------- 
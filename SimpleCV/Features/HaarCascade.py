@@ -1,41 +1,106 @@
 from SimpleCV.base import *
+from multiprocessing.pool import ThreadPool
 
 class HaarCascade():
      """
      This class wraps HaarCascade files for the findHaarFeatures file.
-     To use the class provide it with the path to a Haar cascade XML file and 
-     optionally a name. 
+     To use the class provide it with the path to a Haar cascade XML file and
+     optionally a name.
+
+     The cascades that ship with SimpleCV in SimpleCV/Features/HaarCascades/ can
+     also be given by their short name, e.g. HaarCascade("face") or HaarCascade("eye").
+     Each cascade file is only parsed once, the first time it is used, and the
+     loaded cascade is shared by every HaarCascade made from that file. OpenCV
+     writes into a cascade while it detects, so each thread that detects gets its
+     own copy.
      """
-     _mCascade = None
      _mName = None
+     _mFileName = None
+     _mCache = threading.local() # each thread's loaded cascades, by absolute file name
+     _mStorage = threading.local() # one cv.MemStorage for each thread
+     _mStorageUses = 256 # make a fresh storage after this many detections
+     _mPool = None # the thread pool for parallel detection
+     _mPoolSize = 0
+     _mPoolLock = threading.Lock()
+     mCascadeDir = os.path.join(LAUNCH_PATH,"Features","HaarCascades")
+
      def __init__(self, fname, name=None):
-          if( name is None ):
-               self._mName = fname
-          else:
-               self._mName = name
-               
-          if (not os.path.exists(fname)):
-               warnings.warn("Could not find Haar Cascade file " + fname)
-               return None
-          self._mCascade = cv.Load(fname)
+          self.load(fname,name)
 
      def load(self, fname, name = None):
           if( name is None ):
                self._mName = fname
           else:
                self._mName = name
-               
-          if (not os.path.exists(fname)):
+
+          path = self.findFile(fname)
+          if( path is None ):
                warnings.warn("Could not find Haar Cascade file " + fname)
                return None
 
-          self._mCascade = cv.Load(fname)
+          self._mFileName = path
+
+     def findFile(cls, fname):
+          """
+          Return the absolute path of a cascade file, which is either a path or the
+          short name of one of the cascades in mCascadeDir, or None if there is no such file.
+          """
+          for path in [fname, os.path.join(cls.mCascadeDir,fname), os.path.join(cls.mCascadeDir,fname+".xml")]:
+               if( os.path.isfile(path) ):
+                    return os.path.abspath(path)
+          return None
+     findFile = classmethod(findFile)
+
+     def available(cls):
+          """
+          Return the short names of the cascades that ship with SimpleCV.
+          """
+          return sorted([os.path.splitext(f)[0] for f in os.listdir(cls.mCascadeDir) if f.endswith(".xml")])
+     available = classmethod(available)
+
+     def getStorage(cls):
+          """
+          Return the cv.MemStorage for HaarDetectObjects to use in the calling thread.
+          Each thread keeps reusing its own storage instead of making a new one for every
+          detection. The results are copied out of it, so it is swapped for a fresh one
+          every _mStorageUses calls to bound its growth.
+          """
+          local = cls._mStorage
+          if( getattr(local,"storage",None) is None or local.uses >= cls._mStorageUses ):
+               local.storage = cv.CreateMemStorage(0)
+               local.uses = 0
+          local.uses += 1
+          return local.storage
+     getStorage = classmethod(getStorage)
+
+     def getPool(cls, threads):
+          """
+          Return a pool of at least this many worker threads for parallel detection.
+          The pool lives for the whole process so its threads, and the cascades they
+          have loaded, are reused from call to call.
+          """
+          cls._mPoolLock.acquire()
+          try:
+               if( cls._mPool is None or cls._mPoolSize < threads ):
+                    if( cls._mPool is not None ):
+                         cls._mPool.close()
+                    cls._mPool = ThreadPool(threads)
+                    cls._mPoolSize = threads
+               return cls._mPool
+          finally:
+               cls._mPoolLock.release()
+     getPool = classmethod(getPool)
 
      def getCascade(self):
-          return self._mCascade
+          if( self._mFileName is None ):
+               return None
+          cache = HaarCascade._mCache.__dict__
+          if( self._mFileName not in cache ):
+               cache[self._mFileName] = cv.Load(self._mFileName)
+          return cache[self._mFileName]
 
      def getName(self):
           return self._mName
-    
+
      def setName(self,name):
           self._mName = name
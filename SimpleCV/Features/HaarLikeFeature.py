@@ -80,6 +80,22 @@ class HaarLikeFeature():
             yD = int(h*q)
             accumulator += sign*(intImg[xA,yA]-intImg[xB,yB]-intImg[xC,yC]+intImg[xD,yD])
         return accumulator
+
+    def applyBatch(self, intImgs):
+        """
+        This method is the same as apply but takes a stack of integral images, all
+        the same size, as an NxAxB numpy array and returns a numpy array of N results.
+        """
+        w = intImgs.shape[1]-1
+        h = intImgs.shape[2]-1
+        accumulator = np.zeros(intImgs.shape[0])
+        for p,q,r,s,sign in self.mRegions:
+            xA,yA = int(w*r),int(h*s)
+            xB,yB = int(w*r),int(h*q)
+            xC,yC = int(w*p),int(h*s)
+            xD,yD = int(w*p),int(h*q)
+            accumulator += sign*(intImgs[:,xA,yA]-intImgs[:,xB,yB]-intImgs[:,xC,yC]+intImgs[:,xD,yD])
+        return accumulator
     
     def writeToFile(self,file):
         """
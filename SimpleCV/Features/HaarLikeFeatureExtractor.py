@@ -90,6 +90,24 @@ class HaarLikeFeatureExtractor(FeatureExtractorBase):
             for i in range(len(self.mFeatureSet)):
                 retVal.append(self.mFeatureSet[i].apply(regular))
         return retVal
+
+    def extractBatch(self, batch):
+        """
+        Apply the Haar like features to an NxHxWx3 uint8 RGB batch of images, like the
+        one FeatureSet.cropBatch() returns. The grayscale integral images of the whole
+        batch are built with numpy in one go and each feature is applied to all of them
+        at once. Returns an NxF numpy array.
+        """
+        batch = np.asarray(batch).astype(np.float64)
+        gray = np.round(batch[:,:,:,0]*0.299+batch[:,:,:,1]*0.587+batch[:,:,:,2]*0.114)
+        n,h,w = gray.shape
+        regular = np.zeros((n,h+1,w+1))
+        regular[:,1:,1:] = gray.cumsum(axis=1).cumsum(axis=2)
+        retVal = [f.applyBatch(regular) for f in self.mFeatureSet]
+        if(self.mDo45):
+            # extract() uses the regular integral image for these too
+            retVal = retVal+retVal
+        return np.array(retVal).transpose().reshape((n,len(retVal)))
     
     def getFieldNames(self):
         """
@@ -0,0 +1,107 @@
+from SimpleCV.base import *
+
+
+class HaarTracker:
+    """
+    **SUMMARY**
+
+    The HaarTracker follows objects found with a Haar cascade, such as faces, from
+    frame to frame. A full findHaarFeatures search is only run every sweepInterval
+    frames, or whenever nothing is being followed. On the frames in between only the
+    neighbourhood of each previous detection is searched, and only for objects of a
+    similar size, which is much cheaper than searching the whole frame at every scale.
+    New objects that appear between sweeps are picked up at the next sweep.
+
+    **EXAMPLE**
+
+    >>> cam = Camera()
+    >>> tracker = HaarTracker("face",min_size=(60,60),threads=4)
+    >>> while True:
+    >>>     img = cam.getImage()
+    >>>     faces = tracker.track(img)
+    >>>     if( faces is not None ):
+    >>>         faces.draw()
+    >>>     img.show()
+
+    **SEE ALSO**
+
+    :py:meth:`findHaarFeatures`
+    :py:class:`HaarCascade`
+    :py:class:`BlobTracker`
+
+    """
+    mCascade = None
+    mLast = None # the detections from the previous frame
+    mFrameCount = 0
+    mSweepInterval = 15
+    mMargin = 0.5
+    mOptions = {} # the other findHaarFeatures arguments
+    mThreads = 1
+
+    def __init__(self, cascade, sweepInterval=15, margin=0.5, scale_factor=1.2, min_neighbors=2,
+                 use_canny=cv.CV_HAAR_DO_CANNY_PRUNING, min_size=(0,0), max_size=None, threads=1):
+        """
+        **SUMMARY**
+
+        Create a Haar tracker.
+
+        **PARAMETERS**
+
+        * *cascade* - A HaarCascade, the path of a cascade file or the short name of a cascade that comes with SimpleCV.
+        * *sweepInterval* - Search the whole frame every this many frames.
+        * *margin* - How far the search region around each previous detection reaches past it, as a fraction of its size.
+        * *scale_factor* - The findHaarFeatures scale factor.
+        * *min_neighbors* - The findHaarFeatures minimum number of neighbors.
+        * *use_canny* - Whether or not to use Canny pruning.
+        * *min_size* - The smallest (width,height) to look for.
+        * *max_size* - The biggest (width,height) to keep, or None for no limit.
+        * *threads* - The number of threads the full frame searches use.
+
+        """
+        if( isinstance(cascade,str) ):
+            cascade = HaarCascade(cascade)
+        self.mCascade = cascade
+        self.mSweepInterval = sweepInterval
+        self.mMargin = margin
+        self.mOptions = {"scale_factor":scale_factor,"min_neighbors":min_neighbors,
+                         "use_canny":use_canny,"min_size":min_size,"max_size":max_size}
+        self.mThreads = threads
+        self.reset()
+
+    def reset(self):
+        """
+        **SUMMARY**
+
+        Forget the previous detections, the next frame gets a full search.
+        """
+        self.mLast = None
+        self.mFrameCount = 0
+
+    def track(self, img):
+        """
+        **SUMMARY**
+
+        Find the objects in the next frame.
+
+        **PARAMETERS**
+
+        * *img* - The next frame.
+
+        **RETURNS**
+
+        A FeatureSet of HaarFeatures, or None if nothing was found.
+
+        """
+        if( self.mLast is None or self.mFrameCount % self.mSweepInterval == 0 ):
+            found = img.findHaarFeatures(self.mCascade,threads=self.mThreads,**self.mOptions)
+        else:
+            found = img.findHaarFeatures(self.mCascade,hints=self.mLast,margin=self.mMargin,**self.mOptions)
+        self.mFrameCount += 1
+        self.mLast = found
+        return found
+
+    def __repr__(self):
+        return "SimpleCV.Features.HaarTracker.HaarTracker object on frame %d" % self.mFrameCount
+
+
+from SimpleCV.Features.HaarCascade import HaarCascade
@@ -0,0 +1,166 @@
+from SimpleCV.base import *
+
+
+class HammingIndex:
+    """
+    **SUMMARY**
+
+    A HammingIndex finds the nearest neighbours of binary descriptors, like the ORB
+    keypoint descriptors, which are rows of packed bits compared by the number of
+    bits that differ (the Hamming distance).
+
+    It is a locality sensitive hash: each of several tables files every descriptor
+    under a key made of a random sample of its bits. Descriptors that differ in only a
+    few bits are very likely to share a key in at least one table, so a query only
+    measures the distance to the descriptors that share one of its keys. The tables
+    are sorted numpy arrays and a whole batch of queries is answered at once, without
+    a python loop over the descriptors.
+
+    Small searches, like matching the few hundred keypoints of a template against
+    those of a frame, are cheaper to answer exactly, so when there are few enough
+    (query, descriptor) pairs every pair is measured instead of using the tables.
+
+    **EXAMPLE**
+
+    >>> kp,d = img._getRawKeypoints(flavor="ORB")
+    >>> index = HammingIndex(d)
+    >>> idx,dist = index.knnSearch(otherDescriptors,2)
+
+    **SEE ALSO**
+
+    :py:class:`KeypointDatabase`
+    :py:meth:`findKeypointMatch`
+
+    """
+    mDescriptors = None # the NxB uint8 array of packed descriptors
+    mBits = None # for each table, the positions of the bits that make its key
+    mKeys = None # a TxN array of each table's sorted keys
+    mItems = None # a TxN array of the descriptor index of each sorted key
+    mExactPairs = 1 << 20 # searches with no more (query, descriptor) pairs than this are exact
+    _mPopCount = np.array([bin(i).count("1") for i in range(256)],dtype=np.uint8)
+
+    def __init__(self, descriptors, tables=24, keyBits=8, seed=0, exactPairs=1 << 20):
+        """
+        **SUMMARY**
+
+        Build the index.
+
+        **PARAMETERS**
+
+        * *descriptors* - An NxB uint8 array, each row a descriptor of 8*B packed bits.
+        * *tables* - The number of hash tables. More tables find more true neighbours but
+          measure more candidates.
+        * *keyBits* - The number of bits in each key. Longer keys mean smaller buckets
+          but a smaller chance that two close descriptors share a key. The defaults find
+          about 97% of the true nearest neighbours of 256 bit descriptors that differ in
+          20% of their bits.
+        * *seed* - The seed for picking the sampled bits, so an index can be rebuilt the same way.
+        * *exactPairs* - Answer a search by measuring every (query, descriptor) pair when there
+          are no more pairs than this. 0 always uses the tables.
+
+        """
+        self.mDescriptors = np.atleast_2d(np.ascontiguousarray(descriptors,dtype=np.uint8))
+        self.mExactPairs = exactPairs
+        nbits = 8*self.mDescriptors.shape[1]
+        rng = np.random.RandomState(seed)
+        self.mBits = np.array([rng.permutation(nbits)[:min(keyBits,nbits)] for t in range(tables)])
+        keys = self._hash(self.mDescriptors)
+        self.mItems = np.argsort(keys,axis=1,kind='mergesort')
+        self.mKeys = keys[np.arange(len(self.mBits))[:,np.newaxis],self.mItems]
+
+    def _hash(self, descriptors):
+        """
+        Return the TxN array of the key of each descriptor in each table.
+        """
+        bits = np.unpackbits(descriptors,axis=1)
+        weights = (1 << np.arange(self.mBits.shape[1])).astype(np.int64)
+        return np.array([np.dot(bits[:,b].astype(np.int64),weights) for b in self.mBits]).reshape((len(self.mBits),len(descriptors)))
+
+    def distance(self, a, b):
+        """
+        **SUMMARY**
+
+        Return the Hamming distances between the rows of two equally sized arrays of packed descriptors.
+        """
+        return self._mPopCount[np.bitwise_xor(a,b)].sum(axis=1,dtype=np.int64)
+
+    def __len__(self):
+        return len(self.mDescriptors)
+
+    def knnSearch(self, query, k=1):
+        """
+        **SUMMARY**
+
+        Find the k nearest descriptors to each of a batch of query descriptors.
+
+        **PARAMETERS**
+
+        * *query* - An MxB uint8 array of packed descriptors.
+        * *k* - The number of neighbours to find.
+
+        **RETURNS**
+
+        An (indices, distances) tuple of Mxk numpy arrays ordered nearest first. Where
+        fewer than k candidates shared a key with a query, or there are fewer than k
+        descriptors, the missing entries have an index of -1 and a distance of one more
+        than the number of bits.
+
+        **EXAMPLE**
+
+        >>> idx,dist = index.knnSearch(d,2)
+
+        """
+        query = np.atleast_2d(np.ascontiguousarray(query,dtype=np.uint8))
+        m = len(query)
+        n = len(self.mDescriptors)
+        nbits = 8*self.mDescriptors.shape[1]
+        retIdx = np.zeros((m,k),dtype=np.int64)-1
+        retDist = np.zeros((m,k),dtype=np.int64)+nbits+1
+        if( m == 0 or n == 0 ):
+            return retIdx,retDist
+        if( m*n <= self.mExactPairs ):
+            return self._exactSearch(query,k,retIdx,retDist)
+
+        # gather every (query, descriptor) pair that shares a key in some table
+        qkeys = self._hash(query)
+        pairs = []
+        for t in range(len(self.mBits)):
+            lo = np.searchsorted(self.mKeys[t],qkeys[t],side='left')
+            hi = np.searchsorted(self.mKeys[t],qkeys[t],side='right')
+            cnt = hi-lo
+            total = cnt.sum()
+            pos = np.repeat(lo-(np.cumsum(cnt)-cnt),cnt)+np.arange(total)
+            pairs.append(np.repeat(np.arange(m,dtype=np.int64),cnt)*n+self.mItems[t][pos])
+        pairs = np.unique(np.concatenate(pairs))
+        qi = pairs//n
+        di = pairs % n
+        dist = self.distance(query[qi],self.mDescriptors[di])
+
+        # keep the k nearest of each query's candidates
+        order = np.lexsort((dist,qi))
+        qi,di,dist = qi[order],di[order],dist[order]
+        first = np.searchsorted(qi,qi,side='left')
+        rank = np.arange(len(qi))-first
+        keep = rank < k
+        retIdx[qi[keep],rank[keep]] = di[keep]
+        retDist[qi[keep],rank[keep]] = dist[keep]
+        return retIdx,retDist
+
+    def _exactSearch(self, query, k, retIdx, retDist):
+        """
+        Fill in the k nearest descriptors to each query by measuring every pair.
+        """
+        n = len(self.mDescriptors)
+        kk = min(k,n)
+        # keep each chunk of xor-ed pairs to about 16MB
+        chunk = max(1,(1 << 24)/(n*self.mDescriptors.shape[1]))
+        for start in range(0,len(query),chunk):
+            q = query[start:start+chunk]
+            dist = self._mPopCount[np.bitwise_xor(q[:,np.newaxis,:],self.mDescriptors[np.newaxis,:,:])].sum(axis=2,dtype=np.int64)
+            order = np.argsort(dist,axis=1,kind='mergesort')[:,0:kk]
+            retIdx[start:start+chunk,0:kk] = order
+            retDist[start:start+chunk,0:kk] = dist[np.arange(len(q))[:,np.newaxis],order]
+        return retIdx,retDist
+
+    def __repr__(self):
+        return "SimpleCV.Features.HammingIndex.HammingIndex object with %d descriptors in %d tables" % (len(self.mDescriptors),len(self.mBits))
@@ -29,6 +29,29 @@ class HueHistogramFeatureExtractor(FeatureExtractorBase):
         hist = np.histogram(npa,self.mNBins,normed=True,range=(0,255))
         return hist[0].tolist()
 
+    def extractBatch(self, batch):
+        """
+        Compute the hue histograms of an NxHxWx3 uint8 RGB batch of images, like the one
+        FeatureSet.cropBatch() returns, all at once. The hue is worked out the same way
+        as OpenCV's 8 bit HLS conversion (degrees / 2) and the histograms are normalized
+        like extract() normalizes them. Returns an NxmNBins numpy array.
+        """
+        batch = np.asarray(batch).reshape((len(batch),-1,3)).astype(np.float64)
+        r,g,b = batch[:,:,0],batch[:,:,1],batch[:,:,2]
+        vmax = np.max(batch,axis=2)
+        diff = vmax-np.min(batch,axis=2)
+        safe = np.where(diff == 0,1,diff)
+        hue = np.where(vmax == r,(g-b)*60.0/safe,
+              np.where(vmax == g,120.0+(b-r)*60.0/safe,240.0+(r-g)*60.0/safe))
+        hue[hue < 0] += 360.0
+        hue[diff == 0] = 0
+        hue = np.round(hue/2.0)
+        binwidth = 255.0/self.mNBins
+        bins = np.minimum((hue/binwidth).astype(np.int64),self.mNBins-1)
+        n,npix = bins.shape
+        counts = np.bincount((bins+self.mNBins*np.arange(n)[:,np.newaxis]).ravel(),minlength=n*self.mNBins)
+        return counts.reshape((n,self.mNBins))/(float(npix)*binwidth)
+
     
     def getFieldNames(self):
         """
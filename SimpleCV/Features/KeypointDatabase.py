@@ -0,0 +1,270 @@
+from SimpleCV.base import *
+
+
+class KeypointDatabase:
+    """
+    **SUMMARY**
+
+    A KeypointDatabase holds the keypoint descriptors of many template images in one
+    nearest neighbour index, so a frame can be checked for all of the known objects
+    with a single query, rather than calling findKeypointMatch once per template and
+    rebuilding the index and the template keypoints each time.
+
+    Every frame descriptor is matched to its nearest database descriptor, matches
+    that are not clearly better than the second nearest are dropped, and the rest
+    are grouped by the template they belong to. A homography is then fitted for each
+    template with enough matches.
+
+    With the "ORB" flavor the descriptors are packed bits and the index is a
+    HammingIndex, which matches them by Hamming distance.
+
+    The database, including its index, can be saved to disk and loaded again.
+
+    **EXAMPLE**
+
+    >>> db = KeypointDatabase()
+    >>> db.addTemplate(Image("cup.png"),"cup")
+    >>> db.addTemplate(Image("book.png"),"book")
+    >>> db.save("objects.db")
+    >>> db = KeypointDatabase.load("objects.db")
+    >>> img = cam.getImage()
+    >>> for m in db.match(img):
+    >>>     print m.mName
+    >>>     m.draw()
+
+    **SEE ALSO**
+
+    :py:meth:`findKeypointMatch`
+    :py:class:`KeypointMatch`
+
+    """
+    mFlavor = "SURF" # the keypoint flavor of every descriptor in the database
+    mQuality = 500.00 # the keypoint quality threshold
+    mHighQuality = 0 # use the 128 value SURF descriptors
+    mNames = [] # the name of each template
+    mTemplates = [] # the template Images
+    mPoints = None # an Mx2 array of the (x,y) position of every descriptor in its template
+    mOwners = None # an M array of the template index of every descriptor
+    mDescriptors = None # the MxD array of descriptors
+    mIndex = None # the nearest neighbour index, built or loaded on demand
+    mIndexFile = None # where the index was saved, if it was
+
+    def __init__(self, quality=500.00, flavor="SURF", highQuality=0):
+        """
+        **SUMMARY**
+
+        Make an empty database.
+
+        **PARAMETERS**
+
+        * *quality* - The keypoint quality threshold used for the templates and the frames.
+        * *flavor* - The keypoint flavor, this must be one that has descriptors, "SURF" or "ORB".
+        * *highQuality* - Use the 128 value SURF descriptors instead of the 64 value ones.
+
+        """
+        self.mQuality = quality
+        self.mFlavor = flavor
+        self.mHighQuality = highQuality
+        self.mNames = []
+        self.mTemplates = []
+        self.mPoints = np.zeros((0,2))
+        self.mOwners = np.zeros(0,dtype=np.int32)
+        self.mDescriptors = None
+        self.mIndex = None
+        self.mIndexFile = None
+
+    def _keypoints(self, img):
+        """
+        Return the (Nx2 array of (x,y) points, descriptors) of an image, or None if it has none.
+        """
+        # the image may have cached keypoints found with a different quality or
+        # descriptor size, so always find them with the database's settings
+        kp,d = img._getRawKeypoints(self.mQuality,self.mFlavor,self.mHighQuality,forceReset=True)
+        if( kp is None or d is None or len(kp) == 0 ):
+            return None
+        # the keypoints are found in the transposed gray numpy array
+        pts = np.array([(k.pt[1],k.pt[0]) for k in kp],dtype=np.float32)
+        return pts,d
+
+    def addTemplate(self, template, name=None):
+        """
+        **SUMMARY**
+
+        Add a template image of an object to the database.
+
+        **PARAMETERS**
+
+        * *template* - The template Image.
+        * *name* - The name of the object, by default the index of the template.
+
+        **RETURNS**
+
+        The index of the template, or None if no keypoints were found in it.
+
+        """
+        found = self._keypoints(template)
+        if( found is None ):
+            warnings.warn("KeypointDatabase: I didn't get any keypoints from the template.")
+            return None
+        pts,d = found
+        if( name is None ):
+            name = len(self.mNames)
+        self.mNames.append(name)
+        self.mTemplates.append(template)
+        self.mPoints = np.vstack((self.mPoints,pts))
+        self.mOwners = np.concatenate((self.mOwners,np.zeros(len(pts),dtype=np.int32)+len(self.mNames)-1))
+        if( self.mDescriptors is None ):
+            self.mDescriptors = d
+        else:
+            self.mDescriptors = np.vstack((self.mDescriptors,d))
+        self.mIndex = None
+        self.mIndexFile = None
+        return len(self.mNames)-1
+
+    def __len__(self):
+        return len(self.mNames)
+
+    def _getIndex(self):
+        """
+        Return the nearest neighbour index of the descriptors. For ORB this is a
+        HammingIndex, otherwise a FLANN index loaded from mIndexFile or built.
+        """
+        if( self.mIndex is None and self.mFlavor == "ORB" ):
+            self.mIndex = HammingIndex(self.mDescriptors)
+        if( self.mIndex is None ):
+            import cv2
+            if( self.mIndexFile is not None and os.path.exists(self.mIndexFile) ):
+                try:
+                    self.mIndex = cv2.flann_Index()
+                    if( not self.mIndex.load(self.mDescriptors,self.mIndexFile) ):
+                        # a stale or incompatible index file, rebuild it
+                        self.mIndex = None
+                except:
+                    self.mIndex = None
+            if( self.mIndex is None ):
+                FLANN_INDEX_KDTREE = 1  # bug: flann enums are missing
+                self.mIndex = cv2.flann_Index(self.mDescriptors,dict(algorithm = FLANN_INDEX_KDTREE, trees = 4))
+        return self.mIndex
+
+    def _query(self, d, k):
+        """
+        Return the (indices, distances) of the k nearest database descriptors to each
+        row of d, as NxK arrays, nearest first.
+        """
+        if( self.mFlavor == "ORB" ):
+            idx,dist = self._getIndex().knnSearch(d,k)
+        else:
+            idx,dist = self._getIndex().knnSearch(d,k,params = {}) # bug: need to provide empty dict
+        return np.array(idx).reshape((-1,k)),np.array(dist,dtype=np.float64).reshape((-1,k))
+
+    def _isGood(self, dist, ratio):
+        """
+        Return which matches pass the ratio test, given the Nx2 distances to the nearest
+        and second nearest descriptors. The FLANN distances are squared, the Hamming
+        distances are not.
+        """
+        if( self.mFlavor == "ORB" ):
+            return dist[:,0] < ratio*dist[:,1]
+        return dist[:,0] < (ratio**2)*dist[:,1]
+
+    def match(self, img, ratio=0.7, minMatches=12, minInliers=8):
+        """
+        **SUMMARY**
+
+        Find which of the objects in the database are in an image.
+
+        **PARAMETERS**
+
+        * *img* - The Image to search.
+        * *ratio* - A match is kept if it is closer than this fraction of the distance to
+          the second best match. Lower values keep fewer, more certain matches.
+        * *minMatches* - The fewest matches an object needs before a homography is fitted.
+        * *minInliers* - The fewest matches that must agree with the homography for the
+          object to count as found.
+
+        **RETURNS**
+
+        A FeatureSet of KeypointMatch features, one for each object found, each with the
+        name of its object in mName. The FeatureSet is empty if nothing was found.
+
+        **EXAMPLE**
+
+        >>> found = db.match(cam.getImage())
+        >>> print [m.mName for m in found]
+
+        """
+        import cv2
+        fs = FeatureSet()
+        if( len(self.mNames) == 0 ):
+            return fs
+        found = self._keypoints(img)
+        if( found is None ):
+            return fs
+        pts,d = found
+        if( len(self.mDescriptors) < 2 ):
+            return fs
+        idx,dist = self._query(d,2)
+        good = self._isGood(dist,ratio)
+        owners = self.mOwners[idx[:,0]]
+        counts = np.bincount(owners[good],minlength=len(self.mNames))
+        for t in np.flatnonzero(counts >= max(minMatches,4)):
+            sel = good & (owners == t)
+            src = self.mPoints[idx[sel,0]]
+            dst = pts[sel]
+            homography,mask = cv2.findHomography(src,dst,cv2.RANSAC,5.0)
+            if( homography is None or mask is None or mask.sum() < minInliers ):
+                continue
+            w,h = self.mTemplates[t].width,self.mTemplates[t].height
+            corners = np.dot(homography,np.array([[0,w,w,0],[0,0,h,h],[1,1,1,1]],dtype=np.float64))
+            corners = (corners[0:2]/corners[2]).transpose()
+            m = KeypointMatch(img,self.mTemplates[t],tuple(map(tuple,corners)),homography)
+            m.mName = self.mNames[t]
+            fs.append(m)
+        return fs
+
+    def save(self, fname):
+        """
+        **SUMMARY**
+
+        Save the database to a file. The FLANN nearest neighbour index is saved next to
+        it, in fname with ".index" on the end, so it does not have to be rebuilt on load.
+        A HammingIndex is saved in the file itself.
+
+        **PARAMETERS**
+
+        * *fname* - The file name.
+
+        """
+        if( self.mFlavor != "ORB" and self.mDescriptors is not None and len(self.mDescriptors) > 0 ):
+            try:
+                self._getIndex().save(fname+".index")
+                self.mIndexFile = os.path.abspath(fname+".index")
+            except:
+                self.mIndexFile = None
+        output = open(fname, 'wb')
+        pickle.dump(self,output,2)
+        output.close()
+
+    def load(cls, fname):
+        """
+        **SUMMARY**
+
+        Load a database saved with save().
+        """
+        return pickle.load(open(fname,'rb'))
+    load = classmethod(load)
+
+    def __getstate__(self):
+        #the FLANN index is loaded from mIndexFile or rebuilt on demand rather than pickled
+        state = self.__dict__.copy()
+        if( self.mFlavor != "ORB" ):
+            state['mIndex'] = None
+        return state
+
+    def __repr__(self):
+        return "SimpleCV.Features.KeypointDatabase.KeypointDatabase object with %d templates" % len(self.mNames)
+
+
+from SimpleCV.Features.Features import FeatureSet
+from SimpleCV.Features.Detection import KeypointMatch
+from SimpleCV.Features.HammingIndex import HammingIndex
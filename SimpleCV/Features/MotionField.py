@@ -0,0 +1,182 @@
+from SimpleCV.base import *
+from SimpleCV.Color import Color
+
+
+class MotionField:
+    """
+    **SUMMARY**
+
+    A MotionField is the result of findMotion held as numpy arrays: the (x,y)
+    position of every sample, its (vx,vy) flow vector and the magnitude of that
+    vector. Working with the arrays directly is much faster than with one Motion
+    feature per sample. The Motion features are only made when they are asked
+    for, by indexing or iterating the field or by calling features().
+
+    The samples are ordered the same way as the features findMotion returns.
+
+    **EXAMPLE**
+
+    >>> field = img2.findMotion(img1,window=5,method="LK",field=True)
+    >>> moving = field.magnitude() > 2.0
+    >>> print field.x()[moving], field.y()[moving]
+    >>> field.draw()
+
+    **SEE ALSO**
+
+    :py:meth:`findMotion`
+    :py:class:`Motion`
+
+    """
+    mImage = None # the image the motion was found in
+    mX = None # the x position of each sample
+    mY = None # the y position of each sample
+    mVX = None # the x component of each flow vector
+    mVY = None # the y component of each flow vector
+    mMagnitude = None # the length of each flow vector
+    mWindow = 7 # the size of the sample window
+    mFeatures = None # the Motion features, made on demand
+
+    def __init__(self, image, x, y, vx, vy, window):
+        """
+        **SUMMARY**
+
+        Make a motion field.
+
+        **PARAMETERS**
+
+        * *image* - The Image the motion was found in.
+        * *x* - The x positions of the samples.
+        * *y* - The y positions of the samples.
+        * *vx* - The x components of the flow vectors.
+        * *vy* - The y components of the flow vectors.
+        * *window* - The size of the sample window.
+
+        """
+        self.mImage = image
+        self.mX = np.asarray(x).ravel()
+        self.mY = np.asarray(y).ravel()
+        self.mVX = np.asarray(vx,dtype=np.float64).ravel()
+        self.mVY = np.asarray(vy,dtype=np.float64).ravel()
+        self.mMagnitude = np.sqrt((self.mVX*self.mVX)+(self.mVY*self.mVY))
+        self.mWindow = window
+        self.mFeatures = [None]*len(self.mX)
+
+    def x(self):
+        """
+        **SUMMARY**
+
+        Return the numpy array of the x position of each sample.
+        """
+        return self.mX
+
+    def y(self):
+        """
+        **SUMMARY**
+
+        Return the numpy array of the y position of each sample.
+        """
+        return self.mY
+
+    def vx(self):
+        """
+        **SUMMARY**
+
+        Return the numpy array of the x component of each flow vector.
+        """
+        return self.mVX
+
+    def vy(self):
+        """
+        **SUMMARY**
+
+        Return the numpy array of the y component of each flow vector.
+        """
+        return self.mVY
+
+    def magnitude(self):
+        """
+        **SUMMARY**
+
+        Return the numpy array of the length of each flow vector.
+        """
+        return self.mMagnitude
+
+    def maxMagnitude(self):
+        """
+        **SUMMARY**
+
+        Return the length of the longest flow vector, which the Motion features are normalized to.
+        """
+        if( len(self.mMagnitude) == 0 ):
+            return 0.00
+        return float(self.mMagnitude.max())
+
+    def __len__(self):
+        return len(self.mX)
+
+    def _feature(self, i):
+        if( self.mFeatures[i] is None ):
+            f = Motion(self.mImage,self.mX[i],self.mY[i],self.mVX[i],self.mVY[i],self.mWindow)
+            max_mag = self.maxMagnitude()
+            if( max_mag != 0 ):
+                f.norm_dx = self.mVX[i]/max_mag
+                f.norm_dy = self.mVY[i]/max_mag
+            self.mFeatures[i] = f
+        return self.mFeatures[i]
+
+    def __getitem__(self, i):
+        if( isinstance(i,slice) ):
+            return FeatureSet([self._feature(j) for j in range(*i.indices(len(self)))])
+        if( i < 0 ):
+            i += len(self)
+        if( i < 0 or i >= len(self) ):
+            raise IndexError("MotionField index out of range")
+        return self._feature(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._feature(i)
+
+    def features(self):
+        """
+        **SUMMARY**
+
+        Return a FeatureSet with a Motion feature for every sample, normalized to the
+        longest vector, the same as findMotion returns.
+        """
+        return FeatureSet([self._feature(i) for i in range(len(self))])
+
+    def draw(self, color = Color.GREEN, width=1, normalize=True):
+        """
+        **SUMMARY**
+
+        Draw every flow vector, the same as drawing each of the Motion features, but
+        without making them.
+
+        **PARAMETERS**
+
+        * *color* - An RGB color triplet.
+        * *width* - The line width.
+        * *normalize* - Scale the vectors so the longest one reaches the corner of its sample window.
+
+        """
+        if( normalize ):
+            max_mag = self.maxMagnitude()
+            scale = 0.00
+            if( max_mag != 0 ):
+                win = self.mWindow/2
+                scale = sqrt((win*win)*2)/max_mag
+            ex = self.mX+(self.mVX*scale)
+            ey = self.mY+(self.mVY*scale)
+        else:
+            ex = self.mX+self.mVX
+            ey = self.mY+self.mVY
+        for i in range(len(self)):
+            self.mImage.drawLine((self.mX[i],self.mY[i]),(ex[i],ey[i]),color,width)
+
+    def __repr__(self):
+        return "SimpleCV.Features.MotionField.MotionField object with %d samples" % len(self.mX)
+
+
+from SimpleCV.Features.Features import FeatureSet
+from SimpleCV.Features.Detection import Motion
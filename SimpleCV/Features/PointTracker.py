@@ -0,0 +1,229 @@
+from SimpleCV.base import *
+
+
+class PointTracker:
+    """
+    **SUMMARY**
+
+    The PointTracker follows a sparse set of points, such as corners or keypoints,
+    from frame to frame with pyramidal Lucas-Kanade optical flow. Only the points
+    themselves are tracked, which is far cheaper than computing the dense motion of
+    the whole frame with findMotion when only a few hundred points matter.
+
+    Points that are lost, because the flow failed or they left the frame, are
+    dropped. New points are only searched for when the number of tracked points
+    falls below a fraction of maxPoints, and then only away from the points that are
+    still tracked. The image pyramid of each frame is kept and reused as the previous
+    pyramid for the next frame.
+
+    The results are numpy arrays rather than Features: an Nx2 array of (x,y) points,
+    an array of the id of each point, which stays the same while the point is
+    tracked, and the Nx2 motion of each point since the previous frame.
+
+    **EXAMPLE**
+
+    >>> cam = Camera()
+    >>> tracker = PointTracker(maxPoints=200)
+    >>> while True:
+    >>>     img = cam.getImage()
+    >>>     pts = tracker.track(img)
+    >>>     for (x,y),(dx,dy) in zip(pts,tracker.motion()):
+    >>>         img.drawLine((x-dx,y-dy),(x,y),Color.RED)
+    >>>     img.show()
+
+    **SEE ALSO**
+
+    :py:meth:`findCorners`
+    :py:meth:`findKeypoints`
+    :py:meth:`findMotion`
+    :py:class:`BlobTracker`
+
+    """
+    mPoints = None # the Nx2 float32 array of the (x,y) tracked points
+    mPrevious = None # the Nx2 float32 array of where each point was in the previous frame
+    mIDs = None # the N array of the id of each point
+    mNextID = 0
+    mFrameCount = 0
+    mPrevGray = None # the gray bitmap of the previous frame
+    mPyramids = None # the [previous,current] pyramid buffers
+    mPyramidReady = False # whether mPyramids[0] holds the pyramid of mPrevGray
+
+    def __init__(self, maxPoints=200, reseedBelow=0.7, flavor="CORNERS", minquality=0.04,
+                 mindistance=5.0, keypointQuality=500.00, window=15, levels=3, maxError=None):
+        """
+        **SUMMARY**
+
+        Create a point tracker.
+
+        **PARAMETERS**
+
+        * *maxPoints* - The most points to track at once.
+        * *reseedBelow* - Search for new points when fewer than this fraction of maxPoints are tracked.
+        * *flavor* - "CORNERS" to seed with the findCorners corners, or a findKeypoints flavor
+          like "SURF", "ORB", "FAST" or "STAR" to seed with keypoints.
+        * *minquality* - The findCorners minimum corner quality.
+        * *mindistance* - The smallest distance in pixels between a new point and any other point.
+        * *keypointQuality* - The findKeypoints min_quality, used for the keypoint flavors.
+        * *window* - The size of the Lucas-Kanade search window in pixels.
+        * *levels* - The number of pyramid levels above the full size image, 0 means no pyramid.
+        * *maxError* - Drop points whose Lucas-Kanade match error is more than this, None to keep them all.
+
+        """
+        self.mMaxPoints = int(maxPoints)
+        self.mReseedBelow = reseedBelow
+        self.mFlavor = flavor
+        self.mMinQuality = minquality
+        self.mMinDistance = mindistance
+        self.mKeypointQuality = keypointQuality
+        self.mWindow = int(window)
+        self.mLevels = int(levels)
+        self.mMaxError = maxError
+        self.reset()
+
+    def reset(self):
+        """
+        **SUMMARY**
+
+        Drop all of the points. The next frame is seeded from scratch.
+        """
+        self.mPoints = np.zeros((0,2),dtype=np.float32)
+        self.mPrevious = np.zeros((0,2),dtype=np.float32)
+        self.mIDs = np.zeros(0,dtype=np.int64)
+        self.mNextID = 0
+        self.mFrameCount = 0
+        self.mPrevGray = None
+        self.mPyramids = None
+        self.mPyramidReady = False
+
+    def points(self):
+        """
+        **SUMMARY**
+
+        Return the Nx2 numpy array of the (x,y) tracked points.
+        """
+        return self.mPoints
+
+    def ids(self):
+        """
+        **SUMMARY**
+
+        Return the numpy array of the id of each tracked point.
+        """
+        return self.mIDs
+
+    def motion(self):
+        """
+        **SUMMARY**
+
+        Return the Nx2 numpy array of the (dx,dy) motion of each point since the
+        previous frame. Points that were just seeded have no motion.
+        """
+        return self.mPoints-self.mPrevious
+
+    def _seed(self, img, gray, count):
+        """
+        Return up to count new (x,y) points, as a float32 array, that are at least
+        mMinDistance from every tracked point.
+        """
+        none = np.zeros((0,2),dtype=np.float32)
+        if( count <= 0 ):
+            return none
+        if( self.mFlavor == "CORNERS" ):
+            size = cv.GetSize(gray)
+            mask = None
+            if( len(self.mPoints) > 0 ):
+                mask = cv.CreateImage(size,cv.IPL_DEPTH_8U,1)
+                cv.Set(mask,255)
+                radius = max(1,int(np.ceil(self.mMinDistance)))
+                for x,y in self.mPoints:
+                    cv.Circle(mask,(int(x),int(y)),radius,0,-1)
+            eig_image = cv.CreateImage(size,cv.IPL_DEPTH_32F,1)
+            temp_image = cv.CreateImage(size,cv.IPL_DEPTH_32F,1)
+            found = cv.GoodFeaturesToTrack(gray,eig_image,temp_image,count,self.mMinQuality,self.mMinDistance,mask)
+            return np.array(found,dtype=np.float32).reshape((-1,2))
+
+        kp,d = img._getRawKeypoints(self.mKeypointQuality,self.mFlavor)
+        if( kp is None or len(kp) == 0 ):
+            return none
+        kp = sorted(kp,key=lambda k: -k.response)
+        # the keypoints are found in the transposed gray numpy array
+        pts = np.array([(k.pt[1],k.pt[0]) for k in kp],dtype=np.float32)
+        if( len(self.mPoints) > 0 ):
+            d2 = ((pts[:,np.newaxis,:]-self.mPoints[np.newaxis,:,:])**2).sum(axis=2).min(axis=1)
+            pts = pts[d2 >= self.mMinDistance**2]
+        return pts[:count]
+
+    def _flow(self, gray):
+        """
+        Track mPoints from mPrevGray to gray and return the (new points, which points were kept).
+        """
+        size = cv.GetSize(gray)
+        if( self.mPyramids is None ):
+            # the buffer size the Lucas-Kanade pyramid needs
+            self.mPyramids = [cv.CreateImage((size[0]+8,size[1]/3),cv.IPL_DEPTH_8U,1) for i in range(2)]
+            self.mPyramidReady = False
+        flags = 0
+        if( self.mPyramidReady ):
+            flags = cv.CV_LKFLOW_PYR_A_READY
+        found,status,error = cv.CalcOpticalFlowPyrLK(self.mPrevGray,gray,self.mPyramids[0],self.mPyramids[1],
+                                                      map(tuple,self.mPoints.tolist()),(self.mWindow,self.mWindow),self.mLevels,
+                                                      (cv.CV_TERMCRIT_ITER|cv.CV_TERMCRIT_EPS,20,0.03),flags)
+        # this frame's pyramid is the previous pyramid of the next frame
+        self.mPyramids.reverse()
+        self.mPyramidReady = True
+        found = np.array(found,dtype=np.float32).reshape((-1,2))
+        keep = np.array(status,dtype=bool).reshape(-1)
+        if( self.mMaxError is not None ):
+            keep &= np.array(error,dtype=np.float64).reshape(-1) <= self.mMaxError
+        keep &= (found[:,0] >= 0) & (found[:,1] >= 0) & (found[:,0] < size[0]) & (found[:,1] < size[1])
+        return found,keep
+
+    def track(self, img):
+        """
+        **SUMMARY**
+
+        Track the points into the next frame.
+
+        **PARAMETERS**
+
+        * *img* - The next frame as a SimpleCV Image.
+
+        **RETURNS**
+
+        The Nx2 numpy array of the (x,y) tracked points in this frame. Use ids() and
+        motion() for the id and the motion of each point.
+
+        **EXAMPLE**
+
+        >>> tracker = PointTracker()
+        >>> pts = tracker.track(img)
+        >>> print len(pts), tracker.ids()
+
+        """
+        gray = img._getGrayscaleBitmap()
+        if( self.mPrevGray is not None and cv.GetSize(self.mPrevGray) != cv.GetSize(gray) ):
+            self.reset()
+
+        if( self.mPrevGray is not None and len(self.mPoints) > 0 ):
+            found,keep = self._flow(gray)
+            self.mPrevious = self.mPoints[keep]
+            self.mPoints = found[keep]
+            self.mIDs = self.mIDs[keep]
+        else:
+            self.mPyramidReady = False
+        self.mPrevGray = gray
+        self.mFrameCount += 1
+
+        if( len(self.mPoints) < self.mReseedBelow*self.mMaxPoints ):
+            new = self._seed(img,gray,self.mMaxPoints-len(self.mPoints))
+            self.mPoints = np.vstack((self.mPoints,new))
+            self.mPrevious = np.vstack((self.mPrevious,new))
+            self.mIDs = np.concatenate((self.mIDs,np.arange(self.mNextID,self.mNextID+len(new))))
+            self.mNextID += len(new)
+        return self.mPoints
+
+    def __len__(self):
+        return len(self.mPoints)
+
+    def __repr__(self):
+        return "SimpleCV.Features.PointTracker.PointTracker object with %d points" % len(self.mPoints)
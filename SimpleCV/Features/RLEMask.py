@@ -0,0 +1,321 @@
+from SimpleCV.base import *
+
+
+class RLEMask:
+    """
+    **SUMMARY**
+
+    RLEMask is a compact, run-length encoded binary mask. Blobs used to keep
+    their masks as full three channel Images, which adds up quickly when an image
+    has lots of blobs. An RLEMask only stores the runs of "on" pixels of each row
+    along with the size and position of the mask, and renders back to an Image
+    only when one is asked for.
+
+    Each run is stored as a (row, column, length) triplet in the local coordinates
+    of the mask. The offset places the mask in the coordinates of the source image,
+    so masks from different blobs can be combined directly.
+
+    **EXAMPLE**
+
+    >>> img = Image("lenna")
+    >>> blobs = img.findBlobs()
+    >>> rle = blobs[-1].mMaskRLE
+    >>> print rle.area()
+    >>> rle.getImage().show()
+
+    **SEE ALSO**
+
+    :py:class:`Blob`
+
+    """
+    mRuns = None # an Nx3 int32 array of (row, column, length) runs
+    mSize = (0,0) # the (width,height) of the mask
+    mOffset = (0,0) # the (x,y) position of the top left corner in the source image
+
+    def __init__(self, source=None, offset=(0,0)):
+        """
+        **SUMMARY**
+
+        Create a run-length encoded mask. Any pixel with a value above 127 is part of the mask.
+
+        **PARAMETERS**
+
+        * *source* - The mask data, this can be a SimpleCV Image, a single channel OpenCV
+          iplimage, or a numpy array indexed as [x,y] like the arrays returned by Image.getGrayNumpy().
+        * *offset* - The (x,y) position of the top left corner of the mask in the source image.
+
+        **EXAMPLE**
+
+        >>> mask = img.binarize()
+        >>> rle = RLEMask(mask)
+
+        """
+        self.mOffset = (int(offset[0]),int(offset[1]))
+        self.mSize = (0,0)
+        self.mRuns = np.zeros((0,3),dtype=np.int32)
+        if( source is None ):
+            return None
+        if( isinstance(source,Image) ):
+            data = source.getGrayNumpy().transpose() > 127
+        elif( type(source) == cv.iplimage or type(source) == cv.cvmat ):
+            data = np.array(cv.GetMat(source)) > 127
+            if( len(data.shape) > 2 ):
+                data = data[:,:,0]
+        elif( type(source) == np.ndarray ):
+            data = source.transpose() > 127 if source.dtype != np.bool else source.transpose()
+        else:
+            warnings.warn("RLEMask: the source type is not supported.")
+            return None
+        self._encode(data)
+
+    def _encode(self, data):
+        """
+        Encode a [row,column] boolean array into runs. A blank column is padded to the
+        end of every row so that a run never wraps onto the next row.
+        """
+        h,w = data.shape
+        self.mSize = (w,h)
+        padded = np.zeros((h,w+1),dtype=np.int8)
+        padded[:,0:w] = data
+        edges = np.diff(np.concatenate(([0],padded.ravel())))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        self.mRuns = np.empty((len(starts),3),dtype=np.int32)
+        self.mRuns[:,0] = starts // (w+1)
+        self.mRuns[:,1] = starts % (w+1)
+        self.mRuns[:,2] = ends - starts
+
+    def _decode(self):
+        """
+        Return the mask as a [row,column] boolean array.
+        """
+        w,h = self.mSize
+        n = w*h
+        if( n == 0 ):
+            return np.zeros((h,w),dtype=np.bool)
+        starts = self.mRuns[:,0]*w+self.mRuns[:,1]
+        ends = starts+self.mRuns[:,2]
+        delta = np.bincount(starts,minlength=n+1)-np.bincount(ends,minlength=n+1)
+        return (np.cumsum(delta[0:n]) > 0).reshape((h,w))
+
+    def _flatStarts(self):
+        return self.mRuns[:,0]*self.mSize[0]+self.mRuns[:,1]
+
+    def width(self):
+        """
+        **SUMMARY**
+
+        Returns the width of the mask in pixels.
+        """
+        return self.mSize[0]
+
+    def height(self):
+        """
+        **SUMMARY**
+
+        Returns the height of the mask in pixels.
+        """
+        return self.mSize[1]
+
+    def size(self):
+        """
+        **SUMMARY**
+
+        Returns the (width,height) of the mask.
+        """
+        return self.mSize
+
+    def offset(self):
+        """
+        **SUMMARY**
+
+        Returns the (x,y) position of the mask's top left corner in the source image.
+        """
+        return self.mOffset
+
+    def area(self):
+        """
+        **SUMMARY**
+
+        Returns the number of pixels inside the mask.
+
+        **RETURNS**
+
+        An integer count of the mask pixels.
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> blobs = img.findBlobs()
+        >>> print blobs[-1].mMaskRLE.area()
+
+        """
+        return int(np.sum(self.mRuns[:,2]))
+
+    def containsPoints(self, points):
+        """
+        **SUMMARY**
+
+        Test an array of (x,y) points, given in source image coordinates, against the mask.
+
+        **PARAMETERS**
+
+        * *points* - A list of (x,y) tuples or an Nx2 numpy array.
+
+        **RETURNS**
+
+        A numpy boolean array that is true where the point is in the mask.
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> blobs = img.findBlobs()
+        >>> print blobs[-1].mMaskRLE.containsPoints([(10,10),(20,20)])
+
+        """
+        pts = np.asarray(points).reshape((-1,2))
+        lx = np.floor(pts[:,0]).astype(np.int64)-self.mOffset[0]
+        ly = np.floor(pts[:,1]).astype(np.int64)-self.mOffset[1]
+        w,h = self.mSize
+        retVal = (lx >= 0) & (lx < w) & (ly >= 0) & (ly < h)
+        if( len(self.mRuns) == 0 ):
+            return retVal & False
+        starts = self._flatStarts()
+        keys = ly*w+lx
+        idx = np.searchsorted(starts,keys,side='right')-1
+        valid = idx >= 0
+        idx[~valid] = 0
+        retVal &= valid & (keys < starts[idx]+self.mRuns[idx,2])
+        return retVal
+
+    def contains(self, point):
+        """
+        **SUMMARY**
+
+        Returns true if the (x,y) point, in source image coordinates, is inside the mask.
+
+        **PARAMETERS**
+
+        * *point* - An (x,y) tuple.
+
+        **RETURNS**
+
+        A boolean.
+
+        """
+        return bool(self.containsPoints([point])[0])
+
+    def _combine(self, other, bounds, op):
+        """
+        Decode both masks into the (x,y,w,h) bounds given, in source image coordinates,
+        and combine them with a numpy logical operation.
+        """
+        x,y,w,h = bounds
+        if( w <= 0 or h <= 0 ):
+            return RLEMask(None,(x,y))
+        data = []
+        for m in (self,other):
+            canvas = np.zeros((h,w),dtype=np.bool)
+            mx = m.mOffset[0]-x
+            my = m.mOffset[1]-y
+            mw,mh = m.mSize
+            # clip the mask to the output bounds
+            x0,y0 = max(mx,0),max(my,0)
+            x1,y1 = min(mx+mw,w),min(my+mh,h)
+            if( x1 > x0 and y1 > y0 ):
+                canvas[y0:y1,x0:x1] = m._decode()[y0-my:y1-my,x0-mx:x1-mx]
+            data.append(canvas)
+        retVal = RLEMask(None,(x,y))
+        retVal._encode(op(data[0],data[1]))
+        return retVal
+
+    def union(self, other):
+        """
+        **SUMMARY**
+
+        Returns a new RLEMask that covers every pixel in either this mask or the other mask.
+
+        **PARAMETERS**
+
+        * *other* - Another RLEMask.
+
+        **RETURNS**
+
+        An RLEMask sized to cover both masks.
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> blobs = img.findBlobs()
+        >>> both = blobs[-1].mMaskRLE.union(blobs[-2].mMaskRLE)
+
+        """
+        x = min(self.mOffset[0],other.mOffset[0])
+        y = min(self.mOffset[1],other.mOffset[1])
+        w = max(self.mOffset[0]+self.mSize[0],other.mOffset[0]+other.mSize[0])-x
+        h = max(self.mOffset[1]+self.mSize[1],other.mOffset[1]+other.mSize[1])-y
+        return self._combine(other,(x,y,w,h),np.logical_or)
+
+    def intersection(self, other):
+        """
+        **SUMMARY**
+
+        Returns a new RLEMask of the pixels that are in both this mask and the other mask.
+
+        **PARAMETERS**
+
+        * *other* - Another RLEMask.
+
+        **RETURNS**
+
+        An RLEMask sized to the overlap of the two masks, it is empty if they do not overlap.
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> blobs = img.findBlobs()
+        >>> print blobs[-1].mMaskRLE.intersection(blobs[-2].mMaskRLE).area()
+
+        """
+        x = max(self.mOffset[0],other.mOffset[0])
+        y = max(self.mOffset[1],other.mOffset[1])
+        w = min(self.mOffset[0]+self.mSize[0],other.mOffset[0]+other.mSize[0])-x
+        h = min(self.mOffset[1]+self.mSize[1],other.mOffset[1]+other.mSize[1])-y
+        return self._combine(other,(x,y,w,h),np.logical_and)
+
+    def getNumpy(self):
+        """
+        **SUMMARY**
+
+        Render the mask to a uint8 numpy array indexed as [x,y], with 255 inside
+        the mask and 0 everywhere else.
+        """
+        return (self._decode().transpose()*255).astype(np.uint8)
+
+    def getImage(self):
+        """
+        **SUMMARY**
+
+        Render the mask to a SimpleCV Image, white inside the mask and black elsewhere.
+
+        **RETURNS**
+
+        A SimpleCV Image the size of the mask.
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> blobs = img.findBlobs()
+        >>> blobs[-1].mMaskRLE.getImage().show()
+
+        """
+        w,h = self.mSize
+        if( w == 0 or h == 0 ):
+            return None
+        return Image(self.getNumpy())
+
+    def __repr__(self):
+        return "SimpleCV.Features.RLEMask.RLEMask object at (%d, %d) size (%d, %d) with %d runs" % (self.mOffset[0],self.mOffset[1],self.mSize[0],self.mSize[1],len(self.mRuns))
+
+
+from SimpleCV.ImageClass import Image
@@ -0,0 +1,213 @@
+from SimpleCV.base import *
+
+
+class ShapeLibrary:
+    """
+    **SUMMARY**
+
+    A ShapeLibrary holds the Hu moment signatures of a collection of reference
+    blobs so that lots of blobs can be matched against lots of shapes at once.
+    It uses the same comparison as :py:meth:`Blob.match` (OpenCV's I1 method,
+    the sum of the absolute differences of the reciprocal log transformed Hu
+    moments), but the log transform is done once per reference shape and a whole
+    FeatureSet is scored with a single distance matrix computation instead of
+    nested python loops.
+
+    **EXAMPLE**
+
+    >>> lib = ShapeLibrary()
+    >>> lib.add(Image("nut.png").findBlobs()[-1],"nut")
+    >>> lib.add(Image("bolt.png").findBlobs()[-1],"bolt")
+    >>> lib.save("fasteners.shapes")
+    >>> blobs = Image("pile.png").findBlobs()
+    >>> labels, scores = lib.match(blobs)
+
+    **SEE ALSO**
+
+    :py:meth:`Blob.match`
+
+    """
+    mLabels = [] # the label of each reference shape
+    mSignatures = None # an Mx7 array of the reciprocal log transformed Hu moments
+
+    def __init__(self, blobs=None, labels=None):
+        """
+        **SUMMARY**
+
+        Create a shape library, optionally seeded with a list of blobs.
+
+        **PARAMETERS**
+
+        * *blobs* - A blob, a list of blobs, or a FeatureSet of blobs to add to the library.
+        * *labels* - A label or list of labels, one per blob. If no labels are given the
+          index of the shape in the library is used.
+
+        """
+        self.mLabels = []
+        self.mSignatures = np.zeros((0,7))
+        if( blobs is not None ):
+            self.add(blobs,labels)
+
+    def _signatures(self, blobs):
+        """
+        Return the Nx7 reciprocal log transformed Hu moments of a list of blobs.
+        Terms that do not have a finite value (i.e. a Hu moment of zero) are set to zero.
+        """
+        hu = np.array([b.mHu for b in blobs],dtype=np.float64).reshape((-1,7))
+        olderr = np.seterr(all='ignore')
+        retVal = 1.0/(np.sign(hu)*np.log(np.abs(hu)))
+        np.seterr(**olderr)
+        retVal[~np.isfinite(retVal)] = 0
+        return retVal
+
+    def add(self, blobs, labels=None):
+        """
+        **SUMMARY**
+
+        Add one or more reference blobs to the library.
+
+        **PARAMETERS**
+
+        * *blobs* - A blob, a list of blobs, or a FeatureSet of blobs.
+        * *labels* - A label or list of labels, one per blob. If no labels are given the
+          index of the shape in the library is used.
+
+        **RETURNS**
+
+        Nothing.
+
+        **EXAMPLE**
+
+        >>> lib = ShapeLibrary()
+        >>> lib.add(Image("nut.png").findBlobs(),"nut")
+
+        """
+        if( not isinstance(blobs,list) ):
+            blobs = [blobs]
+        if( labels is None ):
+            labels = range(len(self.mLabels),len(self.mLabels)+len(blobs))
+        elif( not isinstance(labels,list) ):
+            labels = [labels]*len(blobs)
+        if( len(labels) != len(blobs) ):
+            warnings.warn("ShapeLibrary.add - the number of labels does not match the number of blobs.")
+            return None
+        self.mSignatures = np.vstack((self.mSignatures,self._signatures(blobs)))
+        self.mLabels.extend(labels)
+
+    def distanceMatrix(self, blobs):
+        """
+        **SUMMARY**
+
+        Compute the match distance between every blob and every shape in the library.
+
+        **PARAMETERS**
+
+        * *blobs* - A blob, a list of blobs, or a FeatureSet of blobs.
+
+        **RETURNS**
+
+        An NxM numpy array where N is the number of blobs and M is the number of
+        shapes in the library. Lower values are better matches, the values are the
+        same as :py:meth:`Blob.match` returns.
+
+        **EXAMPLE**
+
+        >>> d = lib.distanceMatrix(img.findBlobs())
+
+        """
+        if( not isinstance(blobs,list) ):
+            blobs = [blobs]
+        if( len(blobs) == 0 or len(self.mLabels) == 0 ):
+            return np.zeros((len(blobs),len(self.mLabels)))
+        return spsd.cdist(self._signatures(blobs),self.mSignatures,'cityblock')
+
+    def match(self, blobs, k=1):
+        """
+        **SUMMARY**
+
+        Find the best matching library shapes for each blob.
+
+        **PARAMETERS**
+
+        * *blobs* - A blob, a list of blobs, or a FeatureSet of blobs.
+        * *k* - The number of matches to return per blob.
+
+        **RETURNS**
+
+        A (labels, scores) tuple. When k is one labels is a list with the best
+        label for each blob and scores is a numpy array of the match distance.
+        When k is larger labels is a list of lists and scores an Nxk array, both
+        ordered from best to worst match. If the library is empty both are empty.
+
+        **EXAMPLE**
+
+        >>> labels, scores = lib.match(img.findBlobs())
+        >>> for b,l,s in zip(blobs,labels,scores):
+        >>>     if( s < 0.1 ):
+        >>>         b.mLabel = l
+
+        """
+        d = self.distanceMatrix(blobs)
+        if( d.shape[1] == 0 ):
+            return [],np.zeros((d.shape[0],0))
+        k = max(1,min(k,d.shape[1]))
+        if( k == 1 ):
+            best = np.argmin(d,axis=1)
+            return [self.mLabels[i] for i in best], d[np.arange(d.shape[0]),best]
+        best = np.argsort(d,axis=1)[:,0:k]
+        scores = d[np.arange(d.shape[0])[:,np.newaxis],best]
+        return [[self.mLabels[i] for i in row] for row in best], scores
+
+    def save(self, filename):
+        """
+        **SUMMARY**
+
+        Save the library to a file. Only the labels and the precomputed signatures
+        are stored, not the blobs.
+
+        **PARAMETERS**
+
+        * *filename* - The file name and path to save the library to.
+
+        **RETURNS**
+
+        Nothing.
+
+        **EXAMPLE**
+
+        >>> lib.save("fasteners.shapes")
+
+        """
+        output = open(filename,'wb')
+        pickle.dump({'labels':self.mLabels,'signatures':self.mSignatures.astype(np.float32)},output,2)
+        output.close()
+
+    def load(self, filename):
+        """
+        **SUMMARY**
+
+        Load a library that was saved with :py:meth:`save`, replacing the current contents.
+
+        **PARAMETERS**
+
+        * *filename* - The file name and path to load the library from.
+
+        **RETURNS**
+
+        Nothing.
+
+        **EXAMPLE**
+
+        >>> lib = ShapeLibrary()
+        >>> lib.load("fasteners.shapes")
+
+        """
+        data = pickle.load(open(filename,'rb'))
+        self.mLabels = list(data['labels'])
+        self.mSignatures = np.array(data['signatures'],dtype=np.float64).reshape((-1,7))
+
+    def __len__(self):
+        return len(self.mLabels)
+
+    def __repr__(self):
+        return "SimpleCV.Features.ShapeLibrary.ShapeLibrary object with %d shapes" % len(self.mLabels)
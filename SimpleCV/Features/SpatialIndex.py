@@ -0,0 +1,305 @@
+from SimpleCV.base import *
+from scipy.spatial import cKDTree
+
+
+class SpatialIndex:
+    """
+    **SUMMARY**
+
+    A SpatialIndex is a uniform grid over a set of axis aligned boxes. Each box is
+    filed under every grid cell it touches, so finding the boxes that touch a region
+    only looks at the cells under that region instead of every box. The grid is
+    stored as two sorted numpy arrays (cell key, box index) so building and querying
+    it never loops over the boxes in python.
+
+    Nearest neighbour queries use a kd-tree over the box centers, or the points given.
+
+    FeatureSets build one of these lazily, see :py:meth:`FeatureSet.spatialIndex`.
+
+    **EXAMPLE**
+
+    >>> boxes = np.array([[0,0,10,10],[5,5,20,20],[50,50,60,60]])
+    >>> idx = SpatialIndex(boxes)
+    >>> print idx.query((8,8,12,12))
+    >>> print idx.overlapPairs(idx)
+
+    **SEE ALSO**
+
+    :py:class:`FeatureSet`
+
+    """
+    mBounds = None # an Nx4 array of (minx,miny,maxx,maxy) boxes
+    mCenters = None # an Nx2 array of the points used for nearest neighbour queries
+    mCellSize = 1.0 # the width and height of a grid cell
+    mOrigin = (0.0,0.0) # the top left corner of the grid
+    mGridSize = (0,0) # the number of (columns,rows) in the grid
+    mKeys = None # the sorted cell key of each grid entry
+    mItems = None # the box index of each grid entry
+    mUnbounded = None # the indices of the boxes that have no finite extent
+    mTree = None # a lazily built kd-tree of mCenters
+
+    def __init__(self, bounds, centers=None, cellSize=None):
+        """
+        **SUMMARY**
+
+        Build the index.
+
+        **PARAMETERS**
+
+        * *bounds* - An Nx4 array like of (minx,miny,maxx,maxy) boxes. Boxes with a
+          non finite edge are not put in the grid and are returned by every region query.
+        * *centers* - An optional Nx2 array of the points to use for nearest neighbour
+          queries, the default is the center of each box.
+        * *cellSize* - The size of the grid cells. By default this is picked so that
+          there are roughly as many cells as boxes, but no smaller than a typical box.
+
+        """
+        self.mBounds = np.array(bounds,dtype=np.float64).reshape((-1,4))
+        if( centers is None ):
+            self.mCenters = (self.mBounds[:,0:2]+self.mBounds[:,2:4])/2.0
+        else:
+            self.mCenters = np.array(centers,dtype=np.float64).reshape((-1,2))
+        self.mTree = None
+        finite = np.all(np.isfinite(self.mBounds),axis=1)
+        self.mUnbounded = np.flatnonzero(~finite)
+        fb = self.mBounds[finite]
+        ids = np.flatnonzero(finite)
+
+        if( len(fb) == 0 ):
+            self.mOrigin = (0.0,0.0)
+            self.mCellSize = 1.0
+            self.mGridSize = (0,0)
+        else:
+            x0,y0 = fb[:,0].min(),fb[:,1].min()
+            x1,y1 = fb[:,2].max(),fb[:,3].max()
+            self.mOrigin = (x0,y0)
+            if( cellSize is None ):
+                typical = np.median(np.maximum(fb[:,2]-fb[:,0],fb[:,3]-fb[:,1]))
+                cellSize = max(typical,np.sqrt((x1-x0)*(y1-y0)/float(len(fb))),1.0)
+            self.mCellSize = float(cellSize)
+            self.mGridSize = (int((x1-x0)//self.mCellSize)+1,int((y1-y0)//self.mCellSize)+1)
+
+        self.mKeys,self.mItems = self._cells(fb,ids)
+        order = np.argsort(self.mKeys,kind='mergesort')
+        self.mKeys = self.mKeys[order]
+        self.mItems = self.mItems[order]
+
+    def _cells(self, bounds, ids):
+        """
+        Return the (cell keys, box ids) of every grid cell each box touches. Parts of a
+        box that fall off the grid are clipped.
+        """
+        gw,gh = self.mGridSize
+        if( len(bounds) == 0 or gw == 0 ):
+            return np.zeros(0,dtype=np.int64),np.zeros(0,dtype=np.int64)
+        c = np.floor((bounds-np.array(self.mOrigin*2))/self.mCellSize)
+        c[:,0::2] = np.clip(c[:,0::2],-1,gw)
+        c[:,1::2] = np.clip(c[:,1::2],-1,gh)
+        c = c.astype(np.int64)
+        cx0 = np.maximum(c[:,0],0)
+        cy0 = np.maximum(c[:,1],0)
+        nx = np.maximum(np.minimum(c[:,2],gw-1)-cx0+1,0)
+        ny = np.maximum(np.minimum(c[:,3],gh-1)-cy0+1,0)
+        counts = nx*ny
+        total = counts.sum()
+        local = np.arange(total)-np.repeat(np.cumsum(counts)-counts,counts)
+        nxr = np.repeat(nx,counts)
+        cx = np.repeat(cx0,counts)+local % np.maximum(nxr,1)
+        cy = np.repeat(cy0,counts)+local // np.maximum(nxr,1)
+        return cy*gw+cx,np.repeat(np.asarray(ids,dtype=np.int64),counts)
+
+    def _expand(self, lo, hi):
+        """
+        Return the concatenation of the index ranges [lo[i],hi[i]).
+        """
+        cnt = np.maximum(hi-lo,0)
+        total = cnt.sum()
+        return np.repeat(lo-(np.cumsum(cnt)-cnt),cnt)+np.arange(total)
+
+    def __len__(self):
+        return len(self.mBounds)
+
+    def query(self, bounds):
+        """
+        **SUMMARY**
+
+        Find the boxes that touch a region.
+
+        **PARAMETERS**
+
+        * *bounds* - The (minx,miny,maxx,maxy) of the region. Boxes that share an edge with the region touch it.
+
+        **RETURNS**
+
+        A sorted numpy array of the indices of the boxes that touch the region, plus
+        the boxes without a finite extent.
+
+        **EXAMPLE**
+
+        >>> idx = SpatialIndex(boxes)
+        >>> print idx.query((0,0,100,100))
+
+        """
+        q = np.array(bounds,dtype=np.float64).reshape((1,4))
+        keys,_ = self._cells(q,[0])
+        lo = np.searchsorted(self.mKeys,keys,side='left')
+        hi = np.searchsorted(self.mKeys,keys,side='right')
+        cand = np.unique(self.mItems[self._expand(lo,hi)])
+        b = self.mBounds[cand]
+        hit = ( (b[:,0] <= q[0,2]) & (b[:,2] >= q[0,0]) &
+                (b[:,1] <= q[0,3]) & (b[:,3] >= q[0,1]) )
+        return np.union1d(cand[hit],self.mUnbounded)
+
+    def overlapPairs(self, other):
+        """
+        **SUMMARY**
+
+        Find every pair of boxes, one from this index and one from another, that touch.
+
+        **PARAMETERS**
+
+        * *other* - Another SpatialIndex, or this one for a self join.
+
+        **RETURNS**
+
+        A Kx2 numpy array of (index in this, index in other) pairs, sorted by the first
+        then the second column. Boxes without a finite extent are paired with everything.
+
+        **EXAMPLE**
+
+        >>> pairs = a.overlapPairs(b)
+
+        """
+        n = len(self.mBounds)
+        m = len(other.mBounds)
+        finite = np.all(np.isfinite(other.mBounds),axis=1)
+        okeys,oitems = self._cells(other.mBounds[finite],np.flatnonzero(finite))
+        lo = np.searchsorted(self.mKeys,okeys,side='left')
+        hi = np.searchsorted(self.mKeys,okeys,side='right')
+        a = self.mItems[self._expand(lo,hi)]
+        b = np.repeat(oitems,np.maximum(hi-lo,0))
+        ab = self.mBounds[a]
+        bb = other.mBounds[b]
+        hit = ( (ab[:,0] <= bb[:,2]) & (ab[:,2] >= bb[:,0]) &
+                (ab[:,1] <= bb[:,3]) & (ab[:,3] >= bb[:,1]) )
+        pairs = [a[hit]*m+b[hit]]
+        # boxes with no extent go with everything
+        if( len(self.mUnbounded) ):
+            pairs.append((self.mUnbounded[:,np.newaxis]*m+np.arange(m)[np.newaxis,:]).ravel())
+        if( len(other.mUnbounded) ):
+            pairs.append((np.arange(n)[:,np.newaxis]*m+other.mUnbounded[np.newaxis,:]).ravel())
+        flat = np.unique(np.concatenate(pairs).astype(np.int64))
+        return np.column_stack((flat//m,flat % m)) if m > 0 else np.zeros((0,2),dtype=np.int64)
+
+    def nearest(self, points, k=1):
+        """
+        **SUMMARY**
+
+        Find the k nearest centers to each of a set of points.
+
+        **PARAMETERS**
+
+        * *points* - An (x,y) tuple or an Mx2 array of points.
+        * *k* - The number of neighbours to find.
+
+        **RETURNS**
+
+        A (distances, indices) tuple of Mxk numpy arrays ordered from nearest to farthest.
+        If there are fewer than k centers the missing entries have an infinite distance
+        and an index equal to the number of centers.
+
+        **EXAMPLE**
+
+        >>> d,i = idx.nearest((100,100),k=3)
+
+        """
+        pts = np.array(points,dtype=np.float64).reshape((-1,2))
+        if( len(self.mCenters) == 0 ):
+            return np.zeros((len(pts),k))+np.inf,np.zeros((len(pts),k),dtype=np.int64)
+        if( self.mTree is None ):
+            self.mTree = cKDTree(self.mCenters)
+        d,i = self.mTree.query(pts,k)
+        return np.array(d).reshape((len(pts),k)),np.array(i).reshape((len(pts),k))
+
+    def pairsWithin(self, distance):
+        """
+        **SUMMARY**
+
+        Find every pair of centers that are no more than a distance apart.
+
+        **PARAMETERS**
+
+        * *distance* - The largest distance between the two centers of a pair.
+
+        **RETURNS**
+
+        A Kx3 numpy array of (i, j, distance) rows with i < j.
+
+        **EXAMPLE**
+
+        >>> close = idx.pairsWithin(10)
+
+        """
+        half = distance/2.0
+        c = self.mCenters
+        boxes = SpatialIndex(np.hstack((c-half,c+half)),c,max(distance,1.0))
+        pairs = boxes.overlapPairs(boxes)
+        pairs = pairs[pairs[:,0] < pairs[:,1]]
+        d = np.sqrt(np.sum((c[pairs[:,0]]-c[pairs[:,1]])**2,axis=1))
+        keep = d <= distance
+        return np.column_stack((pairs[keep],d[keep]))
+
+    def __getstate__(self):
+        #the kd-tree is rebuilt on demand rather than pickled
+        state = self.__dict__.copy()
+        state['mTree'] = None
+        return state
+
+    def __repr__(self):
+        return "SimpleCV.Features.SpatialIndex.SpatialIndex object with %d boxes in a %dx%d grid" % (len(self.mBounds),self.mGridSize[0],self.mGridSize[1])
+
+
+def suppressBoxes(bounds, scores, overlap=0.3):
+    """
+    **SUMMARY**
+
+    Greedy non-maximum suppression of a set of boxes. Working down from the best score,
+    every remaining box whose intersection over union with a kept box is more than
+    overlap is dropped. The overlaps with all of the remaining boxes are computed in
+    one step for each kept box.
+
+    **PARAMETERS**
+
+    * *bounds* - An Nx4 array like of (minx,miny,maxx,maxy) boxes.
+    * *scores* - N scores, higher is better. Ties keep the earlier box.
+    * *overlap* - The largest intersection over union two kept boxes may have.
+
+    **RETURNS**
+
+    A numpy array of the indices of the kept boxes, best score first.
+
+    **EXAMPLE**
+
+    >>> keep = suppressBoxes([[0,0,10,10],[1,1,11,11]],[0.5,0.9])
+
+    **SEE ALSO**
+
+    :py:meth:`FeatureSet.nonMaxSuppression`
+
+    """
+    b = np.array(bounds,dtype=np.float64).reshape((-1,4))
+    x0,y0,x1,y1 = b[:,0],b[:,1],b[:,2],b[:,3]
+    area = np.maximum(x1-x0,0)*np.maximum(y1-y0,0)
+    order = np.argsort(-np.asarray(scores,dtype=np.float64).ravel(),kind='mergesort')
+    keep = []
+    while( len(order) > 0 ):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.minimum(x1[i],x1[rest])-np.maximum(x0[i],x0[rest])
+        h = np.minimum(y1[i],y1[rest])-np.maximum(y0[i],y0[rest])
+        inter = np.maximum(w,0)*np.maximum(h,0)
+        union = area[i]+area[rest]-inter
+        iou = inter/np.where(union > 0,union,1.0)
+        order = rest[~(iou > overlap)]
+    return np.array(keep,dtype=np.int64)
@@ -0,0 +1,227 @@
+from SimpleCV.base import *
+
+
+class TemplateBank:
+    """
+    **SUMMARY**
+
+    A TemplateBank searches an image for many templates at once. Calling
+    Image.findTemplate once per template redoes the grayscale statistics and the
+    whole correlation every time. The bank instead keeps the Fourier transform and
+    the normalization terms of every template, and for each image computes its
+    Fourier transform and integral images once. The correlations with all of the
+    templates then come out of one batched frequency domain pass.
+
+    The match maps use the same methods and the results the same threshold rule as
+    findTemplate, so find() returns what calling findTemplate with each template would.
+
+    **EXAMPLE**
+
+    >>> img = Image("lenna")
+    >>> parts = [img.crop(200,200,40,40),img.crop(300,250,32,48)]
+    >>> bank = TemplateBank(parts)
+    >>> matches = bank.find(img)
+    >>> for fs in matches:
+    >>>     fs.draw()
+    >>> img.show()
+
+    **SEE ALSO**
+
+    :py:meth:`Image.findTemplate`
+
+    """
+    mTemplates = [] # the template Images
+    mArrays = [] # the grayscale [y,x] float arrays of the templates
+    mSums = None # a Kx3 array of (pixel count, sum, sum of squares) for each template
+    mMethod = "SQR_DIFF_NORM" # the match method, one of the findTemplate method names
+    mCheck = 1 # if check > 0 smaller match values are better
+    mSpectra = None # the cached template transforms for one transform size
+    mSpectraShape = None # the transform size mSpectra was made for
+    mBatchBytes = 1<<26 # roughly how much memory one batch of correlations may use
+
+    def __init__(self, templates=None, method="SQR_DIFF_NORM"):
+        """
+        **SUMMARY**
+
+        Make a bank of templates.
+
+        **PARAMETERS**
+
+        * *templates* - A list of template Images.
+        * *method* - The match method, any of the findTemplate methods:
+
+          * SQR_DIFF_NORM - Normalized square difference
+          * SQR_DIFF      - Square difference
+          * CCOEFF        - Correlation coefficient
+          * CCOEFF_NORM   - Normalized correlation coefficient
+          * CCORR         - Cross correlation
+          * CCORR_NORM    - Normalized cross correlation
+
+        """
+        if( method is None or method == "" ):
+            method = "SQR_DIFF_NORM"
+        if( method not in ["SQR_DIFF_NORM","SQR_DIFF","CCOEFF","CCOEFF_NORM","CCORR","CCORR_NORM"] ):
+            warnings.warn("TemplateBank: I don't know the template matching method "+str(method)+", using SQR_DIFF_NORM.")
+            method = "SQR_DIFF_NORM"
+        self.mMethod = method
+        self.mCheck = 1 if method in ["SQR_DIFF_NORM","SQR_DIFF"] else 0
+        self.mTemplates = []
+        self.mArrays = []
+        self.mSums = np.zeros((0,3))
+        self.mSpectra = None
+        self.mSpectraShape = None
+        if( templates is not None ):
+            for t in templates:
+                self.addTemplate(t)
+
+    def addTemplate(self, template):
+        """
+        **SUMMARY**
+
+        Add a template Image to the bank.
+
+        **RETURNS**
+
+        The index of the template, which is also the index of its matches in find().
+
+        """
+        data = template.getGrayNumpy().transpose().astype(np.float64)
+        self.mTemplates.append(template)
+        self.mArrays.append(data)
+        self.mSums = np.vstack((self.mSums,[data.size,data.sum(),(data**2).sum()]))
+        self.mSpectra = None
+        self.mSpectraShape = None
+        return len(self.mTemplates)-1
+
+    def __len__(self):
+        return len(self.mTemplates)
+
+    def _fastSize(self, n):
+        """
+        Return the smallest number >= n with no prime factors over 5, which the FFT handles quickly.
+        """
+        best = 2*n
+        f5 = 1
+        while( f5 < best ):
+            f35 = f5
+            while( f35 < best ):
+                f = f35
+                while( f < n ):
+                    f *= 2
+                best = min(best,f)
+                f35 *= 3
+            f5 *= 5
+        return best
+
+    def _spectra(self, shape):
+        """
+        Return the conjugate transforms of all of the templates zero padded to shape,
+        as a KxHx(W/2+1) array, computing them the first time a shape is used.
+        """
+        if( self.mSpectraShape != shape ):
+            spectra = np.zeros((len(self.mArrays),shape[0],shape[1]/2+1),dtype=np.complex64)
+            for k,data in enumerate(self.mArrays):
+                spectra[k] = np.conj(np.fft.rfft2(data,s=shape))
+            self.mSpectra = spectra
+            self.mSpectraShape = shape
+        return self.mSpectra
+
+    def _windowSums(self, integral, th, tw):
+        """
+        Return the sum of every th x tw window of an image from its integral image.
+        """
+        return integral[th:,tw:]-integral[:-th,tw:]-integral[th:,:-tw]+integral[:-th,:-tw]
+
+    def _score(self, corr, s1, s2, k):
+        """
+        Turn the correlation of template k with the image into the bank's match map,
+        using the image window sums s1 and squared sums s2.
+        """
+        n,t1,t2 = self.mSums[k]
+        if( self.mMethod == "CCORR" ):
+            return corr
+        elif( self.mMethod == "CCORR_NORM" ):
+            denom = np.sqrt(np.maximum(s2,0)*t2)
+            return np.where(denom > 0,corr/np.where(denom > 0,denom,1),0)
+        elif( self.mMethod == "SQR_DIFF" ):
+            return np.maximum(s2-2*corr+t2,0)
+        elif( self.mMethod == "SQR_DIFF_NORM" ):
+            denom = np.sqrt(np.maximum(s2,0)*t2)
+            diff = np.maximum(s2-2*corr+t2,0)
+            return np.where(denom > 0,diff/np.where(denom > 0,denom,1),1)
+        ccoeff = corr-s1*(t1/n)
+        if( self.mMethod == "CCOEFF" ):
+            return ccoeff
+        denom = np.sqrt(np.maximum(s2-s1**2/n,0)*max(t2-t1**2/n,0))
+        return np.where(denom > 0,ccoeff/np.where(denom > 0,denom,1),0)
+
+    def find(self, image, threshold=5):
+        """
+        **SUMMARY**
+
+        Search an image for every template in the bank.
+
+        **PARAMETERS**
+
+        * *image* - The Image to search.
+        * *threshold* - The number of standard deviations better than the mean a match
+          value has to be, like in findTemplate.
+
+        **RETURNS**
+
+        A list with a FeatureSet of TemplateMatch objects for each template, in the
+        order the templates were added. Templates bigger than the image get an empty FeatureSet.
+
+        **EXAMPLE**
+
+        >>> bank = TemplateBank(parts)
+        >>> for fs in bank.find(img,threshold=4):
+        >>>     print len(fs)
+
+        """
+        retVal = [FeatureSet() for t in self.mTemplates]
+        if( len(self.mTemplates) == 0 ):
+            return retVal
+        gray = image.getGrayNumpy().transpose().astype(np.float64)
+        h,w = gray.shape
+        shape = (self._fastSize(h),self._fastSize(w))
+        spectra = self._spectra(shape)
+        imgSpectrum = np.fft.rfft2(gray,s=shape)
+
+        # the window sums for each template size come from the same integral images
+        integral = np.zeros((h+1,w+1))
+        integral[1:,1:] = gray.cumsum(axis=0).cumsum(axis=1)
+        integral2 = np.zeros((h+1,w+1))
+        integral2[1:,1:] = (gray**2).cumsum(axis=0).cumsum(axis=1)
+        sums = {}
+
+        fits = [k for k,t in enumerate(self.mArrays) if t.shape[0] <= h and t.shape[1] <= w]
+        batch = max(1,self.mBatchBytes/(shape[0]*shape[1]*16))
+        for start in range(0,len(fits),batch):
+            chunk = fits[start:start+batch]
+            corrs = np.fft.irfft2(imgSpectrum[np.newaxis,:,:]*spectra[chunk],s=shape)
+            for corr,k in zip(corrs,chunk):
+                th,tw = self.mArrays[k].shape
+                if( (th,tw) not in sums ):
+                    sums[(th,tw)] = (self._windowSums(integral,th,tw),self._windowSums(integral2,th,tw))
+                s1,s2 = sums[(th,tw)]
+                matches = self._score(corr[:h-th+1,:w-tw+1],s1,s2,k)
+                xs,ys,scores = image._templatePeaks(matches,threshold,self.mCheck,tw,th)
+                bitmap = self.mTemplates[k].getBitmap()
+                for x,y,q in zip(xs,ys,scores):
+                    retVal[k].append(TemplateMatch(image,bitmap,(x,y),q,self.mCheck > 0))
+        return retVal
+
+    def __getstate__(self):
+        #the template transforms are recomputed on demand rather than pickled
+        state = self.__dict__.copy()
+        state['mSpectra'] = None
+        state['mSpectraShape'] = None
+        return state
+
+    def __repr__(self):
+        return "SimpleCV.Features.TemplateBank.TemplateBank object with %d templates" % len(self.mTemplates)
+
+
+from SimpleCV.Features.Features import FeatureSet
+from SimpleCV.Features.Detection import TemplateMatch
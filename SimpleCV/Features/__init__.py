@@ -1,8 +1,19 @@
 from SimpleCV.Features.HaarCascade import *
 from SimpleCV.Features.Features import *
+from SimpleCV.Features.SpatialIndex import *
 from SimpleCV.Features.Detection import *
+from SimpleCV.Features.RLEMask import *
 from SimpleCV.Features.BlobMaker import *
 from SimpleCV.Features.Blob import *
+from SimpleCV.Features.ShapeLibrary import *
+from SimpleCV.Features.BlobTracker import *
+from SimpleCV.Features.TemplateBank import *
+from SimpleCV.Features.HaarTracker import *
+from SimpleCV.Features.KeypointDatabase import *
+from SimpleCV.Features.HammingIndex import *
+from SimpleCV.Features.PointTracker import *
+from SimpleCV.Features.MotionField import *
+from SimpleCV.Features.CamShiftTracker import *
 from SimpleCV.Features.BOFFeatureExtractor import *
 from SimpleCV.Features.FeatureExtractorBase import *
 from SimpleCV.Features.HueHistogramFeatureExtractor import *
@@ -6,8 +6,6 @@ from numpy import uint8
 from EXIF import *
 import pygame as pg
 import scipy.ndimage as ndimage
-import scipy.stats.stats as sss  #for auto white balance
-import scipy.cluster.vq as scv    
 import math # math... who does that 
 import copy # for deep copy
 
@@ -440,6 +438,7 @@ class Image:
     _mPalette = None
     _mPaletteMembers = None
     _mPalettePercentages = None
+    _mPaletteSource = None # the (Palette, version) the cached palette came from
 
     _barcodeReader = "" #property for the ZXing barcode reader
 
@@ -456,12 +455,25 @@ class Image:
     _pil = "" #holds a PIL object in buffer
     _numpy = "" #numpy form buffer
     _grayNumpy = "" # grayscale numpy for keypoint stuff
+    _regionIntegrals = "" # the (sum, squared sum) color integral images for regionStats
+    _haarPyramid = "" # the halved equalized grayscale images Haar detection shares
+    _histograms = "" # the cached channel level counts, histograms and CDFs
     _colorSpace = ColorSpace.UNKNOWN #Colorspace Object
     _pgsurface = ""
   
     #For DFT Caching 
     _DFT = [] #an array of 2 channel (real,imaginary) 64F images
 
+    #the channels the histogram engine knows: (source, numpy channel, number of levels)
+    _mHistogramChannels = {
+        "gray":("gray",0,256),
+        "red":("rgb",0,256),
+        "green":("rgb",1,256),
+        "blue":("rgb",2,256),
+        "hue":("hsv",2,180),
+        "saturation":("hsv",1,256),
+        "value":("hsv",0,256)}
+
     #Keypoint caching values
     _mKeyPoints = None
     _mKPDescriptors = None
@@ -480,6 +492,9 @@ class Image:
         "_pil": "",
         "_numpy": "",
         "_grayNumpy":"",
+        "_regionIntegrals":"",
+        "_haarPyramid":"",
+        "_histograms":"",
         "_pgsurface": ""}  
     
     def __repr__(self):
@@ -538,6 +553,7 @@ class Image:
         self._mPalette = None
         self._mPaletteMembers = None
         self._mPalettePercentages = None
+        self._mPaletteSource = None
 
         #Check if need to load from URL
         #(this can be made shorter)if type(source) == str and (source[:7].lower() == "http://" or source[:8].lower() == "https://"):
@@ -1517,8 +1533,20 @@ class Image:
             return self._equalizedgraybitmap
 
 
+        # map each gray level through the cumulative histogram
+        counts = self._getLevelCounts("gray")
+        lut = np.zeros(256,dtype=np.uint8)
+        first = np.flatnonzero(counts)
+        if( len(first) > 0 ):
+            first = first[0]
+            rest = counts.sum()-counts[first]
+            if( rest == 0 ):
+                lut[:] = first
+            else:
+                total = np.cumsum(counts)-counts[first]
+                lut[first:] = np.clip(np.round(total[first:]*(255.0/rest)),0,255)
         self._equalizedgraybitmap = self.getEmpty(1) 
-        cv.EqualizeHist(self._getGrayscaleBitmap(), self._equalizedgraybitmap)
+        cv.LUT(self._getGrayscaleBitmap(), self._equalizedgraybitmap, cv.fromarray(lut.reshape((256,1))))
 
 
         return self._equalizedgraybitmap
@@ -2315,7 +2343,7 @@ class Image:
                 cv.AdaptiveThreshold(self._getGrayscaleBitmap(), newbitmap, maxv,
                     cv.CV_ADAPTIVE_THRESH_GAUSSIAN_C, cv.CV_THRESH_BINARY_INV, blocksize, p)
             else:
-                cv.Threshold(self._getGrayscaleBitmap(), newbitmap, thresh, float(maxv), cv.CV_THRESH_BINARY_INV + cv.CV_THRESH_OTSU)
+                cv.Threshold(self._getGrayscaleBitmap(), newbitmap, self._otsuThreshold(), float(maxv), cv.CV_THRESH_BINARY_INV)
             return Image(newbitmap, colorSpace=self._colorSpace)
         else:
             newbitmap = self.getEmpty(1) 
@@ -2471,7 +2499,7 @@ class Image:
 
     #this code is based on code that's based on code from
     #http://blog.jozilla.net/2008/06/27/fun-with-python-opencv-and-face-detection/
-    def findHaarFeatures(self, cascade, scale_factor=1.2, min_neighbors=2, use_canny=cv.CV_HAAR_DO_CANNY_PRUNING):
+    def findHaarFeatures(self, cascade, scale_factor=1.2, min_neighbors=2, use_canny=cv.CV_HAAR_DO_CANNY_PRUNING, min_size=(0,0), max_size=None, hints=None, margin=0.5, threads=1):
         """
         **SUMMARY**
 
@@ -2488,14 +2516,16 @@ class Image:
         You will need to provide your own cascade file - these are usually found in
         /SimpleCV/Features/HaarCascades/ and specify a number of body parts.
         
-        Note that the cascade parameter can be either a filename, or a HaarCascade
-        loaded with cv.Load(), or a SimpleCV HaarCascade object. 
+        Note that the cascade parameter can be either a filename, the short name of
+        one of the cascades in /SimpleCV/Features/HaarCascades/ (e.g. "face" or "eye"),
+        or a SimpleCV HaarCascade object. Cascade files are only parsed the first time
+        they are used, after that the loaded cascade is reused.
 
         **PARAMETERS**
 
         * *cascade* - The Haar Cascade file, this can be either the path to a cascade
-          file or a HaarCascased SimpleCV object that has already been
-          loaded. 
+          file, the short name of a cascade that comes with SimpleCV, or a HaarCascade
+          SimpleCV object that has already been loaded.
 
         * *scale_factor* - The scaling factor for subsequent rounds of the Haar cascade 
           (default 1.2) in terms of a percentage (i.e. 1.2 = 20% increase in size)
@@ -2508,6 +2538,24 @@ class Image:
         * *use-canny* - Whether or not to use Canny pruning to reject areas with too many edges 
           (default yes, set to 0 to disable) 
 
+        * *min_size* - The smallest (width,height) to look for. Raising this skips the small
+          scales, which are the most expensive ones.
+
+        * *max_size* - The biggest (width,height) to keep, or None for no limit.
+
+        * *hints* - Previous detections, as a FeatureSet or a list of (x,y,w,h) rectangles. If
+          this is given only the neighbourhood of each hint is searched, for objects at least
+          half its size. Use this to follow objects from frame to frame, with a full search
+          every so often to pick up new ones (see HaarTracker).
+
+        * *margin* - How far the neighbourhood of each hint reaches past it on every side, as
+          a fraction of the hint's width and height.
+
+        * *threads* - The number of threads to detect with. With more than one the image is cut
+          into overlapping bands that are searched for the small objects in parallel, while the
+          big objects are searched for in a half size copy of the image. The speed up depends
+          on the OpenCV bindings letting go of the interpreter lock during detection.
+
         **RETURNS**
 
         A feature set of HaarFeatures 
@@ -2520,6 +2568,10 @@ class Image:
         >>>     f = cam.getImage().findHaarFeatures(faces)
         >>>     if( f is not None ):
         >>>          f.show()
+        >>> eyes = cam.getImage().findHaarFeatures("eye")
+        >>> img = cam.getImage()
+        >>> f = img.findHaarFeatures("face",min_size=(60,60),threads=4)
+        >>> f = cam.getImage().findHaarFeatures("face",hints=f)
 
         **NOTES**
 
@@ -2530,26 +2582,217 @@ class Image:
         http://dismagazine.com/dystopia/evolved-lifestyles/8115/anti-surveillance-how-to-hide-from-machines/
         
         """
-        storage = cv.CreateMemStorage(0)
-
-
         #lovely.  This segfaults if not present
         if type(cascade) == str:
             
-          if (not os.path.exists(cascade)):
+          if (HaarCascade.findFile(cascade) is None):
               warnings.warn("Could not find Haar Cascade file " + cascade)
               return None
 
-          from SimpleCV.Features.HaarCascade import HaarCascade
           cascade = HaarCascade(cascade)
-  
-        objects = cv.HaarDetectObjects(self._getEqualizedGrayscaleBitmap(), cascade.getCascade(), storage, scale_factor, use_canny)
+
+        gray = self._getEqualizedGrayscaleBitmap()
+        min_size = (int(min_size[0]),int(min_size[1]))
+        if( hints is not None ):
+            jobs = self._haarHintJobs(hints,margin,min_size)
+        elif( threads > 1 ):
+            jobs = self._haarBandJobs(threads,min_size,max_size)
+        else:
+            jobs = [(gray,(0,0,self.width,self.height),1,min_size,None)]
+
+        def detect(job):
+            return self._haarDetect(cascade,job,scale_factor,min_neighbors,use_canny)
+
+        if( threads > 1 and len(jobs) > 1 ):
+            results = HaarCascade.getPool(threads).map(detect,jobs)
+        else:
+            results = map(detect,jobs)
+        objects = [o for found in results for o in found]
+        if( max_size is not None ):
+            objects = [o for o in objects if o[0][2] <= max_size[0] and o[0][3] <= max_size[1]]
+        if( len(jobs) > 1 and len(objects) > 1 ):
+            #the searched regions overlap so the same object can be found twice
+            boxes = [(r[0],r[1],r[0]+r[2],r[1]+r[3]) for r,n in objects]
+            objects = [objects[i] for i in suppressBoxes(boxes,[n for r,n in objects],0.5)]
         if objects: 
             return FeatureSet([HaarFeature(self, o, cascade) for o in objects])
     
     
         return None
 
+    def _haarHintJobs(self, hints, margin, min_size):
+        """
+        Return the findHaarFeatures jobs that search the neighbourhood of each hint
+        for objects at least half its size.
+        """
+        jobs = []
+        gray = self._getEqualizedGrayscaleBitmap()
+        for hint in hints:
+            if( isinstance(hint,Feature) ):
+                maxx,maxy,minx,miny = hint.extents()
+                hint = (minx,miny,maxx-minx,maxy-miny)
+            x,y,w,h = hint
+            x0 = int(max(x-margin*w,0))
+            y0 = int(max(y-margin*h,0))
+            x1 = int(min(x+w+margin*w,self.width))
+            y1 = int(min(y+h+margin*h,self.height))
+            minsize = (max(min_size[0],int(w/2)),max(min_size[1],int(h/2)))
+            jobs.append((gray,(x0,y0,x1-x0,y1-y0),1,minsize,None))
+        return jobs
+
+    def _haarBandJobs(self, threads, min_size, max_size):
+        """
+        Return the findHaarFeatures jobs that split the image into overlapping
+        horizontal bands, one per thread. The bands overlap by as much as the biggest
+        object they look for, and anything bigger is looked for in a half size copy of
+        the image as one more job.
+        """
+        gray = self._getEqualizedGrayscaleBitmap()
+        overlap = max(self.height/(2*threads),2*min_size[1],24)
+        if( max_size is not None ):
+            overlap = min(overlap,max_size[1]+1)
+        if( self.height < 2*overlap ):
+            return [(gray,(0,0,self.width,self.height),1,min_size,None)]
+
+        jobs = []
+        step = int(np.ceil(float(self.height)/threads))
+        for y in range(0,self.height,step):
+            bottom = min(y+step+overlap,self.height)
+            # objects taller than the overlap can be cut in two by a band
+            jobs.append((gray,(0,y,self.width,bottom-y),1,min_size,overlap-1))
+        if( max_size is None or max_size[1] >= overlap ):
+            half = self._getHaarPyramid(1)
+            big = (max(overlap/2,min_size[0]/2),max(overlap/2,min_size[1]/2))
+            jobs.append((half,(0,0,half.width,half.height),2,big,None))
+        return jobs
+
+    def _haarDetect(self, cascade, job, scale_factor, min_neighbors, use_canny):
+        """
+        Run a cascade over one findHaarFeatures job, a (bitmap, (x,y,w,h) region of it,
+        scale of the bitmap, min size in the bitmap, max height in the bitmap or None)
+        tuple, and return the detections in full size image coordinates.
+        """
+        src,rect,scale,minsize,maxheight = job
+        x,y,w,h = rect
+        if( w < max(minsize[0],1) or h < max(minsize[1],1) ):
+            return []
+        if( (x,y,w,h) != (0,0,src.width,src.height) ):
+            src = cv.GetSubRect(src,(x,y,w,h))
+        found = cv.HaarDetectObjects(src, cascade.getCascade(), HaarCascade.getStorage(), scale_factor, min_neighbors, use_canny, minsize)
+        if( maxheight is not None ):
+            found = [o for o in found if o[0][3] <= maxheight]
+        return [(((ox+x)*scale,(oy+y)*scale,ow*scale,oh*scale),n) for ((ox,oy,ow,oh),n) in found]
+
+    def _getHaarPyramid(self, level):
+        """
+        Return the equalized grayscale bitmap halved level times. The levels are made
+        with cv.PyrDown the first time they are asked for and cached with the image.
+        """
+        if( self._haarPyramid == "" ):
+            self._haarPyramid = [self._getEqualizedGrayscaleBitmap()]
+        while( len(self._haarPyramid) <= level ):
+            last = self._haarPyramid[-1]
+            small = cv.CreateImage(((last.width+1)/2,(last.height+1)/2),cv.IPL_DEPTH_8U,1)
+            cv.PyrDown(last,small)
+            self._haarPyramid.append(small)
+        return self._haarPyramid[level]
+
+    def _haarPyramidJob(self, rect, min_size, detail):
+        """
+        Return the findHaarFeatures job that searches a region of the image for objects
+        of at least min_size on the smallest pyramid level where they are still at
+        least detail pixels across.
+        """
+        level = 0
+        while( min(min_size)/2.0**(level+1) >= detail and min(self.width,self.height)/2**(level+1) >= detail ):
+            level += 1
+        scale = 2**level
+        src = self._getHaarPyramid(level)
+        x0 = int(max(rect[0],0))/scale
+        y0 = int(max(rect[1],0))/scale
+        x1 = min(int(rect[0]+rect[2])/scale,src.width)
+        y1 = min(int(rect[1]+rect[3])/scale,src.height)
+        return (src,(x0,y0,max(x1-x0,0),max(y1-y0,0)),scale,(int(min_size[0])/scale,int(min_size[1])/scale),None)
+
+    def findHaarCascades(self, cascades, parts=None, scale_factor=1.2, min_neighbors=2, use_canny=cv.CV_HAAR_DO_CANNY_PRUNING, min_size=(0,0), part_size=0.1, detail=48):
+        """
+        **SUMMARY**
+
+        Run several Haar cascades over the image at once, and optionally look for parts,
+        like eyes or a mouth, only inside the objects found by another cascade, like a face.
+
+        All of the cascades share one equalized grayscale image and one pyramid of halved
+        copies of it. Each search runs on the smallest copy in which the objects it looks
+        for are still at least detail pixels across, so searches for big objects, and for
+        the parts of big objects, cost much less than a full size search. The part
+        cascades only look inside each parent detection, instead of over the whole image.
+
+        **PARAMETERS**
+
+        * *cascades* - A list of HaarCascades, cascade file names or short cascade names
+          (e.g. "face") to search the whole image with.
+
+        * *parts* - A dictionary from the name of one of the cascades to a list of the
+          cascades to search inside each of its detections, e.g. {"face":["eye","mouth"]}.
+
+        * *scale_factor*, *min_neighbors*, *use_canny* - The same as for findHaarFeatures.
+
+        * *min_size* - The smallest (width,height) the top level cascades look for.
+
+        * *part_size* - The smallest part to look for, as a fraction of the size of its parent.
+
+        * *detail* - The smallest size, in pixels, an object may be shrunk to before it is searched for.
+
+        **RETURNS**
+
+        A dictionary from cascade name to a FeatureSet of HaarFeatures, empty if nothing was
+        found. The parts of each detection are in its parts() dictionary.
+
+        **EXAMPLE**
+
+        >>> img = Image("../sampleimages/orson_welles.jpg")
+        >>> found = img.findHaarCascades(["face","upper_body"],parts={"face":["eye","nose","mouth"]})
+        >>> for face in found["face"]:
+        >>>     face.draw()
+        >>>     face.parts("eye").draw()
+
+        **SEE ALSO**
+
+        :py:meth:`findHaarFeatures`
+        :py:meth:`HaarFeature.parts`
+
+        """
+        if( parts is None ):
+            parts = {}
+
+        def load(cascade):
+            if( isinstance(cascade,str) ):
+                if( HaarCascade.findFile(cascade) is None ):
+                    warnings.warn("Could not find Haar Cascade file " + cascade)
+                    return None
+                cascade = HaarCascade(cascade)
+            return cascade
+
+        retVal = {}
+        for cascade in cascades:
+            cascade = load(cascade)
+            if( cascade is None ):
+                continue
+            job = self._haarPyramidJob((0,0,self.width,self.height),min_size,detail)
+            found = FeatureSet([HaarFeature(self,o,cascade) for o in self._haarDetect(cascade,job,scale_factor,min_neighbors,use_canny)])
+            subs = [load(c) for c in parts.get(cascade.getName(),[])]
+            for f in found:
+                f.mParts = {}
+                x,y = f.points[0]
+                w,h = f.width(),f.height()
+                for sub in subs:
+                    if( sub is None ):
+                        continue
+                    job = self._haarPyramidJob((x,y,w,h),(w*part_size,h*part_size),detail)
+                    f.mParts[sub.getName()] = FeatureSet([HaarFeature(self,o,sub) for o in self._haarDetect(sub,job,scale_factor,min_neighbors,use_canny)])
+            retVal[cascade.getName()] = found
+        return retVal
+
 
     def drawCircle(self, ctr, rad, color = (0, 0, 0), thickness = 1):
         """
@@ -3283,7 +3526,122 @@ class Image:
         return Image(retVal, colorSpace=self._colorSpace )
 
 
-    def histogram(self, numbins = 50):
+    def _getLevelCounts(self, channel="gray", step=1):
+        """
+        **SUMMARY**
+
+        The histogram engine the histogram methods share. Returns the number of pixels
+        at each level of a channel, as a numpy array. The counts are cached with the
+        image's other buffers, so every method that needs the histogram, the CDF or a
+        histogram with a different number of bins of the same channel reuses them.
+
+        **PARAMETERS**
+
+        * *channel* - "gray", the getNumpy "red", "green" or "blue" channel, or the HSV "hue",
+          "saturation" or "value" channel. Hue has 180 levels, the others 256.
+        * *step* - Only count every step-th pixel in each direction, for approximate statistics
+          of large images. The counts are scaled up to the size of the image.
+
+        **RETURNS**
+
+        A numpy array with the count of each level, or None for an unknown channel.
+
+        """
+        if( channel not in self._mHistogramChannels ):
+            warnings.warn("ImageClass._getLevelCounts: I don't know the channel " + str(channel))
+            return None
+        if( self._histograms == "" ):
+            self._histograms = {}
+        step = max(1,int(step))
+        key = ("counts",channel,step)
+        if( key not in self._histograms ):
+            source,index,levels = self._mHistogramChannels[channel]
+            if( source == "gray" ):
+                values = np.asarray(cv.GetMat(self._getGrayscaleBitmap()))
+            elif( source == "rgb" ):
+                values = self.getNumpy()[:,:,index]
+            else:
+                if( "hsv" not in self._histograms ):
+                    self._histograms["hsv"] = self.toHSV().getNumpy()
+                values = self._histograms["hsv"][:,:,index]
+            sample = values[::step,::step]
+            counts = np.bincount(sample.ravel(),minlength=levels)[0:levels]
+            if( step > 1 ):
+                counts = counts*(float(values.size)/sample.size)
+            self._histograms[key] = counts
+        return self._histograms[key]
+
+    def _getHistogram(self, channel="gray", bins=256, step=1):
+        """
+        **SUMMARY**
+
+        Return the (histogram, bin edges) of a channel with the given number of bins
+        spread over the range of levels in the image, the same as np.histogram of the
+        channel's values, but made from the cached level counts.
+
+        **SEE ALSO**
+
+        :py:meth:`_getLevelCounts`
+
+        """
+        counts = self._getLevelCounts(channel,step)
+        if( counts is None ):
+            return None
+        key = ("histogram",channel,bins,max(1,int(step)))
+        if( key not in self._histograms ):
+            used = np.flatnonzero(counts)
+            if( len(used) == 0 ):
+                low,high = 0.0,1.0
+            elif( used[0] == used[-1] ):
+                low,high = used[0]-0.5,used[0]+0.5
+            else:
+                low,high = used[0],used[-1]
+            hist,edges = np.histogram(np.arange(len(counts)),bins=bins,range=(low,high),weights=counts)
+            if( counts.dtype.kind in "iu" ):
+                hist = hist.astype(np.int64)
+            self._histograms[key] = (hist,edges)
+        return self._histograms[key]
+
+    def _getCDF(self, channel="gray", step=1):
+        """
+        **SUMMARY**
+
+        Return the cumulative distribution of a channel, the fraction of pixels at or
+        below each level, as a numpy array.
+
+        **SEE ALSO**
+
+        :py:meth:`_getLevelCounts`
+
+        """
+        counts = self._getLevelCounts(channel,step)
+        if( counts is None ):
+            return None
+        key = ("cdf",channel,max(1,int(step)))
+        if( key not in self._histograms ):
+            total = np.cumsum(counts,dtype=np.float64)
+            self._histograms[key] = total/max(total[-1],1)
+        return self._histograms[key]
+
+    def _otsuThreshold(self):
+        """
+        Return the Otsu threshold of the grayscale image, the level that best splits the
+        gray histogram into two classes, from the cached gray level counts.
+        """
+        p = self._getLevelCounts("gray")/float(self.width*self.height)
+        levels = np.arange(256,dtype=np.float64)
+        q1 = np.cumsum(p)
+        q2 = 1.0-q1
+        mu = np.dot(levels,p)
+        valid = (np.minimum(q1,q2) >= 1.2e-7) & (np.maximum(q1,q2) <= 1.0-1.2e-7)
+        mu1 = np.cumsum(levels*p)/np.where(valid,q1,1.0)
+        mu2 = (mu-q1*mu1)/np.where(valid,q2,1.0)
+        sigma = np.where(valid,q1*q2*(mu1-mu2)**2,-1.0)
+        if( not valid.any() ):
+            return 0
+        return int(np.argmax(sigma))
+
+    def histogram(self, numbins = 50, step = 1):
         """
         **SUMMARY**
 
@@ -3294,6 +3652,8 @@ class Image:
         **PARAMETERS**
 
         * *numbins* - An interger number of bins in a histogram. 
+        * *step* - Only count every step-th pixel in each direction, for a faster approximate
+          histogram of a large image.
         
         **RETURNS**
 
@@ -3309,13 +3669,10 @@ class Image:
         :py:meth:`hueHistogram`
 
         """
-        gray = self._getGrayscaleBitmap()
-
-
-        (hist, bin_edges) = np.histogram(np.asarray(cv.GetMat(gray)), bins=numbins)
+        (hist, bin_edges) = self._getHistogram("gray",numbins,step)
         return hist.tolist()
         
-    def hueHistogram(self, bins = 179):
+    def hueHistogram(self, bins = 179, step = 1):
         """
         **SUMMARY**
         
@@ -3325,6 +3682,8 @@ class Image:
         **PARAMETERS**
 
         * *numbins* - An interger number of bins in a histogram. 
+        * *step* - Only count every step-th pixel in each direction, for a faster approximate
+          histogram of a large image.
         
         **RETURNS**
 
@@ -3335,9 +3694,9 @@ class Image:
         :py:meth:`histogram`
 
         """
-        return np.histogram(self.toHSV().getNumpy()[:,:,2], bins = bins)[0]
+        return self._getHistogram("hue",bins,step)[0].copy()
 
-    def huePeaks(self, bins = 179):
+    def huePeaks(self, bins = 179, step = 1):
         """
         **SUMMARY**
 
@@ -3356,6 +3715,8 @@ class Image:
         **PARAMETERS**
 
         * *bins* - the integer number of bins, between 0 and 179.
+        * *step* - Only count every step-th pixel in each direction, for a faster approximate
+          result on a large image.
 
         **RETURNS** 
         
@@ -3381,7 +3742,7 @@ class Image:
         #             (position, peak_value) 
         #             to get the average peak value do 'np.mean(maxtab, 0)[1]' on the results
 
-        y_axis, x_axis = np.histogram(self.toHSV().getNumpy()[:,:,2], bins = bins)
+        y_axis, x_axis = self._getHistogram("hue",bins,step)
         x_axis = x_axis[0:bins]
         lookahead = int(bins / 17)
         delta = 0
@@ -5975,8 +6336,120 @@ class Image:
             img2 = cv.CreateImage((self.width+1, self.height+1), cv.IPL_DEPTH_32F, 1) 
             cv.Integral(self._getGrayscaleBitmap(),img2)
         return np.array(cv.GetMat(img2))
-        
-        
+
+    def _getRegionIntegrals(self):
+        """
+        Return the cached (sum, squared sum) integral images of all three channels as
+        (height+1)x(width+1)x3 float64 numpy arrays in RGB order.
+        """
+        if( self._regionIntegrals == "" ):
+            total = cv.CreateImage((self.width+1, self.height+1), cv.IPL_DEPTH_64F, 3)
+            squares = cv.CreateImage((self.width+1, self.height+1), cv.IPL_DEPTH_64F, 3)
+            cv.Integral(self.getBitmap(),total,squares)
+            self._regionIntegrals = (np.array(cv.GetMat(total))[:,:,::-1],
+                                     np.array(cv.GetMat(squares))[:,:,::-1])
+        return self._regionIntegrals
+
+    def _regionBoxes(self, regions):
+        """
+        Break a list of regions into boxes of pixels. Rectangles are a single box, circles
+        and masks are a box per row. Returns (owner, x0, y0, x1, y1) numpy arrays, where
+        owner is the index of the region each box belongs to, or None if a region is not
+        understood.
+        """
+        if( isinstance(regions,np.ndarray) and len(regions.shape) == 2 and regions.shape[1] == 4 ):
+            r = np.floor(regions).astype(np.int64)
+            return np.arange(len(r)),r[:,0],r[:,1],r[:,0]+r[:,2],r[:,1]+r[:,3]
+        boxes = []
+        for i,r in enumerate(regions):
+            if( isinstance(r,RLEMask) ):
+                x0 = r.mRuns[:,1]+r.mOffset[0]
+                y0 = r.mRuns[:,0]+r.mOffset[1]
+                boxes.append((x0,y0,x0+r.mRuns[:,2],y0+1))
+            elif( len(r) == 3 ): # a circle
+                x,y,rad = r
+                dy = np.arange(-int(rad),int(rad)+1)
+                dx = np.floor(np.sqrt(np.maximum(rad*rad-dy*dy,0))).astype(np.int64)
+                y0 = int(round(y))+dy
+                boxes.append((int(round(x))-dx,y0,int(round(x))+dx+1,y0+1))
+            elif( len(r) == 4 ): # a rectangle
+                x,y,w,h = [int(v) for v in r]
+                boxes.append(([x],[y],[x+w],[y+h]))
+            else:
+                warnings.warn("Image.regionStats - regions must be (x,y,w,h) rectangles, (x,y,r) circles or RLEMasks.")
+                return None
+        owner = np.repeat(np.arange(len(boxes)),[len(b[0]) for b in boxes])
+        cols = [np.concatenate([np.asarray(b[c],dtype=np.int64) for b in boxes]) for c in range(4)]
+        return (owner,)+tuple(cols)
+
+    def regionStats(self, regions):
+        """
+        **SUMMARY**
+
+        Compute the mean, sum and variance of each color channel for lots of regions of
+        the image at once. The first call builds integral images of the pixel values and
+        their squares, which are cached with the image, after that each rectangle costs a
+        handful of lookups no matter how large it is, and a circle or mask costs a few
+        lookups per row. This is much faster than cropping out every region and averaging it.
+
+        **PARAMETERS**
+
+        * *regions* - A list of regions, each of which can be
+
+          * A bounding box - of the form (x,y,w,h) where x,y is the upper left corner
+          * A bounding circle of the form (x,y,r)
+          * An RLEMask, like a blob's mMaskRLE, positioned with its offset
+
+          A numpy array with four columns is treated as a list of rectangles. Regions
+          are clipped to the image.
+
+        **RETURNS**
+
+        A (mean, sum, variance) tuple of Nx3 numpy arrays in RGB order, one row per region.
+        Regions that do not cover any pixels have a mean and variance of zero.
+
+        **EXAMPLE**
+
+        >>> img = Image("lenna")
+        >>> faces = img.findHaarFeatures("face.xml")
+        >>> mean,total,var = img.regionStats([(f.minX(),f.minY(),f.width(),f.height()) for f in faces])
+        >>> blobs = img.findBlobs()
+        >>> mean,total,var = img.regionStats([b.mMaskRLE for b in blobs])
+
+        **SEE ALSO**
+
+        :py:meth:`integralImage`
+        :py:meth:`meanColor`
+        :py:meth:`FeatureSet.meanColor`
+
+        """
+        n = len(regions)
+        if( n == 0 ):
+            return np.zeros((0,3)),np.zeros((0,3)),np.zeros((0,3))
+        boxes = self._regionBoxes(regions)
+        if( boxes is None ):
+            return None
+        owner,x0,y0,x1,y1 = boxes
+        x0 = np.clip(x0,0,self.width)
+        x1 = np.clip(x1,x0,self.width)
+        y0 = np.clip(y0,0,self.height)
+        y1 = np.clip(y1,y0,self.height)
+        total,squares = self._getRegionIntegrals()
+        area = ((x1-x0)*(y1-y0)).astype(np.float64)
+        boxSums = total[y1,x1]-total[y0,x1]-total[y1,x0]+total[y0,x0]
+        boxSquares = squares[y1,x1]-squares[y0,x1]-squares[y1,x0]+squares[y0,x0]
+        # add up the boxes of each region
+        count = np.bincount(owner,area,minlength=n)
+        sums = np.zeros((n,3))
+        sqs = np.zeros((n,3))
+        for c in range(3):
+            sums[:,c] = np.bincount(owner,boxSums[:,c],minlength=n)
+            sqs[:,c] = np.bincount(owner,boxSquares[:,c],minlength=n)
+        safe = np.maximum(count,1)[:,np.newaxis]
+        mean = sums/safe
+        var = np.maximum(sqs/safe-mean*mean,0)
+        return mean,sums,var
+
     def convolve(self,kernel = [[1,0,0],[0,1,0],[0,0,1]],center=None):
         """
         **SUMMARY**
@@ -6024,7 +6497,7 @@ class Image:
             cv.Filter2D(self.getBitmap(),retVal,myKernel,center)
         return Image(retVal)
 
-    def findTemplate(self, template_image = None, threshold = 5, method = "SQR_DIFF_NORM"):
+    def findTemplate(self, template_image = None, threshold = 5, method = "SQR_DIFF_NORM", pyramid = 0, candidates = 32):
         """
         **SUMMARY**
 
@@ -6045,9 +6518,9 @@ class Image:
 
         This method returns the locations of wherever it finds a match above a
         threshold. Because of how template matching works, very often multiple
-        instances of the template overlap significantly. The best approach is to
-        find the centroid of all of these values. We suggest using an iterative
-        k-means approach to find the centroids.
+        instances of the template overlap significantly. Overlapping matches are
+        merged with FeatureSet.nonMaxSuppression, so only the best match of each
+        group is returned.
         
 
         **PARAMETERS**
@@ -6063,6 +6536,13 @@ class Image:
           * CCORR         - Cross correlation
           * CCORR_NORM    - Normalize cross correlation
 
+        * *pyramid* - The number of times to halve the image and template for a coarse to
+          fine search. With 0 every position of the full size image is matched. Otherwise
+          only the smallest level is matched everywhere, and the best candidates from it
+          are refined in a small window at each bigger level, which is much faster for big
+          images. Levels stop early once the template would be under 8 pixels across.
+        * *candidates* - The most matches to keep from the smallest level when pyramid is used.
+
         **EXAMPLE**
         
         >>> image = Image("/path/to/img.png")
@@ -6070,6 +6550,7 @@ class Image:
         >>> found_patterns = image.findTemplate(pattern_image)
         >>> found_patterns.draw()
         >>> image.show()
+        >>> fast_patterns = image.findTemplate(pattern_image,pyramid=2)
         
         **RETURNS**
 
@@ -6106,47 +6587,81 @@ class Image:
         else:
             warnings.warn("ooops.. I don't know what template matching method you are looking for.")
             return None
-        #create new image for template matching computation
-        matches = cv.CreateMat( (self.height - template_image.height + 1),
-                                (self.width - template_image.width + 1),
+        #build the image and template pyramids, the full size images are level 0
+        images = [self._getGrayscaleBitmap()]
+        templates = [template_image._getGrayscaleBitmap()]
+        while( len(images) <= pyramid and templates[-1].width >= 16 and templates[-1].height >= 16 ):
+            for levels in (images,templates):
+                small = cv.CreateImage(((levels[-1].width+1)/2,(levels[-1].height+1)/2),cv.IPL_DEPTH_8U,1)
+                cv.PyrDown(levels[-1],small)
+                levels.append(small)
+
+        #match every position of the smallest level
+        image = images[-1]
+        template = templates[-1]
+        matches = cv.CreateMat( (image.height - template.height + 1),
+                                (image.width - template.width + 1),
                                 cv.CV_32FC1)
-            
-        #choose template matching method to be used
-        
-        cv.MatchTemplate( self._getGrayscaleBitmap(), template_image._getGrayscaleBitmap(), matches, method )
+        cv.MatchTemplate( image, template, matches, method )
+        xs,ys,scores = self._templatePeaks(np.asarray(matches),threshold,check,template.width,template.height)
+
+        #refine the best candidates in a small window at each bigger level
+        if( len(images) > 1 ):
+            xs,ys,scores = xs[:candidates],ys[:candidates],scores[:candidates]
+        radius = 2 # covers the rounding of one halving
+        for level in range(len(images)-2,-1,-1):
+            image = images[level]
+            template = templates[level]
+            xmax = image.width-template.width
+            ymax = image.height-template.height
+            for i in range(len(xs)):
+                x0 = min(max(2*xs[i]-radius,0),xmax)
+                y0 = min(max(2*ys[i]-radius,0),ymax)
+                x1 = min(2*xs[i]+radius,xmax)
+                y1 = min(2*ys[i]+radius,ymax)
+                window = cv.GetSubRect(image,(int(x0),int(y0),int(x1-x0+template.width),int(y1-y0+template.height)))
+                result = cv.CreateMat(int(y1-y0+1),int(x1-x0+1),cv.CV_32FC1)
+                cv.MatchTemplate(window,template,result,method)
+                result = np.asarray(result)
+                if( check > 0 ):
+                    best = np.argmin(result)
+                else:
+                    best = np.argmax(result)
+                dy,dx = np.unravel_index(best,result.shape)
+                xs[i],ys[i],scores[i] = x0+dx,y0+dy,result[dy,dx]
+
+        #candidates from a coarse level can converge on the same match
+        w,h = template_image.width,template_image.height
+        if( check > 0 ):
+            keep = suppressBoxes(np.column_stack((xs,ys,xs+w,ys+h)),-scores,0.0)
+        else:
+            keep = suppressBoxes(np.column_stack((xs,ys,xs+w,ys+h)),scores,0.0)
+        fs = FeatureSet()
+        for i in keep:
+            fs.append(TemplateMatch(self, template_image.getBitmap(), (xs[i],ys[i]), scores[i], check > 0))
+        return fs
+
+    def _templatePeaks(self, matches, threshold, check, width, height):
+        """
+        Find the template matches in a numpy match map that are threshold standard
+        deviations better than the mean, and keep the best of each group of
+        overlapping ones. The whole map is done with numpy, without making a
+        feature for every position that passes. Returns the (xs,ys,scores) arrays
+        of the peaks, best first. check > 0 means smaller values are better.
+        """
         mean = np.mean(matches)
         sd = np.std(matches)
         if(check > 0):
-            compute = np.where((matches < mean-threshold*sd) )
+            ys,xs = np.where(matches < mean-threshold*sd)
         else:
-            compute = np.where((matches > mean+threshold*sd) )
-
-        mapped = map(tuple, np.column_stack(compute))
-        fs = FeatureSet()
-        for location in mapped:
-            fs.append(TemplateMatch(self, template_image.getBitmap(), (location[1],location[0]), matches[location[0], location[1]]))
-
-        #cluster overlapping template matches 
-        finalfs = FeatureSet()
-        if( len(fs) > 0 ):
-            finalfs.append(fs[0])
-            for f in fs:
-                match = False
-                for f2 in finalfs:
-                    if( f2._templateOverlaps(f) ): #if they overlap
-                        f2.consume(f) #merge them
-                        match = True 
-                        break
-
-                if( not match ):
-                    finalfs.append(f)
-        
-            for f in finalfs: #rescale the resulting clusters to fit the template size
-                f.rescale(template_image.width,template_image.height)
-            
-            fs = finalfs
-        
-        return fs                           
+            ys,xs = np.where(matches > mean+threshold*sd)
+        scores = matches[ys,xs]
+        boxes = np.column_stack((xs,ys,xs+width,ys+height))
+        if(check > 0):
+            keep = suppressBoxes(boxes,-scores,0.0)
+        else:
+            keep = suppressBoxes(boxes,scores,0.0)
+        return xs[keep],ys[keep],scores[keep]
          
 
     def readText(self):
@@ -6243,7 +6758,7 @@ class Image:
             circleFS.append(Circle(self,int(circs[i][0][0]),int(circs[i][0][1]),int(circs[i][0][2])))  
         return circleFS
 
-    def whiteBalance(self,method="Simple"):
+    def whiteBalance(self,method="Simple",step=1):
         """
         **SUMMARY**
         
@@ -6266,6 +6781,9 @@ class Image:
           * `Robust AWB <http://scien.stanford.edu/pages/labsite/2010/psych221/projects/2010/JasonSu/robustawb.html>`_
 
           * `Simple AWB <http://www.ipol.im/pub/algo/lmps_simplest_color_balance/>`_
+
+        * *step* - For the Simple method, only count every step-th pixel in each direction
+          when finding the channel limits, which is faster for large images.
          
 
         **RETURNS**
@@ -6329,86 +6847,27 @@ class Image:
             retVal = Image(retVal)
         elif( method == "Simple" ):
             thresh = 0.003
-            sz = img.width*img.height
-            tempMat = img.getNumpy() 
-            bcf = sss.cumfreq(tempMat[:,:,0], numbins=256)
-            bcf = bcf[0] # get our cumulative histogram of values for this color
-
-            blb = -1 #our upper bound
-            bub = 256 # our lower bound
-            lower_thresh = 0.00
-            upper_thresh = 0.00
-            #now find the upper and lower thresh% of our values live
-            while( lower_thresh < thresh ):
-                blb = blb+1
-                lower_thresh = bcf[blb]/sz
-            while( upper_thresh < thresh ):
-                bub = bub-1
-                upper_thresh = (sz-bcf[bub])/sz
-
-
-            gcf = sss.cumfreq(tempMat[:,:,1], numbins=256)
-            gcf = gcf[0]
-            glb = -1 #our upper bound
-            gub = 256 # our lower bound
-            lower_thresh = 0.00
-            upper_thresh = 0.00
-            #now find the upper and lower thresh% of our values live
-            while( lower_thresh < thresh ):
-                glb = glb+1
-                lower_thresh = gcf[glb]/sz
-            while( upper_thresh < thresh ):
-                gub = gub-1
-                upper_thresh = (sz-gcf[gub])/sz
-
-
-            rcf = sss.cumfreq(tempMat[:,:,2], numbins=256)
-            rcf = rcf[0]
-            rlb = -1 #our upper bound
-            rub = 256 # our lower bound
-            lower_thresh = 0.00 
-            upper_thresh = 0.00
-            #now find the upper and lower thresh% of our values live
-            while( lower_thresh < thresh ):
-                rlb = rlb+1
-                lower_thresh = rcf[rlb]/sz
-            while( upper_thresh < thresh ):
-                rub = rub-1
-                upper_thresh = (sz-rcf[rub])/sz
-            #now we create the scale factors for the remaining pixels
-            rlbf = float(rlb)
-            rubf = float(rub)
-            glbf = float(glb)
-            gubf = float(gub)
-            blbf = float(blb)
-            bubf = float(bub)
-
-            rLUT = np.ones((256,1),dtype=uint8)
-            gLUT = np.ones((256,1),dtype=uint8)
-            bLUT = np.ones((256,1),dtype=uint8)
-            for i in range(256):
-                if(i <= rlb):
-                    rLUT[i][0] = 0
-                elif( i >= rub):
-                    rLUT[i][0] = 255
-                else:
-                    rf = ((float(i)-rlbf)*255.00/(rubf-rlbf))
-                    rLUT[i][0] = int(rf)
-                if( i <= glb):
-                    gLUT[i][0] = 0
-                elif( i >= gub):
-                    gLUT[i][0] = 255
-                else:
-                    gf = ((float(i)-glbf)*255.00/(gubf-glbf))
-                    gLUT[i][0] = int(gf)
-                if( i <= blb):
-                    bLUT[i][0] = 0
-                elif( i >= bub):
-                    bLUT[i][0] = 255
-                else:
-                    bf = ((float(i)-blbf)*255.00/(bubf-blbf))
-                    bLUT[i][0] = int(bf)
-            retVal = img.applyLUT(bLUT,rLUT,gLUT)
+            luts = []
+            levels = np.arange(256)
+            for channel in ["red","green","blue"]:
+                counts = img._getLevelCounts(channel,step)
+                sz = float(counts.sum())
+                cf = np.cumsum(counts) # our cumulative histogram of values for this color
+                #now find the upper and lower thresh% of our values live
+                above = np.flatnonzero(cf/sz >= thresh)
+                below = np.flatnonzero((sz-cf)/sz >= thresh)
+                if( len(above) == 0 or len(below) == 0 ):
+                    # nearly the whole channel is one level, e.g. an empty channel, so leave it alone
+                    luts.append(levels.astype(uint8).reshape((256,1)))
+                    continue
+                lb = above[0] # our lower bound
+                ub = below[-1] # our upper bound
+                #now we create the scale factors for the remaining pixels
+                scaled = ((levels-float(lb))*255.00/max(ub-lb,1)).astype(np.int32)
+                lut = np.where(levels <= lb,0,np.where(levels >= ub,255,scaled))
+                luts.append(lut.astype(uint8).reshape((256,1)))
+            rLUT,gLUT,bLUT = luts
+            retVal = img.applyLUT(rLUT,bLUT,gLUT)
         return retVal 
         
     def applyLUT(self,rLUT=None,bLUT=None,gLUT=None):
@@ -6491,6 +6950,12 @@ class Image:
                  "FAST" - The FAST keypoint extraction algorithm
                  See: http://en.wikipedia.org/wiki/Corner_detection#AST_based_feature_detectors
 
+                 "ORB" - The ORB keypoints and their binary descriptors. Each descriptor
+                 is 32 bytes of packed bits that are compared by Hamming distance,
+                 which is much cheaper to compute and to match than SURF. For ORB
+                 min_quality is the largest number of keypoints to keep.
+                 See: http://en.wikipedia.org/wiki/Binary_Robust_Independent_Elementary_Features
+
 
         highQuality - The SURF descriptor comes in two forms, a vector of 64 descriptor 
                       values and a vector of 128 descriptor values. The latter are "high" 
@@ -6514,12 +6979,13 @@ class Image:
         
         self._mKeyPoints # A tuple of keypoint objects
         See: http://opencv.itseez.com/modules/features2d/doc/common_interfaces_of_feature_detectors.html#keypoint-keypoint
-        self._mKPDescriptors # The descriptor as a floating point numpy array
+        self._mKPDescriptors # The descriptor as a floating point numpy array, or uint8 for ORB
         self._mKPFlavor = "NONE" # The flavor of the keypoints as a string. 
 
         See Also:
          ImageClass._getRawKeypoints(self,thresh=500.00,forceReset=False,flavor="SURF",highQuality=1)
          ImageClass._getFLANNMatches(self,sd,td)
+         ImageClass._getHammingMatches(self,sd,td)
          ImageClass.findKeypointMatch(self,template,quality=500.00,minDist=0.2,minMatch=0.4)
          ImageClass.drawKeypointMatches(self,template,thresh=500.00,minDist=0.15,width=1)
 
@@ -6568,6 +7034,17 @@ class Image:
                 self._mKPDescriptors = None
                 self._mKPFlavor = "STAR"
                 del starer
+
+            elif( flavor == "ORB" ):
+                orber = cv2.ORB(nfeatures=int(thresh))
+                self._mKeyPoints,self._mKPDescriptors = orber.detectAndCompute(self.getGrayNumpy(),None)
+                del orber
+                if( self._mKPDescriptors is None or len(self._mKPDescriptors) == 0 ):
+                    self._mKeyPoints = None
+                    self._mKPDescriptors = None
+                    return None, None
+                self._mKPDescriptors = self._mKPDescriptors.reshape((-1,32))
+                self._mKPFlavor = "ORB"
           
             else:
                 warnings.warn("ImageClass.Keypoints: I don't know the method you want to use")
@@ -6631,7 +7108,45 @@ class Image:
         del flann
         return idx,dist
 
-    def drawKeypointMatches(self,template,thresh=500.00,minDist=0.15,width=1):
+    def _getHammingMatches(self,sd,td):
+        """
+        **SUMMARY**
+
+        The binary descriptor version of _getFLANNMatches. It finds the nearest of the
+        packed bit descriptors sd to each of the descriptors td by Hamming distance,
+        using a HammingIndex. For the usual few hundred keypoints every pair is measured,
+        so the matches are exact, larger sets use a locality sensitive hash over the bits.
+
+        **PARAMETERS**
+
+        * *sd* - An NxB uint8 numpy array of packed descriptors, like the ORB descriptors.
+        * *td* - An MxB uint8 numpy array of packed descriptors, the result arrays will have
+          a length matching this array.
+
+        **RETURNS**
+
+        Two Mx1 numpy arrays, the first one, idx, is the index in sd of the match of each
+        row of td. The second one, dist, is the Hamming distance of the match divided by
+        the number of bits, so it lies between 0 and 1 like the FLANN distances. A row of
+        td with no match has an idx of -1 and a distance greater than 1.
+
+        **EXAMPLE**
+
+        >>> kpt,td = template._getRawKeypoints(flavor="ORB")
+        >>> kps,sd = img._getRawKeypoints(flavor="ORB")
+        >>> idx,dist = img._getHammingMatches(sd,td)
+
+        **SEE ALSO**
+
+        :py:meth:`_getFLANNMatches`
+        :py:class:`HammingIndex`
+
+        """
+        index = HammingIndex(sd)
+        idx,dist = index.knnSearch(td,1)
+        return idx,dist/(8.0*sd.shape[1])
+
+    def drawKeypointMatches(self,template,thresh=500.00,minDist=0.15,width=1,flavor="SURF"):
         """
         **SUMMARY**
 
@@ -6649,6 +7164,8 @@ class Image:
         * *minDist* - The value below which the feature correspondence is considered a match. This 
           is the distance between two feature vectors. Good values are between 0.05 and 0.3
         * *width* - The width of the drawn line.
+        * *flavor* - The keypoint flavor, either "SURF" or "ORB". The ORB descriptors are matched
+          by Hamming distance and minDist is then the fraction of descriptor bits that may differ.
 
         **RETURNS**
 
@@ -6683,8 +7200,8 @@ class Image:
           
         resultImg = template.sideBySide(self,scale=False)
         hdif = (self.height-template.height)/2
-        skp,sd = self._getRawKeypoints(thresh)
-        tkp,td = template._getRawKeypoints(thresh)
+        skp,sd = self._getRawKeypoints(thresh,flavor)
+        tkp,td = template._getRawKeypoints(thresh,flavor)
         if( td == None or sd == None ):
             warnings.warn("We didn't get any descriptors. Image might be too uniform or blurry." )
             return resultImg
@@ -6694,7 +7211,10 @@ class Image:
         if( sample_points > template_points ):
             magic_ratio = float(sd.shape[0])/float(td.shape[0])
 
-        idx,dist = self._getFLANNMatches(sd,td) # match our keypoint descriptors
+        if( flavor == "ORB" ):
+            idx,dist = self._getHammingMatches(sd,td) # match our binary descriptors
+        else:
+            idx,dist = self._getFLANNMatches(sd,td) # match our keypoint descriptors
         p = dist[:,0]
         result = p*magic_ratio < minDist #, = np.where( p*magic_ratio < minDist ) 
         for i in range(0,len(idx)):
@@ -6705,7 +7225,7 @@ class Image:
         return resultImg
                   
 
-    def findKeypointMatch(self,template,quality=500.00,minDist=0.2,minMatch=0.4):
+    def findKeypointMatch(self,template,quality=500.00,minDist=0.2,minMatch=0.4,flavor="SURF"):
         """
         **SUMMARY**
 
@@ -6735,6 +7255,10 @@ class Image:
         * *minMatch* - The percentage of features which must have matches to proceed with homography calculation.
           A value of 0.4 means 40% of features must match. Higher values mean better matches
           are used. Good values are between about 0.3 and 0.7
+        * *flavor* - The keypoint flavor, either "SURF" or "ORB". The ORB descriptors are packed
+          bits matched by Hamming distance, which is much faster. For ORB the quality is the
+          largest number of keypoints to use and minDist is the fraction of descriptor bits that
+          may differ, good values are between about 0.1 and 0.25.
 
  
         **RETURNS** 
@@ -6779,8 +7303,8 @@ class Image:
         if template == None:
           return None
         
-        skp,sd = self._getRawKeypoints(quality)
-        tkp,td = template._getRawKeypoints(quality)
+        skp,sd = self._getRawKeypoints(quality,flavor)
+        tkp,td = template._getRawKeypoints(quality,flavor)
         if( skp == None or tkp == None ):
             warnings.warn("I didn't get any keypoints. Image might be too uniform or blurry." )
             return None
@@ -6791,7 +7315,10 @@ class Image:
         if( sample_points > template_points ):
             magic_ratio = float(sd.shape[0])/float(td.shape[0])
 
-        idx,dist = self._getFLANNMatches(sd,td) # match our keypoint descriptors
+        if( flavor == "ORB" ):
+            idx,dist = self._getHammingMatches(sd,td) # match our binary descriptors
+        else:
+            idx,dist = self._getFLANNMatches(sd,td) # match our keypoint descriptors
         p = dist[:,0]
         result = p*magic_ratio < minDist #, = np.where( p*magic_ratio < minDist ) 
         pr = result.shape[0]/float(dist.shape[0])
@@ -6847,8 +7374,8 @@ class Image:
         for calculating homographies between camera views, object rotations, and
         multiple view overlaps.
 
-        We support four keypoint detectors and only one form of keypoint descriptors.
-        Only the surf flavor of keypoint returns feature and descriptors at this time.
+        We support five keypoint detectors and two forms of keypoint descriptors.
+        Only the SURF and ORB flavors of keypoint return features and descriptors at this time.
        
         **PARAMETERS**
         
@@ -6874,6 +7401,11 @@ class Image:
           * "FAST" - The FAST keypoint extraction algorithm
 
             See: http://en.wikipedia.org/wiki/Corner_detection#AST_based_feature_detectors
+
+          * "ORB" - The ORB keypoints with binary descriptors, which are compared by
+            Hamming distance. For ORB min_quality is the largest number of keypoints.
+
+            See: http://en.wikipedia.org/wiki/Binary_Robust_Independent_Elementary_Features
         
         * *highQuality* - The SURF descriptor comes in two forms, a vector of 64 descriptor 
           values and a vector of 128 descriptor values. The latter are "high" 
@@ -6917,7 +7449,9 @@ class Image:
         else:
             kp,d = self._getRawKeypoints(thresh=min_quality,forceReset=True,flavor=flavor,highQuality=0)
 
-        if( flavor == "SURF" ):
+        if( flavor == "SURF" or flavor == "ORB" ):
+            if( kp is None ):
+                return fs
             for i in range(0,len(kp)):
                 fs.append(KeyPoint(self,kp[i],d[i],flavor))
         elif(flavor == "STAR" or flavor == "FAST" ):
@@ -6929,7 +7463,7 @@ class Image:
 
         return fs
 
-    def findMotion(self, previous_frame, window=11, method='BM', aggregate=True):
+    def findMotion(self, previous_frame, window=11, method='BM', aggregate=True, field=False):
         """
         **SUMMARY**
 
@@ -6957,10 +7491,13 @@ class Image:
           motion around the sample grid defined by window. If aggregate is false
           we just return the the value as sampled at the window grid interval. For 
           block matching this flag is ignored.
+        * *field* - If field is true the result is a MotionField, which holds the sample positions
+          and flow vectors as numpy arrays and only makes Motion features when they are asked for.
+          This is much faster for small windows, which have many samples.
 
         **RETURNS**
 
-        A featureset of motion objects. 
+        A featureset of motion objects, or a MotionField if field is true. 
 
         **EXAMPLES**
         
@@ -6970,18 +7507,19 @@ class Image:
         >>> motion = img2.findMotion(img1)
         >>> motion.draw()
         >>> img2.show()
+        >>> field = img2.findMotion(img1,window=5,method="LK",field=True)
+        >>> print field.vx().mean(), field.vy().mean()
 
         **SEE ALSO**
         
         :py:class:`Motion`
+        :py:class:`MotionField`
         :py:class:`FeatureSet`
 
         """
         if( self.width != previous_frame.width or self.height != previous_frame.height):
             warnings.warn("ImageClass.getMotion: To find motion the current and previous frames must match")
             return None
-        fs = FeatureSet()
-        max_mag = 0.00
 
         if( method == "LK" or method == "HS" ):
             # create the result images. 
@@ -6992,33 +7530,23 @@ class Image:
                 cv.CalcOpticalFlowLK(self._getGrayscaleBitmap(),previous_frame._getGrayscaleBitmap(),win,xf,yf)
             else:
                 cv.CalcOpticalFlowHS(previous_frame._getGrayscaleBitmap(),self._getGrayscaleBitmap(),0,xf,yf,1.0,(cv.CV_TERMCRIT_ITER | cv.CV_TERMCRIT_EPS, 10, 0.01))
-                
-            w = math.floor((float(window))/2.0) 
+            xf = np.asarray(cv.GetMat(xf))
+            yf = np.asarray(cv.GetMat(yf))
+
+            w = int(math.floor((float(window))/2.0))
             cx = ((self.width-window)/window)+1 #our sample rate
             cy = ((self.height-window)/window)+1
-            vx = 0.00
-            vy = 0.00
-            for x in range(0,int(cx)): # go through our sample grid
-                for y in range(0,int(cy)): 
-                    xi = (x*window)+w # calculate the sample point
-                    yi = (y*window)+w
-                    if( aggregate ):
-                        lowx = int(xi-w)
-                        highx = int(xi+w)
-                        lowy = int(yi-w)
-                        highy = int(yi+w)
-                        xderp = xf[lowy:highy,lowx:highx] # get the average x/y components in the output
-                        yderp = yf[lowy:highy,lowx:highx]
-                        vx = np.average(xderp)
-                        vy = np.average(yderp)
-                    else: # other wise just sample
-                        vx = xf[yi,xi]
-                        vy = yf[yi,xi]
- 
-                    mag = (vx*vx)+(vy*vy)
-                    if(mag > max_mag): # calculate the max magnitude for normalizing our vectors
-                        max_mag = mag
-                    fs.append(Motion(self,xi,yi,vx,vy,window)) # add the sample to the feature set
+            # the sample grid, ordered x then y
+            xi = np.repeat(np.arange(int(cx))*window+w,int(cy))
+            yi = np.tile(np.arange(int(cy))*window+w,int(cx))
+            if( aggregate ):
+                # the average x/y components in the window around each sample
+                vx = self._windowMeans(xf,xi-w,yi-w,xi+w,yi+w)
+                vy = self._windowMeans(yf,xi-w,yi-w,xi+w,yi+w)
+            else: # other wise just sample
+                vx = xf[yi,xi]
+                vy = yf[yi,xi]
+            retVal = MotionField(self,xi,yi,vx,vy,window)
 
         elif( method == "BM"):
             # In the interest of keep the parameter list short
@@ -7031,29 +7559,38 @@ class Image:
             xf = cv.CreateMat(hv, wv, cv.CV_32FC1)
             yf = cv.CreateMat(hv, wv, cv.CV_32FC1)
             cv.CalcOpticalFlowBM(previous_frame._getGrayscaleBitmap(),self._getGrayscaleBitmap(),block,shift,spread,0,xf,yf)
-            for x in range(0,int(wv)): # go through the sample grid
-                for y in range(0,int(hv)):
-                    xi = (shift[0]*(x))+block[0] #where on the input image the samples live
-                    yi = (shift[1]*(y))+block[1]
-                    vx = xf[y,x] # the result image values
-                    vy = yf[y,x]
-                    fs.append(Motion(self,xi,yi,vx,vy,window)) # add the feature
-                    mag = (vx*vx)+(vy*vy) # same the magnitude
-                    if(mag > max_mag):
-                        max_mag = mag
+            # where on the input image the samples live, ordered x then y
+            x = np.repeat(np.arange(int(wv)),int(hv))
+            y = np.tile(np.arange(int(hv)),int(wv))
+            vx = np.asarray(xf)[y,x] # the result image values
+            vy = np.asarray(yf)[y,x]
+            retVal = MotionField(self,(shift[0]*x)+block[0],(shift[1]*y)+block[1],vx,vy,window)
         else:
             warnings.warn("ImageClass.findMotion: I don't know what algorithm you want to use. Valid method choices are Block Matching -> \"BM\" Horn-Schunck -> \"HS\" and Lucas-Kanade->\"LK\" ") 
             return None
-	
-        max_mag = math.sqrt(max_mag) # do the normalization
-        for f in fs:
-            f.normalizeTo(max_mag)
 
-        return fs
+        if( field ):
+            return retVal
+        return retVal.features()
+
+    def _windowMeans(self, values, lowx, lowy, highx, highy):
+        """
+        Return the mean of a 2D numpy array, indexed [y,x], over each of the windows
+        [lowy:highy,lowx:highx], using an integral image so every window costs the same.
+        """
+        total = np.zeros((values.shape[0]+1,values.shape[1]+1),dtype=np.float64)
+        total[1:,1:] = np.cumsum(np.cumsum(values,axis=0,dtype=np.float64),axis=1)
+        lowx = np.clip(lowx,0,values.shape[1])
+        highx = np.clip(highx,0,values.shape[1])
+        lowy = np.clip(lowy,0,values.shape[0])
+        highy = np.clip(highy,0,values.shape[0])
+        area = (highx-lowx)*(highy-lowy)
+        sums = total[highy,highx]-total[lowy,highx]-total[highy,lowx]+total[lowy,lowx]
+        return sums/np.maximum(area,1)
 
 
     
-    def _generatePalette(self,bins,hue):
+    def _generatePalette(self,bins,hue,palette=None):
         """
         **SUMMARY**
 
@@ -7067,6 +7604,9 @@ class Image:
 
         bins - an integer number of bins into which to divide the colors in the image.
         hue  - if hue is true we do only cluster on the image hue values. 
+        palette - an optional Palette, for example the one used for the previous frame of
+                  a video. It is updated with this image, starting from its current colors,
+                  and bins is taken from it.
 
         **RETURNS**
 
@@ -7086,12 +7626,8 @@ class Image:
         **NOTES**
 
         The hue calculations should be siginificantly faster than the generic RGB calculation as 
-        it works in a one dimensional space. Sometimes the underlying scipy method freaks out 
-        about k-means initialization with the following warning:
-        
-        UserWarning: One of the clusters is empty. Re-run kmean with a different initialization.
-
-        This shouldn't be a real problem. 
+        it works in a one dimensional space. The k-means only clusters a random sample of the
+        pixels, see :py:class:`Palette`, and then every pixel is given its nearest color.
         
         **SEE ALSO**
 
@@ -7102,15 +7638,16 @@ class Image:
         ImageClass.binarizeFromPalette(self, palette_selection)
         ImageClass.findBlobsFromPalette(self, palette_selection, dilate = 0, minsize=5, maxsize=0)
         """
-        if( self._mPaletteBins != bins or
+        if( palette is not None ):
+            if( self._mPaletteSource == (palette,palette.mVersion) and self._mDoHuePalette == hue ):
+                return # this palette has not changed since it was last applied to us
+            bins = palette.mBins
+        if( palette is not None or
+            self._mPaletteBins != bins or
             self._mDoHuePalette != hue ):
             total = float(self.width*self.height)
-            percentages = []
-            result = None
             if( not hue ):
                 pixels = np.array(self.getNumpy()).reshape(-1, 3)   #reshape our matrix to 1xN
-                result = scv.kmeans2(pixels,bins)
-
             else:
                 hsv = self
                 if( self._colorSpace != ColorSpace.HSV ):
@@ -7120,22 +7657,25 @@ class Image:
                 cv.Split(hsv.getBitmap(),None,None,h,None)
                 mat =  cv.GetMat(h)
                 pixels = np.array(mat).reshape(-1,1)
-                result = scv.kmeans2(pixels,bins)                
-
 
-            for i in range(0,bins):
-                count = np.where(result[1]==i)
-                v = float(count[0].shape[0])/total
-                percentages.append(v)
+            if( palette is None ):
+                # without a Palette from the caller every pixel gets its exact nearest color
+                source = Palette(bins,maxError=0.0)
+                source.fit(pixels)
+            else:
+                source = palette
+                source.update(pixels)
+            members = source.assign(pixels)
 
             self._mDoHuePalette = hue
             self._mPaletteBins = bins
-            self._mPalette = np.array(result[0],dtype='uint8')
-            self._mPaletteMembers = result[1]
-            self._mPalettePercentages = percentages
+            self._mPalette = source.colors()
+            self._mPaletteMembers = members
+            self._mPalettePercentages = (np.bincount(members,minlength=bins)/total).tolist()
+            self._mPaletteSource = (source,source.mVersion)
 
 
-    def getPalette(self,bins=10,hue=False):
+    def getPalette(self,bins=10,hue=False,palette=None):
         """
         **SUMMARY**
 
@@ -7146,6 +7686,9 @@ class Image:
 
         * *bins* - an integer number of bins into which to divide the colors in the image.
         * *hue*  - if hue is true we do only cluster on the image hue values. 
+        * *palette* - A Palette to update with this image, starting from its current colors.
+          Passing the same Palette for every frame of a video is much faster than starting
+          from scratch each time. The number of bins comes from the Palette.
 
         **RETURNS**
 
@@ -7155,16 +7698,15 @@ class Image:
         
         >>> p = img.getPalette(bins=42)
         >>> print p[2]
+        >>> pal = Palette(bins=8)
+        >>> for img in frames:
+        >>>     p = img.getPalette(palette=pal)
        
         **NOTES**
        
         The hue calculations should be siginificantly faster than the generic RGB calculation as 
-        it works in a one dimensional space. Sometimes the underlying scipy method freaks out 
-        about k-means initialization with the following warning:
-        
-        .. Warning::
-          One of the clusters is empty. Re-run kmean with a different initialization.
-          This shouldn't be a real problem. 
+        it works in a one dimensional space. Empty clusters are restarted on the pixels that fit their
+        color worst, so every bin ends up with a color.
         
         **SEE ALSO**
                
@@ -7176,7 +7718,7 @@ class Image:
         :py:meth:`findBlobsFromPalette`
         
         """
-        self._generatePalette(bins,hue)
+        self._generatePalette(bins,hue,palette)
         return self._mPalette
 
 
@@ -7186,11 +7728,12 @@ class Image:
         
         rePalette takes in the palette from another image and attempts to apply it to this image.
         This is helpful if you want to speed up the palette computation for a series of images (like those in a
-        video stream.
+        video stream. Each pixel is mapped through the palette's lookup table, which a Palette keeps
+        from frame to frame until its colors change.
 
         **PARAMETERS**
         
-        * *palette* - The pre-computed palette from another image.
+        * *palette* - The pre-computed palette from another image, or a Palette.
         * *hue* - Boolean Hue - if hue is True we use a hue palette, otherwise we use a BGR palette.
 
         **RETURNS**
@@ -7204,6 +7747,9 @@ class Image:
         >>> p = img.getPalette()
         >>> result = img2.rePalette(p)
         >>> result.show()
+        >>> pal = Palette(bins=8,quantize=6,maxError=2.0)
+        >>> img.palettize(palette=pal)
+        >>> result = img2.rePalette(pal)
 
         **SEE ALSO**
                
@@ -7216,6 +7762,12 @@ class Image:
         
         """
         retVal = None
+        if( not isinstance(palette,Palette) ):
+            # a plain color array is mapped exactly, as it always was
+            colors = palette
+            palette = Palette(len(colors),maxError=0.0)
+            palette.setColors(colors)
+        colors = palette.colors()
         if(hue):
             hsv = self
             if( self._colorSpace != ColorSpace.HSV ):
@@ -7225,13 +7777,12 @@ class Image:
             cv.Split(hsv.getBitmap(),None,None,h,None)
             mat =  cv.GetMat(h)
             pixels = np.array(mat).reshape(-1,1)
-            result = scv.vq(pixels,palette)
-            derp = palette[result[0]]
+            derp = colors[palette.assign(pixels)]
             retVal = Image(derp[::-1].reshape(self.height,self.width)[::-1])
             retVal = retVal.rotate(-90,fixed=False)
         else:
-            result = scv.vq(self.getNumpy().reshape(-1,3),palette)
-            retVal = Image(palette[result[0]].reshape(self.width,self.height,3))
+            members = palette.assign(self.getNumpy().reshape(-1,3))
+            retVal = Image(colors[members].reshape(self.width,self.height,3))
         return retVal
 
     def drawPaletteColors(self,size=(-1,-1),horizontal=True,bins=10,hue=False):
@@ -7270,12 +7821,8 @@ class Image:
         **NOTES**
 
         The hue calculations should be siginificantly faster than the generic RGB calculation as 
-        it works in a one dimensional space. Sometimes the underlying scipy method freaks out 
-        about k-means initialization with the following warning:
-        
-        .. Warning::
-          One of the clusters is empty. Re-run kmean with a different initialization.
-          This shouldn't be a real problem. 
+        it works in a one dimensional space. Empty clusters are restarted on the pixels that fit their
+        color worst, so every bin ends up with a color.
 
         **SEE ALSO**
                
@@ -7356,7 +7903,7 @@ class Image:
                  
         return retVal 
 
-    def palettize(self,bins=10,hue=False):
+    def palettize(self,bins=10,hue=False,palette=None):
         """
         **SUMMARY**
 
@@ -7369,6 +7916,9 @@ class Image:
 
         * *bins* - an integer number of bins into which to divide the colors in the image.
         * *hue* - if hue is true we do only cluster on the image hue values. 
+        * *palette* - A Palette to update with this image, starting from its current colors.
+          Passing the same Palette for every frame of a video is much faster than starting
+          from scratch each time. The number of bins comes from the Palette.
         
 
         **RETURNS**
@@ -7383,12 +7933,8 @@ class Image:
         **NOTES**
 
         The hue calculations should be siginificantly faster than the generic RGB calculation as 
-        it works in a one dimensional space. Sometimes the underlying scipy method freaks out 
-        about k-means initialization with the following warning:
-        
-        .. Warning:: 
-          UserWarning: One of the clusters is empty. Re-run kmean with a different initialization.
-          This shouldn't be a real problem. 
+        it works in a one dimensional space. Empty clusters are restarted on the pixels that fit their
+        color worst, so every bin ends up with a color.
 
         **SEE ALSO**
                
@@ -7401,7 +7947,7 @@ class Image:
 
         """
         retVal = None
-        self._generatePalette(bins,hue)
+        self._generatePalette(bins,hue,palette)
         if( hue ):
             derp = self._mPalette[self._mPaletteMembers]
             retVal = Image(derp[::-1].reshape(self.height,self.width)[::-1])
@@ -7510,32 +8056,23 @@ class Image:
 
         #we get the palette from find palete 
         #ASSUME: GET PALLETE WAS CALLED!
-        if( self._mPalette == None ):
-            warning.warn("Image.binarizeFromPalette: No palette exists, call getPalette())")
+        if( self._mPalette is None ):
+            warnings.warn("Image.binarizeFromPalette: No palette exists, call getPalette())")
             return None
-        retVal = None
-        img = self.palettize(self._mPaletteBins, hue=self._mDoHuePalette)
+        # mark the selected palette entries and look every pixel's entry up, rather than
+        # comparing a palettized image against each selected color
+        palette = self._mPalette.reshape((len(self._mPalette),-1))
+        selected = np.zeros(len(palette),dtype=bool)
+        for p in palette_selection:
+            p = np.asarray(p).reshape(-1)
+            selected |= np.all(palette == p,axis=1)
+        table = np.where(selected,255,0).astype(np.uint8)
+        npimg = table[self._mPaletteMembers]
         if( not self._mDoHuePalette ):
-            npimg = img.getNumpy()
-            white = np.array([255,255,255])
-            black = np.array([0,0,0])
-
-            for p in palette_selection:
-                npimg = np.where(npimg != p,npimg,white)
-            
-            npimg = np.where(npimg != white,black,white)
-            retVal = Image(npimg)
+            retVal = Image(np.repeat(npimg,3).reshape(self.width,self.height,3))
         else:
-            npimg = img.getNumpy()[:,:,1]
-            white = np.array([255])
-            black = np.array([0])
-
-            for p in palette_selection:
-                npimg = np.where(npimg != p,npimg,white)
-            
-            npimg = np.where(npimg != white,black,white)
-            retVal = Image(npimg)
-
+            retVal = Image(npimg[::-1].reshape(self.height,self.width)[::-1])
+            retVal = retVal.rotate(-90,fixed=False)
         return retVal
 
     def skeletonize(self, radius = 5):
@@ -9183,8 +9720,9 @@ class Image:
 Image.greyscale = Image.grayscale
 
 
-from SimpleCV.Features import FeatureSet, Feature, Barcode, Corner, HaarFeature, Line, Chessboard, TemplateMatch, BlobMaker, Circle, KeyPoint, Motion, KeypointMatch
+from SimpleCV.Features import FeatureSet, Feature, Barcode, Corner, HaarFeature, Line, Chessboard, TemplateMatch, BlobMaker, Circle, KeyPoint, Motion, KeypointMatch, RLEMask, suppressBoxes, HaarCascade, HammingIndex, MotionField
 from SimpleCV.Stream import JpegStreamer
 from SimpleCV.Font import *
 from SimpleCV.DrawingLayer import *
+from SimpleCV.Palette import Palette
 
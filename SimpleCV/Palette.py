@@ -0,0 +1,326 @@
+# SimpleCV Palette Library
+#
+# This library finds the main colors of images with k-means
+from SimpleCV.base import *
+
+class Palette:
+    """
+    **SUMMARY**
+
+    A Palette is the set of the main colors of an image, found by k-means clustering
+    of its pixel values. Rather than clustering every pixel, a Palette clusters a
+    random sample of them, which gives almost the same colors in a fraction of the
+    time on large images.
+
+    A Palette also remembers its colors, so it can follow a video: update() moves the
+    colors a little towards each new frame (mini-batch k-means) starting from the
+    colors of the frames before, and fit() runs full k-means on a frame starting from
+    them. Pass a Palette to getPalette, palettize or rePalette to reuse it from frame
+    to frame.
+
+    Giving each pixel its nearest color goes through a lookup table: the 8 bit colors
+    are quantized to a few bits per channel and the nearest color of every quantized
+    cell is found once, then an image is mapped with a single numpy gather. The
+    table is kept until the colors change, so mapping many frames with the same
+    palette, like rePalette does, only pays for it once.
+
+    **EXAMPLE**
+
+    >>> cam = Camera()
+    >>> pal = Palette(bins=8)
+    >>> while True:
+    >>>     img = cam.getImage()
+    >>>     img.palettize(palette=pal).show()
+
+    **SEE ALSO**
+
+    :py:meth:`getPalette`
+    :py:meth:`palettize`
+    :py:meth:`rePalette`
+
+    """
+    mBins = 10 # the number of colors
+    mSamples = 10000 # the number of pixels to cluster
+    mIterations = 10 # the most k-means iterations
+    mTolerance = 0.5 # stop when no color moves further than this
+    mMemory = 0.9 # how much of its weight each color keeps from one update to the next
+    mCenters = None # the kxd float array of colors, None until the first fit
+    mCounts = None # the running number of pixels behind each color
+    mVersion = 0 # counts the changes to the colors
+    mQuantize = 5 # the bits per channel of the lookup table, 0 to map every pixel exactly
+    mMaxError = None # map the lookup cells that could be further wrong than this exactly
+    mRandom = None
+    _mLookup = None # the lookup table from quantized color to color index
+    _mLookupKey = None # the (version,quantize,maxError) the lookup table was built for
+
+    def __init__(self, bins=10, samples=10000, iterations=10, tolerance=0.5, memory=0.9, seed=None,
+                 quantize=5, maxError=None):
+        """
+        **SUMMARY**
+
+        Make an empty palette.
+
+        **PARAMETERS**
+
+        * *bins* - The number of colors.
+        * *samples* - The number of randomly chosen pixels clustered for each fit or update.
+          0 clusters every pixel.
+        * *iterations* - The most k-means iterations in a fit.
+        * *tolerance* - Stop the k-means when no color moves further than this.
+        * *memory* - For update, how much of its weight each color keeps from the frames
+          before, between 0 and 1. Lower values follow changes in the scene faster.
+        * *seed* - The random seed, for repeatable palettes.
+        * *quantize* - The bits kept from each 8 bit channel for the lookup table that maps
+          pixels to colors, from 0 to 8. 5 bits makes a 32x32x32 table. More bits are more accurate but
+          the table takes longer to build. 0 maps every pixel exactly without a table.
+          Hue palettes always use an exact 256 entry table.
+        * *maxError* - How much further, as a color distance, the color a pixel is mapped
+          to may be than its true nearest color. The pixels of the lookup cells that can
+          not promise this are mapped exactly. None trusts the table everywhere, which
+          is off by at most the size of a cell.
+
+        """
+        self.mBins = int(bins)
+        self.mSamples = int(samples)
+        self.mIterations = int(iterations)
+        self.mTolerance = tolerance
+        self.mMemory = memory
+        self.mCenters = None
+        self.mCounts = None
+        self.mVersion = 0
+        self.mQuantize = int(quantize)
+        if( self.mQuantize < 0 or self.mQuantize > 8 ):
+            warnings.warn("Palette: quantize must be between 0 and 8 bits, using %d." % min(max(self.mQuantize,0),8))
+            self.mQuantize = min(max(self.mQuantize,0),8)
+        self.mMaxError = maxError
+        self.mRandom = np.random.RandomState(seed)
+        self._mLookup = None
+        self._mLookupKey = None
+
+    def _sample(self, pixels, n=None):
+        """
+        Return up to n randomly chosen rows of pixels as a float array.
+        """
+        if( n is None ):
+            n = self.mSamples
+        if( n > 0 and len(pixels) > n ):
+            pixels = pixels[self.mRandom.randint(0,len(pixels),n)]
+        return np.asarray(pixels,dtype=np.float64).reshape((len(pixels),-1))
+
+    def _seedCenters(self, sample):
+        """
+        Pick the starting colors from a sample with k-means++, each new color is picked
+        with a probability that grows with its distance from the colors picked so far.
+        """
+        centers = np.zeros((self.mBins,sample.shape[1]))
+        centers[0] = sample[self.mRandom.randint(len(sample))]
+        d2 = ((sample-centers[0])**2).sum(axis=1)
+        for i in range(1,self.mBins):
+            total = d2.sum()
+            if( total <= 0 ):
+                centers[i] = sample[self.mRandom.randint(len(sample))]
+            else:
+                centers[i] = sample[min(np.searchsorted(np.cumsum(d2),self.mRandom.rand()*total),len(sample)-1)]
+            d2 = np.minimum(d2,((sample-centers[i])**2).sum(axis=1))
+        return centers
+
+    def _nearest(self, pixels, centers, chunk=65536):
+        """
+        Return the index of the nearest center to each pixel, and its squared distance.
+        """
+        pixels = np.asarray(pixels).reshape((len(pixels),-1))
+        labels = np.zeros(len(pixels),dtype=np.int32)
+        dist = np.zeros(len(pixels))
+        cc = (centers**2).sum(axis=1)
+        for start in range(0,len(pixels),chunk):
+            p = pixels[start:start+chunk].astype(np.float64)
+            d2 = cc[np.newaxis,:]-2.0*np.dot(p,centers.T)
+            labels[start:start+chunk] = np.argmin(d2,axis=1)
+            dist[start:start+chunk] = d2[np.arange(len(p)),labels[start:start+chunk]]+(p**2).sum(axis=1)
+        return labels,dist
+
+    def _sums(self, sample, labels):
+        """
+        Return the (count, coordinate sum) of the pixels in each cluster.
+        """
+        counts = np.bincount(labels,minlength=self.mBins).astype(np.float64)
+        sums = np.array([np.bincount(labels,weights=sample[:,j],minlength=self.mBins) for j in range(sample.shape[1])]).T
+        return counts,sums
+
+    def fit(self, pixels, warm=True):
+        """
+        **SUMMARY**
+
+        Find the colors of a set of pixels with k-means.
+
+        **PARAMETERS**
+
+        * *pixels* - An Nxd array of pixel values, like img.getNumpy().reshape(-1,3).
+        * *warm* - Start from the current colors, if there are any, rather than from scratch.
+
+        **RETURNS**
+
+        The kxd float array of colors.
+
+        """
+        sample = self._sample(pixels)
+        if( len(sample) == 0 ):
+            return self.mCenters
+        if( warm and self.mCenters is not None and self.mCenters.shape[1] == sample.shape[1] ):
+            centers = self.mCenters.copy()
+        else:
+            centers = self._seedCenters(sample)
+        counts = np.zeros(self.mBins)
+        for i in range(max(1,self.mIterations)):
+            labels,dist = self._nearest(sample,centers)
+            counts,sums = self._sums(sample,labels)
+            new = centers.copy()
+            used = counts > 0
+            new[used] = sums[used]/counts[used][:,np.newaxis]
+            # move empty colors to the pixels that are furthest from their color
+            empty = np.flatnonzero(~used)
+            if( len(empty) > 0 ):
+                far = np.argsort(dist)[::-1][0:len(empty)]
+                new[empty[0:len(far)]] = sample[far]
+            moved = np.abs(new-centers).max()
+            centers = new
+            if( moved < self.mTolerance and len(empty) == 0 ):
+                break
+        self.mCenters = centers
+        self.mCounts = counts
+        self.mVersion += 1
+        return self.mCenters
+
+    def update(self, pixels, samples=None):
+        """
+        **SUMMARY**
+
+        Move the colors towards a new set of pixels with one mini-batch k-means step,
+        which is much cheaper than a fit. If there are no colors yet this does a fit.
+
+        **PARAMETERS**
+
+        * *pixels* - An Nxd array of pixel values.
+        * *samples* - The number of pixels in the batch, by default the palette's samples.
+
+        **RETURNS**
+
+        The kxd float array of colors.
+
+        """
+        if( self.mCenters is None ):
+            return self.fit(pixels)
+        sample = self._sample(pixels,samples)
+        if( len(sample) == 0 or sample.shape[1] != self.mCenters.shape[1] ):
+            return self.fit(pixels,warm=False)
+        labels,dist = self._nearest(sample,self.mCenters)
+        counts,sums = self._sums(sample,labels)
+        self.mCounts = self.mCounts*self.mMemory+counts
+        used = counts > 0
+        # each color moves towards the mean of its batch pixels by its share of its running count
+        rate = counts[used]/self.mCounts[used]
+        self.mCenters[used] += rate[:,np.newaxis]*(sums[used]/counts[used][:,np.newaxis]-self.mCenters[used])
+        self.mVersion += 1
+        return self.mCenters
+
+    def setColors(self, colors):
+        """
+        **SUMMARY**
+
+        Set the colors directly, for example to a palette returned by getPalette.
+
+        **PARAMETERS**
+
+        * *colors* - A kxd array of colors.
+
+        """
+        colors = np.asarray(colors,dtype=np.float64)
+        self.mCenters = colors.reshape((len(colors),-1)).copy()
+        self.mBins = len(self.mCenters)
+        self.mCounts = np.ones(self.mBins)
+        self.mVersion += 1
+
+    def _bits(self):
+        """
+        Return the bits per channel of the lookup table.
+        """
+        if( self.mCenters.shape[1] == 1 ):
+            return 8
+        return self.mQuantize
+
+    def lookupTable(self):
+        """
+        **SUMMARY**
+
+        Return the lookup table from quantized pixel to color index, building it if the
+        colors changed since it was last built. Cells whose pixels might be mapped
+        further than maxError from their nearest color hold -1.
+
+        """
+        key = (self.mVersion,self.mQuantize,self.mMaxError)
+        if( self._mLookup is not None and self._mLookupKey == key ):
+            return self._mLookup
+        d = self.mCenters.shape[1]
+        bits = self._bits()
+        step = 256 >> bits
+        # how far a pixel in a cell can be from the middle of the cell
+        radius = sqrt(d)*(step-1)/2.0
+        shifts = bits*np.arange(d-1,-1,-1)
+        lut = np.zeros(1 << (bits*d),dtype=np.int32)
+        cc = (self.mCenters**2).sum(axis=1)
+        for start in range(0,len(lut),65536):
+            # the middle of each cell in this chunk
+            cell = np.arange(start,min(start+65536,len(lut)))
+            c = ((cell[:,np.newaxis] >> shifts) & ((1 << bits)-1))*step+(step-1)/2.0
+            d2 = cc[np.newaxis,:]-2.0*np.dot(c,self.mCenters.T)+(c**2).sum(axis=1)[:,np.newaxis]
+            best = np.argmin(d2,axis=1)
+            lut[start:start+65536] = best
+            if( self.mMaxError is not None and len(self.mCenters) > 1 and radius > 0 ):
+                rows = np.arange(len(c))
+                d1 = np.sqrt(np.maximum(d2[rows,best],0))
+                d2[rows,best] = np.inf
+                second = np.sqrt(np.maximum(d2.min(axis=1),0))
+                # a pixel in the cell is at most this much further from the chosen color than from its nearest
+                unsure = (d1-second+2*radius) > self.mMaxError
+                lut[start:start+65536][unsure] = -1
+        self._mLookup = lut
+        self._mLookupKey = key
+        return self._mLookup
+
+    def assign(self, pixels):
+        """
+        **SUMMARY**
+
+        Return the index of the nearest color to each of an Nxd array of pixels. 8 bit
+        pixels are mapped with the lookup table, other pixels are mapped exactly.
+        """
+        pixels = np.asarray(pixels)
+        pixels = pixels.reshape((len(pixels),-1))
+        if( pixels.dtype != np.uint8 or self._bits() <= 0 ):
+            return self._nearest(pixels,self.mCenters)[0]
+        bits = self._bits()
+        shift = 8-bits
+        index = pixels[:,0].astype(np.intp) >> shift
+        for j in range(1,pixels.shape[1]):
+            index = (index << bits) | (pixels[:,j].astype(np.intp) >> shift)
+        labels = self.lookupTable()[index]
+        unsure = np.flatnonzero(labels < 0)
+        if( len(unsure) > 0 ):
+            labels[unsure] = self._nearest(pixels[unsure],self.mCenters)[0]
+        return labels
+
+    def colors(self):
+        """
+        **SUMMARY**
+
+        Return the colors as a uint8 numpy array, or None if the palette has not been fitted.
+        """
+        if( self.mCenters is None ):
+            return None
+        return np.array(np.clip(self.mCenters,0,255),dtype='uint8')
+
+    def __len__(self):
+        return self.mBins
+
+    def __repr__(self):
+        return "SimpleCV.Palette.Palette object with %d colors" % self.mBins
@@ -8,7 +8,9 @@ from SimpleCV.Segmentation.SegmentationBase import SegmentationBase
 class ColorSegmentation(SegmentationBase):
     """
     Perform color segmentation based on a color model or color provided. This class
-    uses ColorModel.py to create a color model. 
+    uses ColorModel.py to create a color model. Any model with the ColorModel
+    interface can be given, like a HistogramColorModel for soft, likelihood based
+    segmentation.
     """
     mColorModel = []
     mError = False
@@ -16,8 +18,10 @@ class ColorSegmentation(SegmentationBase):
     mTruthImg = []
     mBlobMaker = []
     
-    def __init__(self):
-        self.mColorModel = ColorModel()
+    def __init__(self, model=None):
+        if( model is None ):
+            model = ColorModel()
+        self.mColorModel = model
         self.mError = False
         self.mCurImg = Image()
         self.mTruthImg = Image()
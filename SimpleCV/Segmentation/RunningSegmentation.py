@@ -9,6 +9,10 @@ class RunningSegmentation(SegmentationBase):
     This model uses an accumulator which performs a running average of previous frames
     where:
     accumulator = ((1-alpha)input_image)+((alpha)accumulator)
+
+    All of the work images are allocated for the first frame and reused for every
+    frame after it, so the images returned by getRawImage and getSegmentedImage are
+    overwritten by the next frame. Copy them to keep them.
     """
 
     mError = False
@@ -20,6 +24,9 @@ class RunningSegmentation(SegmentationBase):
     mBlobMaker = None
     mGrayOnly = True
     mReady = False
+    mBuffers = None # the preallocated work images, by name
+    mFrameCount = 0
+    mMaskFrame = -1 # the frame the mask buffer was computed for
     
     def __init__(self, alpha=0.7, thresh=(20,20,20)):
         """
@@ -36,7 +43,26 @@ class RunningSegmentation(SegmentationBase):
         self.mModelImg = None
         self.mDiffImg = None
         self.mColorImg = None
+        self.mBuffers = None
+        self.mFrameCount = 0
+        self.mMaskFrame = -1
         self.mBlobMaker = BlobMaker()
+
+    def _allocate(self, size):
+        """
+        Create the work images for frames of the given size.
+        """
+        self.mBuffers = {}
+        for name,depth,channels in [("float",cv.IPL_DEPTH_32F,3),("eightBit",cv.IPL_DEPTH_8U,3),
+                                    ("r",cv.IPL_DEPTH_8U,1),("g",cv.IPL_DEPTH_8U,1),("b",cv.IPL_DEPTH_8U,1),
+                                    ("mask",cv.IPL_DEPTH_8U,1),("inverse",cv.IPL_DEPTH_8U,1),
+                                    ("segmented",cv.IPL_DEPTH_8U,3),("segmentedInverse",cv.IPL_DEPTH_8U,3)]:
+            self.mBuffers[name] = cv.CreateImage(size, depth, channels)
+        self.mModelImg = Image(cv.CreateImage(size, cv.IPL_DEPTH_32F, 3))
+        self.mDiffImg = Image(cv.CreateImage(size, cv.IPL_DEPTH_32F, 3))
+        cv.SetZero(self.mModelImg.getBitmap())
+        cv.SetZero(self.mDiffImg.getBitmap())
+        self.mMaskFrame = -1
      
     def addImage(self, img):
         """
@@ -46,15 +72,18 @@ class RunningSegmentation(SegmentationBase):
             return
         
         self.mColorImg = img 
-        if( self.mModelImg == None ):    
-            self.mModelImg = Image(cv.CreateImage((img.width,img.height), cv.IPL_DEPTH_32F, 3))          
-            self.mDiffImg = Image(cv.CreateImage((img.width,img.height), cv.IPL_DEPTH_32F, 3))           
+        if( self.mModelImg is None or self.mModelImg.size() != img.size() ):
+            self._allocate((img.width,img.height))
         else:   
+            # convert the frame once, into the float work image
+            frame = self.mBuffers["float"]
+            cv.Convert(img.getBitmap(),frame)
             # do the difference 
-            cv.AbsDiff(self.mModelImg.getBitmap(),img.getFPMatrix(),self.mDiffImg.getBitmap())
-            #update the model 
-            cv.RunningAvg(img.getFPMatrix(),self.mModelImg.getBitmap(),self.mAlpha)
+            cv.AbsDiff(self.mModelImg.getBitmap(),frame,self.mDiffImg.getBitmap())
+            #update the model in place
+            cv.RunningAvg(frame,self.mModelImg.getBitmap(),self.mAlpha)
             self.mReady = True
+        self.mFrameCount += 1
         return
     
 
@@ -86,26 +115,30 @@ class RunningSegmentation(SegmentationBase):
         """
         self.mModelImg = None
         self.mDiffImg = None
+        self.mBuffers = None
+        self.mMaskFrame = -1
     
     def getRawImage(self):
         """
         Return the segmented image with white representing the foreground
         and black the background. 
         """
-        return self._floatToInt(self.mDiffImg)
+        return self._floatToInt(self.mDiffImg,self.mBuffers["eightBit"])
     
     def getSegmentedImage(self, whiteFG=True):
         """
         Return the segmented image with white representing the foreground
         and black the background. 
         """
-        retVal = None
-        img = self._floatToInt(self.mDiffImg)
+        mask = self._getMask()
         if( whiteFG ):
-            retVal = img.binarize(thresh=self.mThresh)
+            retVal = self.mBuffers["segmented"]
         else:
-            retVal = img.binarize(thresh=self.mThresh).invert()
-        return retVal
+            cv.Not(mask,self.mBuffers["inverse"])
+            mask = self.mBuffers["inverse"]
+            retVal = self.mBuffers["segmentedInverse"]
+        cv.Merge(mask,mask,mask,None,retVal)
+        return Image(retVal)
     
     def getSegmentedBlobs(self):
         """
@@ -114,17 +147,40 @@ class RunningSegmentation(SegmentationBase):
         retVal = []
         if( self.mColorImg is not None and self.mDiffImg is not None ):
 
-            eightBit = self._floatToInt(self.mDiffImg)
-            retVal = self.mBlobMaker.extractFromBinary(eightBit.binarize(thresh=self.mThresh),self.mColorImg)
+            retVal = self.mBlobMaker.extractFromBinary(self.getSegmentedImage(),self.mColorImg)
  
         return retVal
     
+    def _getMask(self):
+        """
+        Threshold the difference image into the mask buffer, the same way as
+        Image.binarize, once per frame.
+        """
+        mask = self.mBuffers["mask"]
+        if( self.mMaskFrame == self.mFrameCount ):
+            return mask
+        eightBit = self._floatToInt(self.mDiffImg,self.mBuffers["eightBit"]).getBitmap()
+        if( is_tuple(self.mThresh) ):
+            r,g,b = self.mBuffers["r"],self.mBuffers["g"],self.mBuffers["b"]
+            cv.Split(eightBit, b, g, r, None)
+            cv.Threshold(r, r, self.mThresh[0], 255, cv.CV_THRESH_BINARY_INV)
+            cv.Threshold(g, g, self.mThresh[1], 255, cv.CV_THRESH_BINARY_INV)
+            cv.Threshold(b, b, self.mThresh[2], 255, cv.CV_THRESH_BINARY_INV)
+            cv.Add(r, g, mask)
+            cv.Add(mask, b, mask)
+        else:
+            cv.CvtColor(eightBit, mask, cv.CV_BGR2GRAY)
+            cv.Threshold(mask, mask, self.mThresh, 255, cv.CV_THRESH_BINARY_INV)
+        self.mMaskFrame = self.mFrameCount
+        return mask
     
-    def _floatToInt(self,input):
+    def _floatToInt(self,input,output=None):
         """
-        convert a 32bit floating point cv array to an int array
+        convert a 32bit floating point cv array to an int array, into output if it is given
         """
-        temp = cv.CreateImage((input.width,input.height), cv.IPL_DEPTH_8U, 3) 
+        temp = output
+        if( temp is None ):
+            temp = cv.CreateImage((input.width,input.height), cv.IPL_DEPTH_8U, 3) 
         cv.Convert(input.getBitmap(),temp)
    
         return Image(temp)
@@ -137,10 +193,15 @@ class RunningSegmentation(SegmentationBase):
         del mydict['mBlobMaker']
         del mydict['mModelImg']
         del mydict['mDiffImg']
+        mydict.pop('mBuffers',None)
         return mydict
     
     def __setstate__(self, mydict):
         self.__dict__ = mydict
         self.mBlobMaker = BlobMaker()
+        self.mModelImg = None
+        self.mDiffImg = None
+        self.mBuffers = None
+        self.mMaskFrame = -1
     
     
@@ -9,6 +9,7 @@ from SimpleCV.ImageClass import *
 from SimpleCV.Stream import *
 from SimpleCV.Font import *
 from SimpleCV.ColorModel import *
+from SimpleCV.Palette import *
 from SimpleCV.DrawingLayer import *
 from SimpleCV.Segmentation import *
 from SimpleCV.MachineLearning import *
@@ -0,0 +1,35 @@
+# Compares full frame blob extraction against the ROI based BlobTracker
+# on synthetic frames of moving white squares.
+from SimpleCV import *
+
+def makeFrames(size, count, nframes):
+    w,h = size
+    side = max(10,h/20)
+    rng = np.random.RandomState(0)
+    pos = rng.rand(count,2)*[w-2*side,h-2*side]+side
+    vel = (rng.rand(count,2)-0.5)*8
+    frames = []
+    for f in range(nframes):
+        data = np.zeros((w,h,3),dtype=np.uint8)
+        for p in pos:
+            data[int(p[0]):int(p[0])+side,int(p[1]):int(p[1])+side,:] = 255
+        frames.append(Image(data))
+        pos += vel
+        bounce = (pos < side) | (pos > [w-2*side,h-2*side])
+        vel[bounce] *= -1
+    return frames
+
+nframes = 60
+for size in [(640,480),(1920,1080)]:
+    for count in [1,5,20]:
+        frames = makeFrames(size,count,nframes)
+        start = time.time()
+        for f in frames:
+            f.findBlobs(128)
+        full = (time.time()-start)/nframes
+        tracker = BlobTracker(threshval=128)
+        start = time.time()
+        for f in frames:
+            tracker.track(f)
+        tracked = (time.time()-start)/nframes
+        print "%dx%d %2d blobs: findBlobs %.2f ms/frame, BlobTracker %.2f ms/frame (%.1fx)" % (size[0],size[1],count,full*1000,tracked*1000,full/tracked)
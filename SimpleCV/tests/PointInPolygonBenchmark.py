@@ -0,0 +1,27 @@
+# Times the vectorized point in polygon test against testing one point at a
+# time, and the Feature containment tests that are built on it.
+from SimpleCV import *
+
+def timeit(fn, reps=5):
+    start = time.time()
+    for i in range(reps):
+        fn()
+    return (time.time()-start)/reps
+
+f = Feature(None,0,0)
+for sides in [4,64,512]:
+    theta = np.linspace(0,2*np.pi,sides,endpoint=False)
+    poly = [(int(320+200*np.cos(t)),int(240+200*np.sin(t))) for t in theta]
+    for npts in [100,10000]:
+        pts = np.random.randint(0,640,size=(npts,2))
+        loop = timeit(lambda: [f._pointInsidePolygon(p,poly) for p in pts],1)
+        vec = timeit(lambda: f._pointsInsidePolygon(pts,poly))
+        print "%3d sides %5d points: one at a time %8.2f ms, vectorized %6.2f ms (%.0fx)" % (sides,npts,loop*1000,vec*1000,loop/vec)
+
+img = Image("../sampleimages/blockhead.png")
+blobs = img.findBlobs()
+big = blobs[-1]
+poly = [(0,0),(img.width,0),(img.width,img.height),(0,img.height)]
+print "Feature.contains over %d blobs: %.2f ms" % (len(blobs),1000*timeit(lambda: [Feature.contains(big,b) for b in blobs]))
+print "Feature.overlaps over %d blobs: %.2f ms" % (len(blobs),1000*timeit(lambda: [Feature.overlaps(big,b) for b in blobs]))
+print "Feature.isContainedWithin polygon over %d blobs: %.2f ms" % (len(blobs),1000*timeit(lambda: [b.isContainedWithin(poly) for b in blobs]))
@@ -0,0 +1,46 @@
+# Frames per second of RunningSegmentation, which reuses its work images, against
+# the per frame allocations it used to make, at 720p and 1080p.
+from SimpleCV import *
+
+def makeFrames(size, nframes):
+    w,h = size
+    side = h/8
+    rng = np.random.RandomState(0)
+    frames = []
+    for f in range(nframes):
+        data = rng.randint(90,110,size=(w,h,3)).astype(np.uint8)
+        x = (f*w/nframes) % (w-side)
+        data[x:x+side,h/2-side/2:h/2+side/2,:] = 255
+        frames.append(Image(data))
+    return frames
+
+def allocating(frames, alpha=0.7, thresh=(20,20,20)):
+    # the old update loop: two float conversions, an 8 bit copy and a binarize per frame
+    size = (frames[0].width,frames[0].height)
+    model = cv.CreateImage(size, cv.IPL_DEPTH_32F, 3)
+    diff = cv.CreateImage(size, cv.IPL_DEPTH_32F, 3)
+    cv.SetZero(model)
+    for img in frames:
+        cv.AbsDiff(model,img.getFPMatrix(),diff)
+        cv.RunningAvg(img.getFPMatrix(),model,alpha)
+        temp = cv.CreateImage(size, cv.IPL_DEPTH_8U, 3)
+        cv.Convert(diff,temp)
+        Image(temp).binarize(thresh=thresh)
+
+def reusing(frames, alpha=0.7, thresh=(20,20,20)):
+    seg = RunningSegmentation(alpha,thresh)
+    for img in frames:
+        seg.addImage(img)
+        seg.getSegmentedImage()
+
+nframes = 30
+for size in [(1280,720),(1920,1080)]:
+    frames = makeFrames(size,nframes)
+    reusing(frames[0:2]) # warm up
+    start = time.time()
+    allocating(frames)
+    old = nframes/(time.time()-start)
+    start = time.time()
+    reusing(frames)
+    new = nframes/(time.time()-start)
+    print "%dx%d: allocating %6.1f fps, reusing buffers %6.1f fps (%.1fx)" % (size[0],size[1],old,new,new/old)
@@ -0,0 +1,23 @@
+# Compares searching a frame for many templates with repeated findTemplate
+# calls against a single TemplateBank pass.
+from SimpleCV import *
+
+img = Image("lenna")
+rng = np.random.RandomState(0)
+for count in [5,20,40]:
+    templates = []
+    for i in range(count):
+        w,h = rng.randint(24,48,2)
+        x = rng.randint(0,img.width-w)
+        y = rng.randint(0,img.height-h)
+        templates.append(img.crop(x,y,w,h))
+    start = time.time()
+    for t in templates:
+        img.findTemplate(t,threshold=4)
+    single = time.time()-start
+    bank = TemplateBank(templates)
+    bank.find(img,threshold=4) # the template transforms are made on the first frame
+    start = time.time()
+    bank.find(img,threshold=4)
+    batched = time.time()-start
+    print "%2d templates: findTemplate %.1f ms, TemplateBank %.1f ms (%.1fx)" % (count,single*1000,batched*1000,single/batched)
@@ -1967,3 +1967,588 @@ def test_save_kwargs():
     pass
   else:
     assert False
+
+def test_blob_rle_mask():
+  img = Image("../sampleimages/blockhead.png")
+  blobs = img.findBlobs()
+  for b in blobs:
+    rle = b.mMaskRLE
+    mask = b.getBlobMask()
+    if( rle.area() != int(np.sum(mask.getGrayNumpy() > 127)) ):
+      assert False
+    if( rle.union(rle).area() != rle.area() or rle.intersection(rle).area() != rle.area() ):
+      assert False
+    pt = (rle.offset()[0]+rle.mRuns[0,1],rle.offset()[1]+rle.mRuns[0,0])
+    if( not rle.contains(pt) or rle.contains((-1,-1)) ):
+      assert False
+  b = blobs[-1]
+  ub = pickle.loads(pickle.dumps(b))
+  if( ub.mMaskRLE.area() != b.mMaskRLE.area() ):
+    assert False
+
+def test_blob_contour_arrays():
+  img = Image("../sampleimages/blockhead.png")
+  blobs = img.findBlobs()
+  b = blobs[-1]
+  if( b.mContour.dtype != np.int32 or b.mContour.shape[1] != 2 ):
+    assert False
+  if( b.mConvexHull.dtype != np.int32 ):
+    assert False
+  if( not b.contains(b) or not b.overlaps(b) ):
+    assert False
+  ub = pickle.loads(pickle.dumps(b))
+  if( not np.all(ub.mContour == b.mContour) ):
+    assert False
+  n = len(b.mContour)
+  b.rotate(90)
+  if( len(b.mContour) != n or b.mContour.dtype != np.int32 ):
+    assert False
+  b.isCircle()
+  b.isRectangle()
+
+def test_shape_library():
+  img = Image("../sampleimages/blockhead.png")
+  blobs = img.findBlobs()
+  lib = ShapeLibrary(blobs)
+  labels, scores = lib.match(blobs)
+  for i in range(len(blobs)):
+    if( scores[i] > 1e-6 ):
+      assert False
+    if( abs(lib.distanceMatrix(blobs[i])[0,-1] - blobs[i].match(blobs[-1])) > 1e-6 ):
+      assert False
+  fname = "shapes.tmp"
+  lib.save(fname)
+  lib2 = ShapeLibrary()
+  lib2.load(fname)
+  os.remove(fname)
+  if( len(lib2) != len(lib) ):
+    assert False
+
+def test_blob_tracker():
+  tracker = BlobTracker(threshval=128, minsize=10, sweepInterval=10)
+  ids = None
+  for i in range(15):
+    img = Image((320,240))
+    img.drawRectangle(20+5*i,50,30,30,Color.WHITE,-1)
+    img.drawRectangle(200,40+4*i,40,20,Color.WHITE,-1)
+    img = img.applyLayers()
+    blobs = tracker.track(img)
+    if( len(blobs) != 2 ):
+      assert False
+    current = sorted([b.mTrackID for b in blobs])
+    if( ids is None ):
+      ids = current
+    elif( current != ids ):
+      assert False
+  moving = [b for b in blobs if b.x < 150][0]
+  if( abs(moving.mVelocity[0]-5) > 1 or abs(moving.mVelocity[1]) > 1 ):
+    assert False
+
+def test_featureset_spatial_index():
+  img = Image((400,400))
+  for x in range(5,395,15):
+    for y in range(5,395,15):
+      img.drawRectangle(x,y,8,8,Color.WHITE,-1)
+  img = img.applyLayers()
+  blobs = img.findBlobs()
+  if( len(blobs) < FeatureSet.mIndexThreshold ):
+    assert False
+  regions = [(100,100,120,80),(200,200,50),[(10,10),(300,20),(250,300)],blobs[0],(150,150)]
+  fast = []
+  for r in regions:
+    fast.append([blobs.inside(r),blobs.outside(r),blobs.overlaps(r),
+                 blobs.above(r),blobs.below(r),blobs.left(r),blobs.right(r)])
+  threshold = FeatureSet.mIndexThreshold
+  FeatureSet.mIndexThreshold = len(blobs)+1
+  for r,results in zip(regions,fast):
+    slow = [blobs.inside(r),blobs.outside(r),blobs.overlaps(r),
+            blobs.above(r),blobs.below(r),blobs.left(r),blobs.right(r)]
+    for a,b in zip(results,slow):
+      if( [id(f) for f in a] != [id(f) for f in b] ):
+        FeatureSet.mIndexThreshold = threshold
+        assert False
+  FeatureSet.mIndexThreshold = threshold
+  d = blobs.distancePairs()
+  close = blobs.distancePairs(maxDistance=20)
+  if( len(close) != (np.sum(d <= 20)-len(blobs))/2 ):
+    assert False
+  if( blobs.nearest((200,200))[0] != blobs.sortDistance((200,200))[0] ):
+    assert False
+  if( len(blobs.overlapPairs()) != 0 ):
+    assert False
+
+def test_feature_point_in_polygon():
+  img = Image("../sampleimages/blockhead.png")
+  f = Feature(img,0,0)
+  square = [(0,0),(0,10),(10,10),(10,0)]
+  notch = [(0,0),(0,10),(10,10),(10,0),(5,5)]
+  pts = [(5,5),(15,5),(5,-1),(2,5),(8,5),(5,2)]
+  if( list(f._pointsInsidePolygon(pts,square)) != [True,False,False,True,True,True] ):
+    assert False
+  if( list(f._pointsInsidePolygon(pts,notch)) != [True,False,False,True,True,False] ):
+    assert False
+  if( not f._pointInsidePolygon((5,2),square) or f._pointInsidePolygon((5,2),notch) ):
+    assert False
+  blobs = img.findBlobs()
+  b = blobs[-1]
+  box = (b.minX()-1,b.minY()-1,b.width()+2,b.height()+2)
+  if( not b.isContainedWithin(box) or not b.isContainedWithin([(box[0],box[1]),(box[0]+box[2],box[1]),(box[0]+box[2],box[1]+box[3]),(box[0],box[1]+box[3])]) ):
+    assert False
+  if( not Feature.overlaps(b,(b.x,b.y,2,2)) or Feature.overlaps(b,(-10,-10,2,2)) ):
+    assert False
+
+def test_image_region_stats():
+  img = Image("lenna")
+  data = img.getNumpy().astype(np.float64)
+  mean,total,var = img.regionStats([(10,20,30,40),(100,100,5),(-10,-10,20,20)])
+  region = data[10:40,20:60].reshape(-1,3)
+  if( np.max(np.abs(mean[0]-region.mean(axis=0))) > 1e-6 or np.max(np.abs(var[0]-region.var(axis=0))) > 1e-3 ):
+    assert False
+  if( np.max(np.abs(total[2]-data[0:10,0:10].reshape(-1,3).sum(axis=0))) > 1e-6 ):
+    assert False
+  blobs = img.findBlobs()
+  batch = blobs.meanColor()
+  for i in range(len(blobs)):
+    if( np.max(np.abs(batch[i]-np.array(blobs[i].meanColor()))) > 1e-6 ):
+      assert False
+  d = blobs.colorDistance(Color.RED)
+  s = blobs.sortColorDistance(Color.RED)
+  if( s[0].colorDistance(Color.RED) > np.min(d)+1e-6 ):
+    assert False
+
+def test_featureset_crop_batch():
+  img = Image("lenna")
+  data = img.getNumpy()
+  fs = FeatureSet()
+  for x,y,w,h in [(10,20,16,8),(90,70,20,20),(200,150,40,30)]:
+    f = Feature(img,x+w/2,y+h/2)
+    f.points = [(x,y),(x+w,y),(x+w,y+h),(x,y+h)]
+    fs.append(f)
+  batch = fs.cropBatch((16,8),interpolation="nearest")
+  if( batch.shape != (3,8,16,3) or batch.dtype != np.uint8 or not batch.flags['C_CONTIGUOUS'] ):
+    assert False
+  if( not np.all(batch[0] == data[10:26,20:28].transpose(1,0,2)) ):
+    assert False
+  fit = fs.cropBatch((10,10),aspect="fit",fill=(1,2,3))
+  if( not np.all(fit[0][0] == (1,2,3)) ):
+    assert False
+  hue = HueHistogramFeatureExtractor().extractBatch(fs.cropBatch((32,32)))
+  if( hue.shape != (3,16) ):
+    assert False
+  haar = HaarLikeFeatureExtractor(fname="../Features/haar.txt")
+  if( haar.extractBatch(fs.cropBatch((32,32))).shape != (3,2*len(haar.mFeatureSet)) ):
+    assert False
+
+def test_featureset_non_max_suppression():
+  img = Image("lenna")
+  fs = FeatureSet()
+  for x,y,w,h in [(10,10,20,20),(12,12,20,20),(100,100,10,10),(40,40,30,30)]:
+    f = Feature(img,x+w/2,y+h/2)
+    f.points = [(x,y),(x+w,y),(x+w,y+h),(x,y+h)]
+    fs.append(f)
+  kept = fs.nonMaxSuppression(0.3,[1.0,2.0,0.5,3.0])
+  if( len(kept) != 3 or kept[0] is not fs[3] or kept[1] is not fs[1] or kept[2] is not fs[2] ):
+    assert False
+  if( len(fs.nonMaxSuppression(0.9,[1.0,2.0,0.5,3.0])) != 4 ):
+    assert False
+  source = Image("../sampleimages/templatetest.png")
+  template = Image("../sampleimages/template.png")
+  matches = source.findTemplate(template,threshold=4)
+  if( len(matches) == 0 or len(matches.nonMaxSuppression(0.0,"quality")) != len(matches) ):
+    assert False
+
+def test_findtemplate_pyramid():
+  img = Image("lenna")
+  template = img.crop(200,220,64,48)
+  full = img.findTemplate(template,threshold=4)
+  fast = img.findTemplate(template,threshold=4,pyramid=2)
+  if( len(full) == 0 or len(fast) == 0 ):
+    assert False
+  if( (full[0].x,full[0].y) != (200,220) or (fast[0].x,fast[0].y) != (200,220) ):
+    assert False
+
+def test_template_bank():
+  img = Image("lenna")
+  boxes = [(200,220,40,40),(300,250,32,48),(100,60,48,24)]
+  templates = [img.crop(x,y,w,h) for x,y,w,h in boxes]
+  for method in ["SQR_DIFF_NORM","CCOEFF_NORM"]:
+    bank = TemplateBank(templates,method)
+    results = bank.find(img,threshold=4)
+    if( len(results) != len(boxes) ):
+      assert False
+    for fs,box in zip(results,boxes):
+      if( len(fs) == 0 or (fs[0].x,fs[0].y) != box[0:2] ):
+        assert False
+  if( len(TemplateBank().find(img)) != 0 ):
+    assert False
+
+def test_haar_cascade_registry():
+  face = HaarCascade("face")
+  if( face.getCascade() is None or HaarCascade("face.xml").getCascade() is not face.getCascade() ):
+    assert False
+  if( "face" not in HaarCascade.available() or "eye" not in HaarCascade.available() ):
+    assert False
+  img = Image("../sampleimages/orson_welles.jpg")
+  f = img.findHaarFeatures("face")
+  f2 = img.findHaarFeatures(face)
+  if( f is None or f2 is None or len(f) != len(f2) ):
+    assert False
+  # start this thread's storage from scratch, the detections above have used it
+  HaarCascade._mStorage.storage = None
+  first = HaarCascade.getStorage()
+  for i in range(HaarCascade._mStorageUses-1):
+    if( HaarCascade.getStorage() is not first ):
+      assert False
+  if( HaarCascade.getStorage() is first ):
+    assert False
+
+def test_findHaarFeatures_parallel_and_hints():
+  img = Image("../sampleimages/orson_welles.jpg")
+  full = img.findHaarFeatures("face")
+  if( full is None ):
+    assert False
+  par = img.findHaarFeatures("face",threads=4)
+  if( par is None or len(par.nonMaxSuppression(0.0)) == 0 ):
+    assert False
+  near = img.findHaarFeatures("face",hints=full)
+  if( near is None or len(near) < len(full) ):
+    assert False
+  small = img.findHaarFeatures("face",max_size=(10,10))
+  if( small is not None and np.max(small.width()) > 10 ):
+    assert False
+  tracker = HaarTracker("face",sweepInterval=3)
+  for i in range(4):
+    faces = tracker.track(img)
+    if( faces is None or len(faces) == 0 ):
+      assert False
+
+def test_findHaarCascades():
+  img = Image("../sampleimages/orson_welles.jpg")
+  found = img.findHaarCascades(["face","upper_body"],parts={"face":["eye","nose"]})
+  if( "face" not in found or "upper_body" not in found or len(found["face"]) == 0 ):
+    assert False
+  for face in found["face"]:
+    if( set(face.parts().keys()) != set(["eye","nose"]) ):
+      assert False
+    for eye in face.parts("eye"):
+      if( eye.x < face.points[0][0] or eye.x > face.points[0][0]+face.width() ):
+        assert False
+  big = img.findHaarCascades(["face"],min_size=(100,100))
+  if( len(big["face"]) > 0 and np.min(big["face"].width()) < 100 ):
+    assert False
+
+def test_keypoint_database():
+  try:
+    import cv2
+  except:
+    pass
+    return
+
+  db = KeypointDatabase()
+  db.addTemplate(Image("../sampleimages/KeypointTemplate2.png"),"template")
+  db.addTemplate(Image("../sampleimages/aerospace.jpg"),"aerospace")
+  found = db.match(Image("../sampleimages/kptest0.png"))
+  if( "template" not in [m.mName for m in found] ):
+    assert False
+  db.save("keypoints.db")
+  db2 = KeypointDatabase.load("keypoints.db")
+  found2 = db2.match(Image("../sampleimages/kptest0.png"))
+  if( len(db2) != 2 or [m.mName for m in found2] != [m.mName for m in found] ):
+    assert False
+  os.remove("keypoints.db")
+  if( os.path.exists("keypoints.db.index") ):
+    os.remove("keypoints.db.index")
+
+def test_orb_keypoints_hamming():
+  try:
+    import cv2
+  except:
+    pass
+    return
+
+  rng = np.random.RandomState(0)
+  d = rng.randint(0,256,(2000,32)).astype(np.uint8)
+  hashed = HammingIndex(d,exactPairs=0)
+  exact = HammingIndex(d,exactPairs=len(d)*200)
+  for flip,recall in [(0.03,0.99),(0.15,0.97),(0.2,0.9)]:
+    noisy = np.packbits(np.unpackbits(d[:200],axis=1)^(rng.rand(200,256) < flip),axis=1)
+    idx,dist = hashed.knnSearch(noisy,2)
+    if( np.mean(idx[:,0] == np.arange(200)) < recall or np.any(dist[:,0] > dist[:,1]) ):
+      assert False
+    idx,dist = exact.knnSearch(noisy,2)
+    if( np.any(idx[:,0] != np.arange(200)) ):
+      assert False
+
+  template = Image("../sampleimages/KeypointTemplate2.png")
+  match0 = Image("../sampleimages/kptest0.png")
+  kp = match0.findKeypoints(min_quality=500,flavor="ORB")
+  if( kp is None or len(kp) == 0 or kp[0].descriptor().shape != (32,) ):
+    assert False
+  fs = match0.findKeypointMatch(template,quality=500,minDist=0.25,minMatch=0.2,flavor="ORB")
+  if( fs is None or len(fs) == 0 ):
+    assert False
+  fs[0].draw()
+
+def test_point_tracker():
+  img = Image("../sampleimages/aerospace.jpg")
+  frame0 = img.crop(0,0,200,200)
+  frame1 = img.crop(3,0,200,200)
+  tracker = PointTracker(maxPoints=50,mindistance=5.0)
+  pts = tracker.track(frame0)
+  if( len(pts) == 0 or len(tracker.ids()) != len(pts) ):
+    assert False
+  pts = tracker.track(frame1)
+  if( len(pts) == 0 ):
+    assert False
+  # the scene moved 3 pixels to the left
+  dx = np.median(tracker.motion()[:,0])
+  if( abs(dx+3) > 0.5 ):
+    assert False
+
+def test_motion_field():
+  current = Image("../sampleimages/flow_simple1.png")
+  prev = Image("../sampleimages/flow_simple2.png")
+
+  for method in ["BM","HS","LK"]:
+    field = current.findMotion(prev,window=7,method=method,field=True)
+    fs = current.findMotion(prev,window=7,method=method)
+    if( field is None or len(field) == 0 or len(field) != len(fs) ):
+      assert False
+    if( not np.allclose(field.magnitude(),[f.magnitude() for f in fs]) ):
+      assert False
+    if( field[-1].x != fs[-1].x or field[-1].y != fs[-1].y ):
+      assert False
+    if( abs(field[0].norm_dx-fs[0].norm_dx) > 1e-6 ):
+      assert False
+    field.draw(color=Color.RED)
+
+def test_camshift_tracker():
+  def frame(x,y):
+    arr = np.zeros((320,240,3),dtype=np.uint8)
+    arr[:,:] = (0,0,255)
+    arr[x-20:x+20,y-10:y+10] = (255,0,0)
+    return Image(arr)
+
+  tracker = CamShiftTracker(frame(100,100),(80,90,40,20))
+  for i in range(1,6):
+    box = tracker.track(frame(100+5*i,100+2*i))
+    if( box is None or tracker.isLost() ):
+      assert False
+  cx,cy = tracker.center()
+  if( abs(cx-125) > 3 or abs(cy-110) > 3 ):
+    assert False
+  prob = tracker.backProject(frame(100,100))
+  if( prob.shape != (320,240) or prob[100,100] < 0.5 or prob[10,10] > 0.5 ):
+    assert False
+
+def test_histogram_engine():
+  img = Image(testimage2)
+  gray = img.getGrayNumpy()
+  for bins in [10,50,256]:
+    if( img.histogram(bins) != np.histogram(gray,bins=bins)[0].tolist() ):
+      assert False
+  hue = img.toHSV().getNumpy()[:,:,2]
+  if( img.hueHistogram().tolist() != np.histogram(hue,bins=179)[0].tolist() ):
+    assert False
+  cdf = img._getCDF("gray")
+  if( len(cdf) != 256 or abs(cdf[-1]-1.0) > 1e-9 or np.any(np.diff(cdf) < 0) ):
+    assert False
+  approx = img.histogram(50,step=4)
+  if( abs(sum(approx)-img.width*img.height) > 1 ):
+    assert False
+  img.huePeaks()
+  img.whiteBalance(step=2)
+  img.equalize()
+  b = img.binarize()
+  if( b.width != img.width ):
+    assert False
+
+def test_palette_engine():
+  img = Image(testimage2)
+  p = img.getPalette(bins=5)
+  if( len(p) != 5 or abs(sum(img._mPalettePercentages)-1.0) > 1e-6 ):
+    assert False
+  pal = Palette(bins=6,seed=0)
+  result = img.palettize(palette=pal)
+  if( pal.mVersion != 1 or len(pal.colors()) != 6 or result.size() != img.size() ):
+    assert False
+  img2 = img.smooth()
+  result = img2.palettize(palette=pal)
+  if( pal.mVersion != 2 or len(img2.getPalette(palette=pal)) != 6 or pal.mVersion != 2 ):
+    assert False
+  hue = img.palettize(hue=True,palette=Palette(bins=4))
+  if( hue.size() != img.size() ):
+    assert False
+
+def test_palette_lookup():
+  img = Image(testimage2)
+  pixels = img.getNumpy().reshape(-1,3)
+  pal = Palette(bins=8,seed=0,maxError=0.0)
+  pal.fit(pixels)
+  if( not np.all(pal.assign(pixels) == pal._nearest(pixels,pal.mCenters)[0]) ):
+    assert False
+  table = pal.lookupTable()
+  result = img.rePalette(pal)
+  if( pal.lookupTable() is not table or result.size() != img.size() ):
+    assert False
+  p = img.getPalette(bins=4)
+  b = img.binarizeFromPalette(p[0:2])
+  members = img._mPaletteMembers.reshape(img.width,img.height)
+  if( not np.all((b.getNumpy()[:,:,0] == 255) == (members < 2)) ):
+    assert False
+  if( img.rePalette(p).size() != img.size() ):
+    assert False
+
+def test_color_model_table():
+  img = Image(testimage)
+  cm = ColorModel()
+  cm.add(Color.RED)
+  if( not cm.contains(Color.RED) or cm.contains(Color.BLUE) ):
+    assert False
+  cm.remove(Color.BLUE)
+  if( cm.contains(Color.BLUE) ):
+    assert False
+  cm.add(img)
+  mask = cm.threshold(img).getGrayNumpy()
+  if( mask.shape != (img.width,img.height) or np.any(mask != 0) ):
+    assert False
+  cm.save("temp.txt")
+  cm2 = ColorModel()
+  cm2.load("temp.txt")
+  if( not np.all(cm2.mData == cm.mData) ):
+    assert False
+
+def test_histogram_color_model():
+  img = Image(testimage)
+  obj = img.crop(0,0,img.width/4,img.height/4)
+  cm = HistogramColorModel(obj,img,isBackground=False,ratio=1.5)
+  prob = cm.backProject(img)
+  if( prob.shape != (img.width,img.height) or prob.min() < 0 or prob.max() > 1 ):
+    assert False
+  if( prob[0:img.width/4,0:img.height/4].mean() <= prob.mean() ):
+    assert False
+  cm.save("temp.txt")
+  cm2 = HistogramColorModel()
+  cm2.load("temp.txt")
+  if( not np.allclose(cm2.likelihood(),cm.likelihood()) ):
+    assert False
+  cm.decay(0.5)
+  seg = ColorSegmentation(cm)
+  seg.addImage(img)
+  if( seg.getSegmentedImage().size() != img.size() ):
+    assert False
+
+def test_running_segmentation_buffers():
+  seg = RunningSegmentation(alpha=0.5,thresh=(20,20,20))
+  img = Image(testimage2)
+  seg.addImage(img)
+  seg.addImage(img.invert())
+  first = seg.getSegmentedImage()
+  buffers = dict(seg.mBuffers)
+  seg.addImage(img)
+  second = seg.getSegmentedImage(False)
+  for name in buffers:
+    if( seg.mBuffers[name] is not buffers[name] ):
+      assert False
+  if( first.size() != img.size() or second.size() != img.size() or seg.getRawImage().size() != img.size() ):
+    assert False
+  seg.getSegmentedBlobs()
+
+def test_color_model_load_old_format():
+  # the old dict format: tuples were stored as int64 keys, image colors as uint8 keys
+  pixel = np.array([[10,200,30]],dtype=np.uint8) # a color from an image's getNumpy()
+  old = {}
+  old[np.right_shift(np.array([Color.BLUE]),1)[0].tostring()] = 1
+  old[np.right_shift(pixel,1)[0].tostring()] = 1
+  pickle.dump(old,open("temp.txt","wb"))
+  cm = ColorModel()
+  cm.load("temp.txt")
+  if( not cm.contains(Color.BLUE) or not cm.contains(tuple(pixel[0])) ):
+    assert False
+  if( cm.mData.sum() != 2 or cm.contains(Color.BLACK) ):
+    assert False
+
+def test_repalette_array_exact():
+  img = Image(testimage2)
+  p = img.getPalette(bins=6)
+  pixels = img.getNumpy().reshape(-1,3)
+  members = Palette(6,quantize=0)._nearest(pixels,np.array(p,dtype=np.float64))[0]
+  result = img.rePalette(p).getNumpy().reshape(-1,3)
+  if( not np.all(result == p[members]) ):
+    assert False
+
+def test_palette_default_exact():
+  img = Image(testimage2)
+  img.getPalette(bins=8)
+  pixels = img.getNumpy().reshape(-1,3)
+  pal = img._mPaletteSource[0]
+  exact = pal._nearest(pixels,pal.mCenters)[0]
+  if( not np.all(img._mPaletteMembers == exact) ):
+    assert False
+
+def test_templatematch_suppression_direction():
+  img = Image("lenna")
+  template = img.crop(0,0,20,20)
+  fs = FeatureSet()
+  fs.append(TemplateMatch(img,template,(10,10),0.5,True))
+  fs.append(TemplateMatch(img,template,(12,12),0.1,True))
+  kept = fs.nonMaxSuppression(0.3)
+  if( len(kept) != 1 or kept[0].quality != 0.1 ):
+    assert False
+  fs = FeatureSet()
+  fs.append(TemplateMatch(img,template,(10,10),0.5))
+  fs.append(TemplateMatch(img,template,(12,12),0.1))
+  kept = fs.nonMaxSuppression(0.3)
+  if( len(kept) != 1 or kept[0].quality != 0.5 ):
+    assert False
+  source = Image("../sampleimages/templatetest.png")
+  matches = source.findTemplate(Image("../sampleimages/template.png"),threshold=4)
+  best = min([m.quality for m in matches])
+  if( matches.nonMaxSuppression(0.0)[0].quality != best ):
+    assert False
+
+def test_whitebalance_single_color():
+  data = np.zeros((64,48,3),dtype=np.uint8)
+  data[:,:,2] = 255 # pure blue, the red and green channels are empty
+  img = Image(data)
+  result = img.whiteBalance()
+  if( result is None or result.size() != img.size() ):
+    assert False
+  if( np.any(result.getNumpy()[:,:,0:2] != 0) ):
+    assert False
+  result = Image(np.zeros((64,48,3),dtype=np.uint8)).whiteBalance(step=2)
+  if( result is None or np.any(result.getNumpy() != 0) ):
+    assert False
+
+def test_blobmaker_extract_using_model():
+  data = np.zeros((160,120,3),dtype=np.uint8)
+  data[:,:] = Color.BLUE
+  data[40:80,30:70] = Color.RED
+  img = Image(data)
+  bm = BlobMaker()
+  cm = ColorModel(isBackground=False)
+  cm.add(Color.RED)
+  blobs = bm.extractUsingModel(img,cm)
+  if( blobs is None or len(blobs) != 1 or abs(blobs[0].area()-1600) > 200 ):
+    assert False
+  hcm = HistogramColorModel(img.crop(40,30,40,40),img,isBackground=False)
+  blobs = bm.extractUsingModel(img,hcm)
+  if( blobs is None or len(blobs) != 1 or abs(blobs[0].area()-1600) > 200 ):
+    assert False
+
+def test_featureset_spatial_index_invalidation():
+  img = Image("lenna")
+  fs = FeatureSet()
+  for i in range(100):
+    fs.append(Feature(img,(i*5)%500,(i*7)%500))
+  index = fs.spatialIndex()
+  if( fs.spatialIndex() is not index ):
+    assert False
+  fs[0] = Feature(img,1,1) # same length, new feature
+  if( fs.spatialIndex() is index ):
+    assert False
+  index = fs.spatialIndex()
+  fs.append(Feature(img,2,2))
+  fs.pop()
+  if( fs.spatialIndex() is index or len(fs.spatialIndex().query((0,0,3,3))) == 0 ):
+    assert False